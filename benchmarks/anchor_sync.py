@@ -0,0 +1,118 @@
+"""
+Counts the serial transactions and lock acquisitions of the discovery rounds of the task state,
+when the device list of the Pozyx is cleared and every anchor added again, as it used to be, and
+when a pozyx_utils.DeviceListMirror only sends the changes.
+
+A tag discovers the anchors of interfaces/anchors.csv and --tags other tags on a simulated medium,
+then lists the anchors, --rounds times in a row.
+
+Usage: python benchmarks/anchor_sync.py --tags 0 2 10 --rounds 20
+"""
+
+
+import argparse
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import POZYX_ANCHOR_SEL_AUTO, POZYX_DISCOVERY_ALL_DEVICES, Coordinates
+
+from interfaces import Anchors, Neighborhood, SlotAssignment, Timing
+from messenger import Messenger
+from pozyx_utils import PozyxDiscoverer
+from simulation import RadioMedium, SimulatedPozyx, add_anchors
+from states.task import Task
+
+TAG_BASE_ID = 0x2000
+DISCOVERY_CALLS = ['doDiscovery', 'getDeviceListSize', 'getDeviceIds']
+DEVICE_LIST_CALLS = ['clearDevices', 'addDevice', 'removeDevice', 'setSelectionOfAnchors']
+
+
+class LegacyTask(Task):
+    """Clears the device list and adds every anchor under its own lock acquisition, as the task used to."""
+
+    def discover_devices(self):
+        self.anchors.available_anchors.clear()
+        with self.pozyx_lock:
+            self.pozyx.clearDevices()
+        self.discover(POZYX_DISCOVERY_ALL_DEVICES)
+
+        new_anchors, new_tags = [], []
+        for device in self.anchors.available_anchors:
+            (new_anchors if PozyxDiscoverer.is_anchor(device) else new_tags).append(device)
+
+        self.anchors.available_anchors = new_anchors
+        self.update_neighborhood(new_tags)
+
+    def set_manually_measured_anchors(self) -> None:
+        with self.pozyx_lock:
+            self.pozyx.clearDevices()
+
+        for anchor in self.anchors.available_anchors:
+            if anchor in self.anchors.anchors_dict:
+                with self.pozyx_lock:
+                    self.pozyx.addDevice(self.anchors.anchors_dict[anchor])
+
+        if len(self.anchors.available_anchors) > 3:
+            with self.pozyx_lock:
+                self.pozyx.setSelectionOfAnchors(POZYX_ANCHOR_SEL_AUTO, len(self.anchors.available_anchors))
+
+
+class CountingLock:
+    def __init__(self):
+        self.acquisitions = 0
+
+    def __enter__(self):
+        self.acquisitions += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def measure(task_class, nb_tags: int, rounds: int) -> dict:
+    medium = RadioMedium(seed=0)
+    add_anchors(medium)
+    pozyx = SimulatedPozyx(TAG_BASE_ID, medium, Coordinates(1500, 2000, 1200))
+    for index in range(nb_tags):
+        SimulatedPozyx(TAG_BASE_ID + index + 1, medium, Coordinates(1000 + 100 * index, 1000, 1200))
+
+    lock, neighborhood, slot_assignment = CountingLock(), Neighborhood(), SlotAssignment()
+    messenger = Messenger(pozyx.network_id, pozyx, neighborhood, slot_assignment, lock, None)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        task = task_class(Timing(), Anchors(), neighborhood, pozyx.network_id, pozyx, lock, messenger, slot_assignment)
+        pozyx.calls.clear()
+        lock.acquisitions = 0
+        for _ in range(rounds):
+            task.discover_devices()
+            task.set_manually_measured_anchors()
+
+    return {
+        'discovery': sum(pozyx.calls.get(call, 0) for call in DISCOVERY_CALLS) / rounds,
+        'device_list': sum(pozyx.calls.get(call, 0) for call in DEVICE_LIST_CALLS) / rounds,
+        'lock': lock.acquisitions / rounds,
+        'anchors': dict(pozyx.device_list),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tags', type=int, nargs='+', default=[0, 2, 10], help="other tags in range")
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'device list':13} {'tags':>5} {'discovery/round':>15} {'device list/round':>17} {'lock/round':>10}")
+    for nb_tags in args.tags:
+        results = {}
+        for name, task_class in [('clear + add', LegacyTask), ('mirror', Task)]:
+            results[name] = measure(task_class, nb_tags, args.rounds)
+            result = results[name]
+            print(f"{name:13} {nb_tags:5} {result['discovery']:15.1f} {result['device_list']:17.1f} {result['lock']:10.1f}")
+
+        if results['clear + add']['anchors'].keys() != results['mirror']['anchors'].keys():
+            print("The device lists differ!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Measures Messenger.receive_new_message over a simulated hour of task phase traffic, with the
+received messages remembered in a plain set, as they used to be, and in a messages.DuplicateFilter.
+
+Every neighbor sends one synchronization message, whose clock makes it unique, and one TDMA
+message per second. Each frame is read --reads times from the RX buffer before the next one arrives,
+as when the TDMA loop polls faster than frames come in. The time runs on a VirtualClock.
+
+Usage: python benchmarks/duplicate_filter.py --neighbors 20 --duration 3600
+"""
+
+
+import argparse
+import os
+import random
+import sys
+from time import perf_counter as wall_perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from clockSource import set_clock_source
+from interfaces import Neighborhood, SlotAssignment, State
+from messages import DuplicateFilter, MessageType
+from messages.messageFactory import CUSTOM_MESSAGE_SIGNATURE
+from messenger import Messenger
+from simulation import VirtualClock
+
+TAG_BASE_ID = 0x2000
+MESSAGE_SIZE = 5  # bytes of Data([0, 0], 'BI')
+REPORT_PERIOD = 600  # s of simulated time
+
+
+class LegacyReceivedMessages(set):
+    """The former plain set of messages, hashed on str(sender_id) + str(data).
+    add reports whether the message is new, as DuplicateFilter.add does."""
+
+    def add(self, message) -> bool:
+        key = str(message.sender_id) + str(message.data)
+        if key in self:
+            return False
+        super().add(key)
+        return True
+
+
+class ScriptedRxBuffer:
+    """Pozyx whose RX buffer holds the last frame given to deliver."""
+
+    def __init__(self):
+        self.sender_id, self.value = 0, 0
+
+    def deliver(self, sender_id: int, value: int) -> None:
+        self.sender_id, self.value = sender_id, value
+
+    def getRxInfo(self, rx_info, remote_id=None) -> int:
+        rx_info.load([self.sender_id, MESSAGE_SIZE])
+        return 1
+
+    def readRXBufferData(self, data, offset=0) -> int:
+        data.load([CUSTOM_MESSAGE_SIGNATURE, self.value])
+        return 1
+
+
+class NoLock:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def traffic(neighbors: int, duration: float, seed: int):
+    """Yields (time, sender_id, data) of the frames sent by the neighbors."""
+
+    rng = random.Random(seed)
+    interval = 1 / (2 * neighbors)
+    for second in range(int(duration)):
+        for index in range(neighbors):
+            sender_id = TAG_BASE_ID + index + 1
+            clock = (second * 1000 + index) >> 2
+            yield second + 2 * index * interval, sender_id, (1 << 30) | (clock & 0x3FFFFFFF)
+            slot, code = rng.randrange(40), rng.choice([-1, rng.randrange(1, 41)])
+            yield second + (2 * index + 1) * interval, sender_id, \
+                (MessageType.TDMA << 30) | (slot << 15) | (16384 - code if code < 0 else code)
+
+
+def size_of(received_messages) -> int:
+    if isinstance(received_messages, DuplicateFilter):
+        return sys.getsizeof(received_messages.last_seen)
+    return sys.getsizeof(received_messages)
+
+
+def measure(received_messages, args) -> list:
+    clock = VirtualClock()
+    set_clock_source(clock)
+    pozyx = ScriptedRxBuffer()
+    messenger = Messenger(TAG_BASE_ID, pozyx, Neighborhood(), SlotAssignment(), NoLock(), None)
+    messenger.received_messages = received_messages
+
+    rows, calls, elapsed, next_report = [], 0, 0.0, REPORT_PERIOD
+    for timestamp, sender_id, data in traffic(args.neighbors, args.duration, args.seed):
+        if timestamp >= next_report:
+            rows.append((next_report, calls, elapsed, len(received_messages), size_of(received_messages)))
+            calls, elapsed, next_report = 0, 0.0, next_report + REPORT_PERIOD
+
+        pozyx.deliver(sender_id, data)
+        for _ in range(args.reads):
+            clock.advance_to(timestamp)
+            start = wall_perf_counter()
+            messenger.receive_new_message(State.TASK)
+            elapsed += wall_perf_counter() - start
+            messenger.message_box.clear()
+            messenger.should_go_back_to_sync = 0  # The node stays in the task phase
+            calls += 1
+
+    rows.append((next_report, calls, elapsed, len(received_messages), size_of(received_messages)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--neighbors', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=3600, help="seconds of simulated time")
+    parser.add_argument('--reads', type=int, default=3, help="reads of each frame from the RX buffer")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'structure':16} {'time (s)':>9} {'mean call (us)':>15} {'entries':>8} {'bytes':>10}")
+    for name, received_messages in [('set', LegacyReceivedMessages()), ('DuplicateFilter', DuplicateFilter())]:
+        for timestamp, calls, elapsed, entries, size in measure(received_messages, args):
+            print(f"{name:16} {timestamp:9.0f} {elapsed / max(calls, 1) * 1e6:15.2f} {entries:8} {size:10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Measures the number of filter updates per second of the filterpy based CustomEKF
+and of the specialized ConstantVelocityEKF on the same sequence of measurements,
+and checks that both filters end in the same state. Then compares fusing the ranges
+to all the anchors in a single ranging update with one update per range.
+
+Usage: python benchmarks/ekf_benchmark.py --updates 20000
+"""
+
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from ekf.constantVelocityEKF import ConstantVelocityEKF
+from ekf.ekf import CustomEKF
+
+START_TIME = 1.6e9
+UPDATE_PERIOD = 0.05  # s
+ANCHORS = np.array([[0, 0, 2000], [3500, 0, 2000], [3500, 4000, 2000], [0, 4000, 2000]], dtype=float)
+
+
+def generate_measurements(nb_updates: int, seed: int) -> list:
+    """Walk at 1 m/s with a mix of trilateration, pedometer, ranging and zero movement updates."""
+
+    rng = random.Random(seed)
+    measurements = []
+    for i in range(nb_updates):
+        timestamp = START_TIME + (i + 1) * UPDATE_PERIOD
+        true_position = np.array([1750 + 1000 * np.cos(i / 200), 2000 + 1000 * np.sin(i / 200), 1200])
+        yaw = (np.degrees(i / 200) + 90) % 360
+        kind = ('trilateration', 'pedometer', 'ranging', 'ranging', 'zero_movement')[i % 5]
+
+        if kind == 'ranging':
+            distances = [np.linalg.norm(true_position - anchor) + rng.gauss(0, 30) for anchor in ANCHORS[:3]]
+            measurements.append((kind, (np.array(distances), yaw, timestamp, ANCHORS[:3])))
+        else:
+            noisy = [axis + rng.gauss(0, 100) for axis in true_position]
+            measurements.append((kind, (Coordinates(*noisy), yaw, timestamp)))
+
+    return measurements
+
+
+def run(filter_class, measurements: list) -> tuple:
+    ekf = filter_class(Coordinates(2750, 2000, 1200), 90)
+    ekf.trilateration_update(Coordinates(2750, 2000, 1200), 90, START_TIME)
+    updates = {kind: getattr(ekf, kind + '_update') for kind in ('trilateration', 'pedometer', 'ranging',
+                                                                  'zero_movement')}
+
+    if filter_class is CustomEKF:
+        # CustomEKF takes at most three ranges, in Coordinates
+        measurements = [(kind, (Coordinates(*arguments[0]),) + arguments[1:] if kind == 'ranging' else arguments)
+                        for kind, arguments in measurements]
+
+    start = perf_counter()
+    for kind, arguments in measurements:
+        updates[kind](*arguments)
+
+    return perf_counter() - start, ekf
+
+
+def run_ranging(nb_slots: int, fused: bool, seed: int) -> float:
+    """One slot ranges to every anchor, its ranges are fused at once or applied one by one."""
+
+    rng = random.Random(seed)
+    ekf = ConstantVelocityEKF(Coordinates(1750, 2000, 1200), 90)
+    ekf.trilateration_update(Coordinates(1750, 2000, 1200), 90, START_TIME)
+    position = np.array([1750, 2000, 1200])
+    slots = [(START_TIME + (i + 1) * UPDATE_PERIOD,
+              np.array([np.linalg.norm(position - anchor) + rng.gauss(0, 30) for anchor in ANCHORS]))
+             for i in range(nb_slots)]
+
+    start = perf_counter()
+    for timestamp, distances in slots:
+        if fused:
+            ekf.ranging_update(distances, 90, timestamp, ANCHORS)
+        else:
+            for i in range(len(ANCHORS)):
+                ekf.ranging_update(distances[i:i + 1], 90, timestamp + i * 0.001, ANCHORS[i:i + 1])
+
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    measurements = generate_measurements(args.updates, args.seed)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        reference_duration, reference = run(CustomEKF, measurements)
+        duration, ekf = run(ConstantVelocityEKF, measurements)
+
+    print(f"{args.updates} updates")
+    print(f"CustomEKF           {args.updates / reference_duration:10.0f} updates/s")
+    print(f"ConstantVelocityEKF {args.updates / duration:10.0f} updates/s ({reference_duration / duration:.1f}x)")
+    print(f"Max state difference: {np.max(np.abs(reference.x - ekf.x)):.3g}, "
+          f"max covariance difference: {np.max(np.abs(reference.P - ekf.P)):.3g}")
+
+    nb_slots = args.updates // len(ANCHORS)
+    sequential_duration = run_ranging(nb_slots, False, args.seed)
+    fused_duration = run_ranging(nb_slots, True, args.seed)
+    print(f"{nb_slots} slots of {len(ANCHORS)} ranges")
+    print(f"One update per range {nb_slots / sequential_duration:10.0f} slots/s")
+    print(f"One update per slot  {nb_slots / fused_duration:10.0f} slots/s "
+          f"({sequential_duration / fused_duration:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Feeds the trilateration updates of recorded broadcast_state.csv logs to each filter,
+followed by a long stretch of zero movement updates and by the same log again,
+and reports the cost of an update, the conditioning of the covariance and the time
+the filter takes to converge at the start and after the stretch: until det(P) is within
+a factor of its value at the end of the pass.
+
+The square root filter gives the same cond(P) and det(P) as the constant velocity filter on the
+recorded logs, with or without --legacy-start: the Joseph form of the latter already keeps P
+well conditioned, the square root only adds cost.
+
+The particle filter is left out: its P is the spread of the particle cloud, which collapses on the
+axes the particles do not vary on, so cond(P) and det(P) say nothing about its stability.
+
+Usage: python benchmarks/filter_stability.py broadcast_state.csv --stretch 600
+"""
+
+
+import argparse
+import contextlib
+import csv
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from ekf import FILTERS
+from ekf.ekf import DT_THRESHOLD, CustomEKF
+from ekf.particleFilter import ParticleFilter
+
+TRILATERATION = 'UpdateType.TRILATERATION'
+
+
+def read_trilaterations(paths: list) -> list:
+    """Returns (timestamp, position, yaw) of the trilateration updates, the logs are put one after the other."""
+
+    measurements = []
+    for path in paths:
+        with open(path) as log:
+            rows = [row for row in csv.DictReader(log) if row['update_type'] == TRILATERATION]
+
+        offset = measurements[-1][0] + 1 - float(rows[0]['timestamp']) if measurements else 0
+        for row in rows:
+            measurements.append((float(row['timestamp']) + offset,
+                                 Coordinates(float(row['coords_pos_x']), float(row['coords_pos_y']),
+                                             float(row['coords_pos_z'])),
+                                 float(row['raw_yaw'])))
+
+    return measurements
+
+
+def convergence_time(samples: list, start: float, end: float, factor: float) -> float:
+    settled = factor * [determinant for timestamp, determinant in samples if timestamp <= end][-1]
+    for timestamp, determinant in samples:
+        if start <= timestamp <= end and determinant <= settled:
+            return timestamp - start
+
+    return float('inf')
+
+
+def run(name: str, filter_class, measurements: list, stretch: float, legacy_start: bool, factor: float) -> dict:
+    first_timestamp, first_position, first_yaw = measurements[0]
+    if filter_class is CustomEKF or legacy_start:
+        ekf = filter_class(first_position, first_yaw)
+    else:
+        ekf = filter_class(first_position, first_yaw, first_timestamp)
+
+    log_duration = measurements[-1][0] - first_timestamp
+    second_start = measurements[-1][0] + stretch + DT_THRESHOLD
+    schedule = [('trilateration', timestamp, position, yaw) for timestamp, position, yaw in measurements]
+    schedule += [('zero_movement', timestamp, None, None)
+                 for timestamp in np.arange(measurements[-1][0] + DT_THRESHOLD, second_start, DT_THRESHOLD)]
+    schedule += [('trilateration', timestamp - first_timestamp + second_start, position, yaw)
+                 for timestamp, position, yaw in measurements]
+
+    samples, durations, conditions = [], [], []
+    for kind, timestamp, position, yaw in schedule:
+        start = perf_counter()
+        if kind == 'trilateration':
+            ekf.trilateration_update(position, yaw, timestamp)
+        else:
+            ekf.zero_movement_update(ekf.get_position(), ekf.get_yaw(), timestamp)
+        durations.append(perf_counter() - start)
+
+        samples.append((timestamp, np.linalg.det(ekf.P)))
+        conditions.append(np.linalg.cond(ekf.P))
+
+    return {
+        'name': name,
+        'updates': len(schedule),
+        'log_s': log_duration,
+        'update_us': np.mean(durations) * 1e6,
+        'max_condition': max(conditions),
+        'max_determinant': max(determinant for _, determinant in samples),
+        'final_determinant': samples[-1][1],
+        'convergence_s': convergence_time(samples, first_timestamp, measurements[-1][0], factor),
+        'reconvergence_s': convergence_time(samples, second_start, schedule[-1][1], factor),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('logs', nargs='+', help="broadcast_state.csv files")
+    parser.add_argument('--stretch', type=float, default=600, help="seconds of zero movement between the two passes")
+    parser.add_argument('--factor', type=float, default=10, help="det(P) is settled within this factor")
+    parser.add_argument('--legacy-start', action='store_true',
+                        help="start every filter at time 0, as CustomEKF does, so the first prediction has a huge dt")
+    args = parser.parse_args()
+
+    measurements = read_trilaterations(args.logs)
+    filters = [('custom (filterpy)', CustomEKF)] + [(name, filter_class) for name, filter_class in FILTERS.items()
+                                                    if filter_class is not ParticleFilter]
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = [run(name, filter_class, measurements, args.stretch, args.legacy_start, args.factor)
+                   for name, filter_class in filters]
+
+    print(f"{len(measurements)} trilaterations over {results[0]['log_s']:.1f} s, twice, "
+          f"separated by {args.stretch:.0f} s of zero movement ({results[0]['updates']} updates)")
+    print(f"{'filter':20} {'update (us)':>12} {'max cond(P)':>12} {'max det(P)':>11} {'final det(P)':>12} "
+          f"{'convergence (s)':>16} {'after stretch (s)':>18}")
+    for result in results:
+        print(f"{result['name']:20} {result['update_us']:12.1f} {result['max_condition']:12.3g} "
+              f"{result['max_determinant']:11.3g} {result['final_determinant']:12.3g} "
+              f"{result['convergence_s']:16.2f} {result['reconvergence_s']:18.2f}")
+
+
+if __name__ == "__main__":
+    main()
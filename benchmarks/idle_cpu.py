@@ -0,0 +1,96 @@
+"""
+Measures the CPU used by the EKF manager process while it waits for updates: the former loop
+polling communication_queue.empty() against the blocking get with a zero movement deadline.
+
+A producer sends trilateration updates at --rate per second (0: the tag sends nothing,
+only the zero movement updates run) and the consumer runs in its own process for --duration seconds.
+
+Usage: python benchmarks/idle_cpu.py --duration 10 --rate 0
+       python benchmarks/idle_cpu.py --duration 10 --rate 10
+"""
+
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from time import process_time, sleep, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from ekf import EKFManager
+from ekf.ekf import DT_THRESHOLD
+from messages import UpdateMessage, UpdateType
+from simulation import RadioMedium, SimulatedPozyx
+
+
+def polling_loop(manager: EKFManager, end: float) -> None:
+    """The loop EKFManager.run used to spin in."""
+
+    while time() < end:
+        if not manager.communication_queue.empty():
+            manager.process_latest_state_info()
+        elif time() - manager.ekf.last_measurement_time > DT_THRESHOLD:
+            manager.ekf.zero_movement_update(
+                *manager.generate_zero_update_info(manager.ekf.last_measurement_time + DT_THRESHOLD))
+
+
+def event_loop(manager: EKFManager, end: float) -> None:
+    while time() < end:
+        manager.process_latest_state_info()
+
+
+def consume(loop, communication_queue, duration: float, results) -> None:
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        os.chdir(directory)  # The EKF manager writes its state next to it
+        pozyx = SimulatedPozyx(0x2001, RadioMedium(seed=0), Coordinates(1750, 2000, 1200))
+        manager = EKFManager(lambda pose: None, None, communication_queue, pozyx, threading.Lock(), 0x2001, False)
+        manager.initialize_ekf()
+
+        start_cpu, start = process_time(), time()
+        loop(manager, start + duration)
+        results.put((process_time() - start_cpu, time() - start))
+        manager.state_logger.close()
+
+
+def produce(communication_queue, duration: float, rate: float) -> None:
+    end = time() + duration
+    while True:
+        communication_queue.put(UpdateMessage.save(UpdateMessage(UpdateType.TRILATERATION, time(), measured_yaw=90,
+                                                                 measured_xyz=Coordinates(1750, 2000, 1200))))
+        if rate <= 0 or time() >= end:
+            return
+        sleep(1 / rate)
+
+
+def measure(loop, duration: float, rate: float) -> tuple:
+    communication_queue, results = multiprocessing.Queue(), multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=consume, args=(loop, communication_queue, duration, results))
+    consumer.start()
+    produce(communication_queue, duration, rate)
+    cpu, elapsed = results.get()
+    consumer.join()
+    return cpu, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10, help="seconds measured per loop")
+    parser.add_argument('--rate', type=float, default=0, help="trilateration updates per second")
+    args = parser.parse_args()
+
+    print(f"{args.duration:.0f} s, {args.rate:g} updates/s")
+    print(f"{'loop':20} {'CPU (s)':>8} {'CPU (%)':>8}")
+    for name, loop in [('polling', polling_loop), ('event-driven', event_loop)]:
+        cpu, elapsed = measure(loop, args.duration, args.rate)
+        print(f"{name:20} {cpu:8.2f} {100 * cpu / elapsed:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Compares the messages exchanged between the CLAMOUR processes as pickled (class, __dict__) tuples,
+as they used to be, with the struct packed bytes of messages.wireFormat.
+
+For each kind of message, reports its size once pickled by multiprocessing.Queue, the cost of
+encoding and decoding it in a single process, and the throughput of a producer sending it
+through a multiprocessing.Queue to a consumer process that decodes it.
+Then compares the multiprocessing.Queue with a SharedMemoryQueue as the transport of packed messages
+sent at --rate per second: time spent in put by the producer and latency until the consumer gets them.
+
+Usage: python benchmarks/ipc_benchmark.py --messages 20000 --rate 1000
+"""
+
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+from struct import Struct
+from time import monotonic, perf_counter, sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from interfaces import State
+from messages import CustomOdometryMessage, PoseMessage, SoundMessage, UpdateMessage, UpdateType
+from sharedMemoryQueue import SharedMemoryQueue
+
+SLOTS = [slot if slot % 3 else -1 for slot in range(40)]
+SENT_TIME = Struct('<d')
+TOPOLOGY = {0x2001: (None, 592553.027829798, State.TASK), 0x2024: (None, 592553.027833038, State.TASK)}
+
+
+def sample_messages() -> list:
+    return [
+        ('trilateration', UpdateMessage(UpdateType.TRILATERATION, 1659728298.22, 1857.98, 0.5, 90.0,
+                                        Coordinates(456, -105, 2448), SLOTS, topology=TOPOLOGY)),
+        ('ranging (4 ranges)', UpdateMessage(UpdateType.RANGING, 1659728298.22, 1857.98, 0.5, 90.0,
+                                             Coordinates(3000, 3100, 3200), SLOTS,
+                                             np.array([[0, 0, 2000], [5000, 0, 2000], [0, 5000, 2000],
+                                                       [5000, 5000, 2000]]), TOPOLOGY, [3000, 3100, 3200, 3300])),
+        ('pedometer', UpdateMessage(UpdateType.PEDOMETER, 1659728298.22, measured_yaw=90.0)),
+        ('sound', SoundMessage(Coordinates(456, -105, 2448))),
+        ('custom odometry', CustomOdometryMessage(PoseMessage(456, -105, 2448, 90.0), np.eye(4) * 20, 1659728298.22)),
+    ]
+
+
+def legacy_save(message) -> tuple:
+    return message.__class__, {name: getattr(message, name) for name in message.__slots__}
+
+
+def legacy_load(cls, attributes):
+    message = cls.__new__(cls)
+    for name, value in attributes.items():
+        setattr(message, name, value)
+    return message
+
+
+def legacy_round_trip(message):
+    return legacy_load(*pickle.loads(pickle.dumps(legacy_save(message))))
+
+
+def packed_round_trip(message):
+    return UpdateMessage.load(pickle.loads(pickle.dumps(UpdateMessage.save(message))))
+
+
+def round_trip_time(round_trip, message, nb_messages: int) -> float:
+    start = perf_counter()
+    for _ in range(nb_messages):
+        round_trip(message)
+    return (perf_counter() - start) / nb_messages
+
+
+def consume(queue, legacy: bool, nb_messages: int) -> None:
+    for _ in range(nb_messages):
+        if legacy:
+            legacy_load(*queue.get())
+        else:
+            UpdateMessage.load(queue.get())
+
+
+def throughput(message, legacy: bool, nb_messages: int) -> float:
+    """Messages per second sent through a multiprocessing.Queue and decoded by another process."""
+
+    queue = multiprocessing.Queue(maxsize=20)
+    consumer = multiprocessing.Process(target=consume, args=(queue, legacy, nb_messages))
+    consumer.start()
+
+    start = perf_counter()
+    for _ in range(nb_messages):
+        queue.put(legacy_save(message) if legacy else UpdateMessage.save(message))
+    consumer.join()
+    return nb_messages / (perf_counter() - start)
+
+
+def consume_timed(queue, nb_messages: int, results) -> None:
+    latencies = []
+    for _ in range(nb_messages):
+        data = queue.get()
+        latencies.append(monotonic() - SENT_TIME.unpack_from(data)[0])
+        UpdateMessage.load(data[SENT_TIME.size:])
+    results.put(latencies)
+
+
+def paced_transfer(message, queue, nb_messages: int, rate: float) -> tuple:
+    """Sends the message rate times per second, prefixed with the time it is sent.
+    Returns the mean time of put and the latencies measured by the consumer process."""
+
+    results = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=consume_timed, args=(queue, nb_messages, results))
+    consumer.start()
+    data = UpdateMessage.save(message)
+
+    put_time, start = 0.0, perf_counter()
+    for i in range(nb_messages):
+        sleep(max(start + i / rate - perf_counter(), 0))
+        before = perf_counter()
+        queue.put(SENT_TIME.pack(monotonic()) + data)
+        put_time += perf_counter() - before
+
+    latencies = np.array(results.get())
+    consumer.join()
+    return put_time / nb_messages, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help="messages per measurement")
+    parser.add_argument('--rate', type=float, default=1000, help="messages per second sent through the transports")
+    args = parser.parse_args()
+
+    print(f"{'message':20} {'format':8} {'bytes':>6} {'encode+decode (us)':>19} {'through a queue (msg/s)':>24}")
+    for name, message in sample_messages():
+        for format_name, legacy, round_trip, encoded in [
+                ('pickle', True, legacy_round_trip, pickle.dumps(legacy_save(message))),
+                ('struct', False, packed_round_trip, pickle.dumps(UpdateMessage.save(message)))]:
+            print(f"{name:20} {format_name:8} {len(encoded):6} "
+                  f"{round_trip_time(round_trip, message, args.messages) * 1e6:19.2f} "
+                  f"{throughput(message, legacy, args.messages):24.0f}")
+
+    print(f"\n{args.rate:g} messages/s")
+    print(f"{'message':20} {'transport':14} {'put (us)':>9} {'p50 latency (us)':>17} {'p99 latency (us)':>17} {'drops':>6}")
+    for name, message in sample_messages():
+        for transport, queue in [('queue', multiprocessing.Queue(maxsize=20)), ('shared memory', SharedMemoryQueue())]:
+            put_time, latencies = paced_transfer(message, queue, args.messages, args.rate)
+            drops = '' if transport == 'queue' else queue.statistics()['dropped_newest'] + \
+                queue.statistics()['dropped_oldest'] + queue.statistics()['oversized']
+            print(f"{name:20} {transport:14} {put_time * 1e6:9.2f} {np.percentile(latencies, 50) * 1e6:17.1f} "
+                  f"{np.percentile(latencies, 99) * 1e6:17.1f} {drops:>6}")
+            if transport == 'shared memory':
+                queue.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Measures the update latency and the accuracy of the particle filter for several numbers
+of particles, on a walk through the floorplan, next to the constant velocity EKF.
+The walk goes through the door from room 25 to room 24 and back, then along the outer wall of
+room 25: the particles pushed through that wall by the noise are the blocked moves.
+Run it on the target (Raspberry Pi) to choose the number of particles.
+
+Usage: python benchmarks/particle_benchmark.py --particles 100,300,1000,3000 --updates 2000
+"""
+
+
+import argparse
+import contextlib
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from ekf.constantVelocityEKF import ConstantVelocityEKF
+from ekf.particleFilter import ParticleFilter
+from rooms import Floorplan
+
+UPDATE_PERIOD = 0.1  # s
+MEASUREMENT_STD = 150  # mm
+WALK_SPEED = 1000  # mm/s
+ROOM = '25'
+ROUTE = [('25', 0, 0), ('24', 0, 0), ('25', 0, 0), ('25', -1, 0.8), ('25', -1, -0.8), ('25', 0, 0)]  # room, x and y in half extents
+ANCHOR_OFFSETS = np.array([[-4000, -7000, 2000], [4000, -7000, 2000], [4000, 7000, 2000], [-4000, 7000, 2000]])
+
+
+def route_position(floorplan: Floorplan, distance: float) -> np.ndarray:
+    """Position on the ROUTE loop after walking the given distance."""
+
+    waypoints = [np.array([floorplan.rooms[label].x + x * floorplan.rooms[label].x_lim[0],
+                           floorplan.rooms[label].y + y * floorplan.rooms[label].y_lim[0], 1200])
+                 for label, x, y in ROUTE]
+    legs = list(zip(waypoints, waypoints[1:] + waypoints[:1]))
+    distance %= sum(np.linalg.norm(end - start) for start, end in legs)
+
+    for start, end in legs:
+        length = np.linalg.norm(end - start)
+        if distance <= length:
+            return start + (end - start) * distance / length
+        distance -= length
+
+
+def generate_walk(floorplan: Floorplan, nb_updates: int, seed: int) -> list:
+    """Loops over the ROUTE, with trilaterations and ranging updates to four anchors in alternance."""
+
+    rng = np.random.default_rng(seed)
+    room = floorplan.rooms[ROOM]
+    anchors = np.array([room.x, room.y, 1200]) + ANCHOR_OFFSETS
+    walk = []
+
+    for i in range(nb_updates):
+        timestamp = (i + 1) * UPDATE_PERIOD
+        truth = route_position(floorplan, timestamp * WALK_SPEED)
+        heading = route_position(floorplan, timestamp * WALK_SPEED + 1) - truth
+        yaw = np.degrees(np.arctan2(heading[1], heading[0])) % 360
+
+        if i % 2:
+            ranges = np.linalg.norm(truth - anchors, axis=1) + rng.normal(0, MEASUREMENT_STD, len(anchors))
+            walk.append(('ranging', truth, (ranges, yaw, timestamp, anchors)))
+        else:
+            measured = Coordinates(*(truth + rng.normal(0, MEASUREMENT_STD, 3)))
+            walk.append(('trilateration', truth, (measured, yaw, timestamp)))
+
+    return walk
+
+
+def run(ekf, walk: list) -> dict:
+    durations = {'trilateration': [], 'ranging': []}
+    errors = []
+
+    for kind, truth, arguments in walk:
+        update = ekf.trilateration_update if kind == 'trilateration' else ekf.ranging_update
+        start = perf_counter()
+        update(*arguments)
+        durations[kind].append(perf_counter() - start)
+        errors.append(np.linalg.norm(truth[:2] - [ekf.x[0], ekf.x[2]]))
+
+    return {
+        'trilateration_us': np.mean(durations['trilateration']) * 1e6,
+        'ranging_us': np.mean(durations['ranging']) * 1e6,
+        'p99_us': np.percentile(durations['trilateration'] + durations['ranging'], 99) * 1e6,
+        'rmse_mm': np.sqrt(np.mean(np.square(errors[len(errors) // 10:]))),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--particles', default='100,300,1000,3000,10000')
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        floorplan = Floorplan()
+    walk = generate_walk(floorplan, args.updates, args.seed)
+    start_position = Coordinates(*walk[0][1])
+    start_yaw = walk[0][2][1]
+
+    print(f"{'filter':24} {'trilateration (us)':>19} {'ranging (us)':>13} {'p99 (us)':>9} {'rmse (mm)':>10} {'blocked':>8}")
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = run(ConstantVelocityEKF(start_position, start_yaw, 0), walk)
+    print(f"{'constant velocity EKF':24} {result['trilateration_us']:19.1f} {result['ranging_us']:13.1f} "
+          f"{result['p99_us']:9.1f} {result['rmse_mm']:10.1f} {'':>8}")
+
+    for nb_particles in [int(value) for value in args.particles.split(',')]:
+        ekf = ParticleFilter(start_position, start_yaw, 0, nb_particles, floorplan, args.seed)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = run(ekf, walk)
+        print(f"{'particles ' + str(nb_particles):24} {result['trilateration_us']:19.1f} {result['ranging_us']:13.1f} "
+              f"{result['p99_us']:9.1f} {result['rmse_mm']:10.1f} {ekf.blocked_moves:8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures the IMU sample rate the pedometer reaches, and what it costs the TDMA process, when it reads
+the sensors with three register reads under three lock acquisitions, as it used to, and with the
+single getAllSensorData block read of Pedometer.get_sensor_data.
+
+The device is a simulation.SerialLinePozyx shared behind a multiprocessing.Lock, with --exchange
+seconds per serial exchange. A radio process polls getRxInfo + readRXBufferData every 2 ms.
+The pedometer aims at each of the --rates (0: as fast as it can) for --duration seconds.
+
+Usage: python benchmarks/pedometer_rate.py --duration 5 --rates 100 200 400 0
+"""
+
+
+import argparse
+import multiprocessing
+import os
+import sys
+from queue import Queue
+from time import perf_counter, sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Data, RXInfo, SensorData
+
+from pedometer import Pedometer
+from simulation import SerialLinePozyx
+
+
+class LegacyPedometer(Pedometer):
+    """Reads the acceleration, the Euler angles and the gravity vector separately, as the pedometer used to."""
+
+    def get_sensor_data(self) -> SensorData:
+        sensor_data = SensorData([0] * len(SensorData.data_format))
+        with self.pozyx_lock:
+            self.pozyx.getAcceleration_mg(sensor_data.acceleration)
+        with self.pozyx_lock:
+            self.pozyx.getEulerAngles_deg(sensor_data.euler_angles)
+        with self.pozyx_lock:
+            self.pozyx.getGravityVector_mg(sensor_data.gravity_vector)
+        return sensor_data
+
+
+def sample(pedometer: Pedometer, rate: float, duration: float, results) -> None:
+    samples, start = 0, perf_counter()
+    next_sample = start
+    while perf_counter() - start < duration:
+        pedometer.step()
+        samples += 1
+        if rate > 0:
+            next_sample += 1 / rate
+            sleep(max(next_sample - perf_counter(), 0))
+
+    results.put(('samples', samples))
+
+
+def poll_radio(pozyx, lock, duration: float, results) -> None:
+    latencies, info, data = [], RXInfo(), Data([0, 0], 'BI')
+    start = perf_counter()
+    while perf_counter() - start < duration:
+        before = perf_counter()
+        with lock:
+            pozyx.getRxInfo(info)
+        with lock:
+            pozyx.readRXBufferData(data)
+        latencies.append(perf_counter() - before)
+        sleep(0.002)
+
+    results.put(('radio', latencies))
+
+
+def measure(pedometer_class, rate: float, args) -> tuple:
+    pozyx = SerialLinePozyx(args.exchange)
+    lock = multiprocessing.Lock()
+    pedometer = pedometer_class(Queue(), pozyx, lock)
+    results = multiprocessing.Queue()
+
+    processes = [multiprocessing.Process(target=sample, args=(pedometer, rate, args.duration, results)),
+                 multiprocessing.Process(target=poll_radio, args=(pozyx, lock, args.duration, results))]
+    for process in processes:
+        process.start()
+    measurements = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    polls = np.array(measurements['radio'])
+    radio_exchanges = 2 * len(polls)
+    return measurements['samples'], (pozyx.exchanges.value - radio_exchanges) / max(measurements['samples'], 1), polls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--exchange', type=float, default=0.001, help="duration of a serial exchange (s)")
+    parser.add_argument('--rates', type=float, nargs='+', default=[100, 200, 400, 0],
+                        help="sample rates aimed at (Hz), 0 for as fast as possible")
+    args = parser.parse_args()
+
+    print(f"{'reads':18} {'target (Hz)':>11} {'reached (Hz)':>12} {'exchanges/sample':>16} "
+          f"{'radio p50 (ms)':>14} {'radio p99 (ms)':>14}")
+    for rate in args.rates:
+        for name, pedometer_class in [('three registers', LegacyPedometer), ('getAllSensorData', Pedometer)]:
+            samples, exchanges, polls = measure(pedometer_class, rate, args)
+            print(f"{name:18} {rate if rate else 'max':>11} {samples / args.duration:12.1f} {exchanges:16.2f} "
+                  f"{np.percentile(polls, 50) * 1e3:14.2f} {np.percentile(polls, 99) * 1e3:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
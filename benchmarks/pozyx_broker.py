@@ -0,0 +1,178 @@
+"""
+Compares a Pozyx shared by the CLAMOUR processes behind a multiprocessing.Lock, as it used to be,
+with a PozyxBroker process owning it and serving PozyxClients.
+
+The device is a simulation.SerialLinePozyx: every serial exchange takes --exchange seconds,
+positioning and discovery take longer.
+Three processes use it as CLAMOUR does:
+  radio: polls getRxInfo + readRXBufferData, sends a message every 25 ms, positions every second
+         and discovers the devices every --discovery-period seconds
+  imu: reads acceleration, Euler angles and gravity vector at --imu-rate
+  ekf: reads and writes the coordinates at 5 Hz
+Reports the latency of the calls of each process (including the wait for the lock or the broker),
+the IMU sample rate reached and the serial exchanges.
+
+Usage: python benchmarks/pozyx_broker.py --duration 10 --exchange 0.001
+"""
+
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+from time import perf_counter, sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Acceleration, Coordinates, Data, EulerAngles, RXInfo
+
+from pozyxBroker import PozyxBroker
+from simulation import SerialLinePozyx
+
+
+def timed(latencies: list, call) -> None:
+    start = perf_counter()
+    call()
+    latencies.append(perf_counter() - start)
+
+
+def radio(pozyx, lock, args, results) -> None:
+    polls, sends, positionings = [], [], []
+    info, data = RXInfo(), Data([0, 0], 'BI')
+
+    def poll():
+        with lock:
+            pozyx.getRxInfo(info)
+        with lock:
+            pozyx.readRXBufferData(data)
+
+    def send():
+        with lock:
+            pozyx.sendData(destination=0, data=Data([0xAA, 0x12345678], 'BI'))
+
+    def position():
+        with lock:
+            pozyx.doPositioning(Coordinates())
+
+    start = perf_counter()
+    next_send, next_positioning, next_discovery = start, start + 1, start + args.discovery_period
+    while perf_counter() - start < args.duration:
+        timed(polls, poll)
+        if perf_counter() >= next_send:
+            timed(sends, send)
+            next_send += 0.025
+        if perf_counter() >= next_positioning:
+            timed(positionings, position)
+            next_positioning += 1
+        if perf_counter() >= next_discovery:
+            with lock:
+                pozyx.doDiscovery()
+            next_discovery += args.discovery_period
+        sleep(0.002)
+
+    results.put(('radio', {'poll': polls, 'sendData': sends, 'doPositioning': positionings}))
+
+
+def imu(pozyx, lock, args, results) -> None:
+    reads = []
+    acceleration, angles, gravity = Acceleration(), EulerAngles(), Acceleration()
+
+    def read_sensors():
+        if hasattr(pozyx, 'call_all'):
+            pozyx.call_all([('getAcceleration_mg', (acceleration,), None), ('getEulerAngles_deg', (angles,), None),
+                            ('getGravityVector_mg', (gravity,), None)])
+        else:
+            with lock:
+                pozyx.getAcceleration_mg(acceleration)
+                pozyx.getEulerAngles_deg(angles)
+                pozyx.getGravityVector_mg(gravity)
+
+    start = perf_counter()
+    while perf_counter() - start < args.duration:
+        timed(reads, read_sensors)
+        sleep(max(1 / args.imu_rate - reads[-1], 0))
+
+    results.put(('imu', {'sensors': reads}))
+
+
+def ekf(pozyx, lock, args, results) -> None:
+    reads, writes = [], []
+    coordinates = Coordinates()
+
+    def read():
+        with lock:
+            pozyx.getCoordinates(coordinates)
+
+    def write():
+        with lock:
+            pozyx.setCoordinates(Coordinates(1000, 2000, 1200))
+
+    start = perf_counter()
+    while perf_counter() - start < args.duration:
+        timed(reads, read)
+        timed(writes, write)
+        sleep(0.2)
+
+    results.put(('ekf', {'getCoordinates': reads, 'setCoordinates': writes}))
+
+
+def measure(args, use_broker: bool) -> tuple:
+    device = SerialLinePozyx(args.exchange, args.positioning, args.discovery)
+    results = multiprocessing.Queue()
+    processes = []
+
+    if use_broker:
+        broker = PozyxBroker(lambda: device, report_period=float('inf'))
+        clients = [broker.client() for _ in range(4)]
+        broker_process = multiprocessing.Process(target=broker.run, daemon=True)
+        broker_process.start()
+        devices, lock = clients[:3], contextlib.nullcontext()
+    else:
+        devices, lock = [device] * 3, multiprocessing.Lock()
+
+    for target, pozyx in zip([radio, imu, ekf], devices):
+        processes.append(multiprocessing.Process(target=target, args=(pozyx, lock, args, results)))
+        processes[-1].start()
+
+    latencies = dict(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    statistics = None
+    if use_broker:
+        statistics = clients[3].statistics()
+        broker_process.terminate()
+
+    return latencies, device.exchanges.value, statistics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--exchange', type=float, default=0.001, help="duration of a serial exchange (s)")
+    parser.add_argument('--positioning', type=float, default=0.03, help="duration of doPositioning (s)")
+    parser.add_argument('--discovery', type=float, default=0.2, help="duration of doDiscovery (s)")
+    parser.add_argument('--discovery-period', type=float, default=3)
+    parser.add_argument('--imu-rate', type=float, default=100, help="IMU reads per second")
+    args = parser.parse_args()
+
+    for name, use_broker in [('lock', False), ('broker', True)]:
+        latencies, exchanges, statistics = measure(args, use_broker)
+        print(f"\n{name}: {exchanges} serial exchanges, "
+              f"IMU rate {len(latencies['imu']['sensors']) / args.duration:.1f} Hz")
+        print(f"{'process':6} {'call':15} {'calls':>6} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}")
+        for process, calls in latencies.items():
+            for call, values in calls.items():
+                values = np.array(values) * 1e3
+                print(f"{process:6} {call:15} {len(values):6} {np.percentile(values, 50):9.2f} "
+                      f"{np.percentile(values, 99):9.2f} {values.max():9.2f}")
+        if statistics is not None:
+            print(f"batched requests: {statistics['batched_requests']}, "
+                  f"saved exchanges: {statistics['saved_exchanges']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures how long trilateration updates wait in the communication channel when the TDMA process
+floods it with topology updates faster than the EKF consumes them: single FIFO (multiprocessing.Queue)
+against a PriorityChannel with each service policy.
+
+A producer process sends --topology-rate topology updates and --trilateration-rate trilaterations
+per second. The consumer takes one message at a time and spends --cost seconds on each.
+The age of the topologies it gets tells how recent a topology the EKF works with.
+
+Usage: python benchmarks/priority_lanes.py --duration 5 --topology-rate 2000 --cost 0.001
+"""
+
+
+import argparse
+import multiprocessing
+import os
+import sys
+from time import monotonic, perf_counter, sleep
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import Coordinates
+
+from interfaces import State
+from messages import UpdateMessage, UpdateType
+from priorityChannel import PriorityChannel, ServicePolicy
+
+TOPOLOGY = {0x2001: (None, 592553.027829798, State.TASK), 0x2024: (None, 592553.027833038, State.TASK)}
+
+
+def produce(channel, duration: float, topology_rate: float, trilateration_rate: float) -> None:
+    start = perf_counter()
+    next_topology, next_trilateration = start, start
+    while perf_counter() - start < duration:
+        now = perf_counter()
+        if now >= next_trilateration:
+            channel.put(UpdateMessage.save(UpdateMessage(UpdateType.TRILATERATION, monotonic(), measured_yaw=90,
+                                                         measured_xyz=Coordinates(1750, 2000, 1200))))
+            next_trilateration += 1 / trilateration_rate
+        elif now >= next_topology:
+            try:
+                channel.put(UpdateMessage.save(UpdateMessage(UpdateType.TOPOLOGY, monotonic(), topology=TOPOLOGY)),
+                            timeout=0.5)
+            except Exception:
+                pass
+            next_topology += 1 / topology_rate
+        else:
+            sleep(min(next_topology, next_trilateration) - now)
+
+
+def consume(channel, duration: float, cost: float, results) -> None:
+    waits, ages = [], []
+    end = monotonic() + duration + 1
+    while monotonic() < end:
+        try:
+            message = UpdateMessage.load(channel.get(timeout=0.1))
+        except Exception:
+            continue
+
+        if message.update_type == UpdateType.TRILATERATION:
+            waits.append(monotonic() - message.timestamp)
+        else:
+            ages.append(monotonic() - message.timestamp)
+        sleep(cost)
+
+    results.put((waits, ages))
+
+
+def measure(channel, args) -> tuple:
+    results = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=consume, args=(channel, args.duration, args.cost, results))
+    consumer.start()
+    producer = multiprocessing.Process(target=produce, args=(channel, args.duration, args.topology_rate,
+                                                             args.trilateration_rate))
+    producer.start()
+
+    waits, ages = results.get()
+    producer.join()
+    consumer.join()
+    return np.array(waits), np.array(ages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--topology-rate', type=float, default=2000, help="topology updates per second")
+    parser.add_argument('--trilateration-rate', type=float, default=10, help="trilaterations per second")
+    parser.add_argument('--cost', type=float, default=0.001, help="seconds spent by the consumer per message")
+    args = parser.parse_args()
+
+    channels = [('single FIFO', multiprocessing.Queue(maxsize=20)),
+                ('lanes, strict', PriorityChannel(service_policy=ServicePolicy.STRICT)),
+                ('lanes, weighted', PriorityChannel(service_policy=ServicePolicy.WEIGHTED)),
+                ('lanes, shared memory', PriorityChannel(shared_memory=True))]
+
+    print(f"{'channel':22} {'trilaterations':>14} {'p50 wait (ms)':>14} {'p99 wait (ms)':>14} {'topologies':>11} "
+          f"{'p50 topology age (ms)':>22}")
+    for name, channel in channels:
+        waits, ages = measure(channel, args)
+        print(f"{name:22} {len(waits):14} {np.percentile(waits, 50) * 1e3:14.2f} "
+              f"{np.percentile(waits, 99) * 1e3:14.2f} {len(ages):11} {np.percentile(ages, 50) * 1e3:22.2f}")
+        if isinstance(channel, PriorityChannel):
+            print(f"{'':22} dropped topologies: {channel.statistics()['TOPOLOGY']['dropped']}")
+            channel.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Replays a Pozyx trace into the hot paths of CLAMOUR and reports their latency:
+Messenger.receive_new_message, Pedometer.detect_step and EKFManager.process_latest_state_info.
+
+A trace is recorded on a tag with Clamour([], pozyx_factory=lambda: RecordingPozyx(connect_pozyx(), path)).
+Without a tag, --record-simulated writes a synthetic walk recorded on a simulated device.
+
+Usage: python benchmarks/replay_benchmark.py --record-simulated walk.trace
+       python benchmarks/replay_benchmark.py walk.trace
+"""
+
+
+import argparse
+import contextlib
+import math
+import os
+import sys
+import tempfile
+import threading
+from queue import Queue
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from pypozyx import POZYX_3D, POZYX_POS_ALG_UWB_ONLY, POZYX_SUCCESS, Coordinates, DeviceRange, EulerAngles
+
+from clockSource import ClockSource, set_clock_source
+from ekf import EKFManager
+from interfaces import Anchors, Neighborhood, SlotAssignment, State
+from messages import UpdateMessage, UpdateType
+from messenger import Messenger
+from pedometer import Pedometer
+from pozyx_utils import RecordingPozyx
+from pozyx_utils.pozyxTrace import read_trace
+from simulation import RadioMedium, ReplayPozyx, SimulatedPozyx, VirtualClock, add_anchors
+
+SAMPLE_PERIOD = 0.01  # s, pedometer rate
+LOCALIZATION_PERIOD = 0.1  # s
+EULER_ANGLES_SCALING = 16
+
+
+def record_simulated_walk(path: str, duration: float) -> None:
+    """Records a tag walking in circles among the anchors while a neighbor broadcasts TDMA messages."""
+
+    clock = VirtualClock()
+    set_clock_source(clock)
+    medium = RadioMedium(seed=0)
+    add_anchors(medium)
+    tag = SimulatedPozyx(0x2001, medium, Coordinates(1750, 2000, 1200))
+    neighbor = SimulatedPozyx(0x2002, medium, Coordinates(2000, 2500, 1200))
+    pozyx = RecordingPozyx(tag, path)
+    lock = threading.Lock()
+
+    messenger = Messenger(tag.network_id, pozyx, Neighborhood(), SlotAssignment(), lock, Queue())
+    neighbor_messenger = Messenger(neighbor.network_id, neighbor, Neighborhood(), SlotAssignment(), lock, Queue())
+    pedometer = Pedometer(Queue(), pozyx, lock)
+    anchors = Anchors()
+    for anchor in anchors.anchors_list:
+        pozyx.addDevice(anchor)
+
+    for i in range(int(duration / SAMPLE_PERIOD)):
+        t = i * SAMPLE_PERIOD
+        angle = 2 * math.pi * t / 60
+        tag.move_to(Coordinates(1750 + 1500 * math.cos(angle), 2000 + 1500 * math.sin(angle), 1200),
+                    heading=math.degrees(angle) % 360)
+        tag.acceleration = [0, int(1300 * math.sin(2 * math.pi * 1.8 * t)), 1000]
+
+        pedometer.step()
+        if i % 10 == 0:
+            neighbor_messenger.broadcast(i % 40, -1)
+        messenger.receive_new_message(State.LISTEN)
+
+        if i % int(LOCALIZATION_PERIOD / SAMPLE_PERIOD) == 0:
+            pozyx.doPositioning(Coordinates(), POZYX_3D, algorithm=POZYX_POS_ALG_UWB_ONLY)
+            pozyx.getEulerAngles_deg(EulerAngles())
+            pozyx.doRanging(anchors.anchors_list[i % len(anchors.anchors_list)].network_id, DeviceRange())
+            pozyx.getEulerAngles_deg(EulerAngles())
+
+        clock.sleep(SAMPLE_PERIOD)
+
+    set_clock_source(ClockSource())
+
+
+def update_messages_from_trace(path: str) -> list:
+    """Rebuilds the messages Task would have sent to the EKF from the positioning and ranging calls:
+    the heading read after them closes an update."""
+
+    anchors = Anchors().anchors_dict
+    messages, positioning, rangings = [], None, []
+
+    for record in read_trace(path):
+        if record.method == 'doPositioning' and record.result == POZYX_SUCCESS:
+            positioning = record
+        elif record.method == 'doRanging' and record.result == POZYX_SUCCESS and record.arguments[0] in anchors:
+            rangings.append(record)
+        elif record.method == 'getEulerAngles_deg' and record.result == POZYX_SUCCESS:
+            yaw = record.arguments[0].values[0] / EULER_ANGLES_SCALING
+            if positioning is not None:
+                messages.append(UpdateMessage(UpdateType.TRILATERATION, positioning.timestamp, measured_yaw=yaw,
+                                              measured_xyz=Coordinates(*positioning.arguments[0].values)))
+            elif rangings:
+                ranges = [ranging.arguments[1].values[1] for ranging in rangings]
+                neighbors = [[anchors[ranging.arguments[0]].pos.x, anchors[ranging.arguments[0]].pos.y,
+                              anchors[ranging.arguments[0]].pos.z] for ranging in rangings]
+                messages.append(UpdateMessage(UpdateType.RANGING, rangings[-1].timestamp, measured_yaw=yaw,
+                                              measured_xyz=Coordinates(*(ranges + [0, 0])[:3]),
+                                              neighbors=np.array(neighbors), ranges=ranges))
+            positioning, rangings = None, []
+
+    return messages
+
+
+def timed(function, durations: list):
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        durations.append(perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def report(name: str, durations: list) -> None:
+    if not durations:
+        print(f"{name:40} no calls")
+        return
+
+    microseconds = np.array(durations) * 1e6
+    print(f"{name:40} {len(durations):7} calls  mean {microseconds.mean():9.1f} us  "
+          f"p50 {np.percentile(microseconds, 50):9.1f} us  p99 {np.percentile(microseconds, 99):9.1f} us")
+
+
+def benchmark_messenger(path: str) -> list:
+    pozyx = ReplayPozyx(path)
+    messenger = Messenger(0x2001, pozyx, Neighborhood(), SlotAssignment(), threading.Lock(), Queue())
+    durations = []
+    receive = timed(messenger.receive_new_message, durations)
+
+    while pozyx.remaining_calls('getRxInfo') > 0:
+        receive(State.LISTEN)
+
+    return durations
+
+
+def benchmark_pedometer(path: str) -> list:
+    pozyx = ReplayPozyx(path)
+    pedometer = Pedometer(Queue(), pozyx, threading.Lock())
+    durations = []
+    pedometer.detect_step = timed(pedometer.detect_step, durations)
+
+    while pozyx.remaining_calls('getAllSensorData') > 0:
+        pedometer.step()
+
+    return durations
+
+
+def benchmark_ekf(path: str) -> list:
+    messages = update_messages_from_trace(path)
+    communication_queue = Queue()
+    for message in messages:
+        communication_queue.put(UpdateMessage.save(message))
+
+    durations = []
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # The EKF manager writes its state next to it
+        try:
+            manager = EKFManager(lambda pose: None, Queue(), communication_queue, ReplayPozyx(path),
+                                 threading.Lock(), 0x2001, False)
+            manager.initialize_ekf()
+            process = timed(manager.process_latest_state_info, durations)
+            while not communication_queue.empty():
+                process()
+            manager.state_logger.close()
+        finally:
+            os.chdir(working_directory)
+
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace')
+    parser.add_argument('--record-simulated', action='store_true', help="record a synthetic walk into the trace first")
+    parser.add_argument('--duration', type=float, default=120, help="duration of the synthetic walk (s)")
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if args.record_simulated:
+            if os.path.exists(args.trace):
+                os.remove(args.trace)
+            record_simulated_walk(args.trace, args.duration)
+
+        results = [('Messenger.receive_new_message', benchmark_messenger(args.trace)),
+                   ('Pedometer.detect_step', benchmark_pedometer(args.trace)),
+                   ('EKFManager.process_latest_state_info', benchmark_ekf(args.trace))]
+
+    print(f"Trace: {args.trace} ({os.path.getsize(args.trace)} bytes)")
+    for name, durations in results:
+        report(name, durations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Simulates TDMA nodes in virtual time and compares two receive paths of the Messenger:
+reading the RX info (and the RX buffer when it holds a message) on every tick, as it used to,
+and reading them only when the RX data interrupt is pending.
+
+Reports, per node and per simulated second, the Pozyx calls of the receive path (each one a serial
+exchange under the lock), the RX reads that found no new message, and the receive latency bound.
+--scheduling-cycles shortens the scheduling phase, so that the run reaches the task phase, where the
+tags send their topology pages.
+
+Usage: python benchmarks/rx_interrupts.py --nodes 10 --duration 60 --scheduling-cycles 10
+"""
+
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from clockSource import ClockSource, set_clock_source
+from simulation import RadioMedium, TDMASimulator, VirtualClock, add_anchors, apply_timing_parameters, create_tdma_nodes
+from states import State
+
+RECEIVE_CALLS = ['getInterruptStatus', 'getRxInfo', 'readRXBufferData']
+
+
+def simulate(nb_nodes: int, duration: float, seed: int, use_interrupts: bool) -> dict:
+    clock = VirtualClock()
+    set_clock_source(clock)
+    random.seed(seed)
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            medium = RadioMedium(seed=seed)
+            add_anchors(medium)
+            nodes = create_tdma_nodes(medium, nb_nodes, 10000, random.Random(seed))
+            simulator = TDMASimulator(clock)
+            for _, node in nodes:
+                node.states[State.LISTEN].messenger.use_interrupts = use_interrupts
+                simulator.add_node(node, start_delay=random.uniform(0, simulator.tick_period))
+
+            simulator.run_until(duration)
+    finally:
+        set_clock_source(ClockSource())
+
+    messengers = [node.states[State.LISTEN].messenger for _, node in nodes]
+    statistics = [messenger.receive_statistics() for messenger in messengers]
+    received = sum(statistic['received'] for statistic in statistics)
+    normalization = nb_nodes * duration
+    return {
+        'calls': {call: sum(pozyx.calls.get(call, 0) for pozyx, _ in nodes) / normalization for call in RECEIVE_CALLS},
+        'wasted_polls': sum(statistic['wasted_polls'] for statistic in statistics) / normalization,
+        'received': received / normalization,
+        'mean_latency': sum(messenger.receive_latency_sum for messenger in messengers) / max(received, 1),
+        'max_latency': max(statistic['max_receive_latency'] for statistic in statistics),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60, help="seconds of simulated time")
+    parser.add_argument('--scheduling-cycles', type=int, help="scheduling broadcast periods per cycle")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.scheduling_cycles is not None:
+        apply_timing_parameters(NB_SCHEDULING_CYCLES=args.scheduling_cycles)
+
+    print(f"{'receive path':13} {'int. status/s':>13} {'RX info/s':>10} {'RX buffer/s':>11} {'exchanges/s':>11} "
+          f"{'wasted/s':>9} {'received/s':>10} {'mean latency (ms)':>17} {'max latency (ms)':>16}")
+    for name, use_interrupts in [('polling', False), ('interrupts', True)]:
+        result = simulate(args.nodes, args.duration, args.seed, use_interrupts)
+        calls = result['calls']
+        print(f"{name:13} {calls['getInterruptStatus']:13.1f} {calls['getRxInfo']:10.1f} "
+              f"{calls['readRXBufferData']:11.1f} {sum(calls.values()):11.1f} {result['wasted_polls']:9.1f} "
+              f"{result['received']:10.2f} {result['mean_latency'] * 1e3:17.2f} {result['max_latency'] * 1e3:16.2f}")
+
+
+if __name__ == "__main__":
+    main()
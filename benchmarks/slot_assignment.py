@@ -0,0 +1,124 @@
+"""
+Measures the slot bookkeeping of a scheduling tick, with the slots kept in lists of sentinel values
+and scanned on every update, as SlotAssignment used to, and with the bitmasks of SlotAssignment.
+
+A tick does what Scheduling.execute and the task phase do with the slots: update the free slots,
+handle one control message (a neighbor takes, corrects or is refused a slot), update the free slots
+and the own slots again, then check whether the current slot is an own slot.
+Neighbors start with --occupancy of the slots, the node owns a few others.
+
+Usage: python benchmarks/slot_assignment.py --slots 40 256 --ticks 20000
+"""
+
+
+import argparse
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from interfaces import SlotAssignment
+
+NODE_ID = 0x2001
+
+
+class LegacySlotAssignment:
+    """The former lists, scanned by update_free_slots and by Scheduling.update_pure_send_list."""
+
+    def __init__(self, nb_slots: int):
+        self.block = [-1] * nb_slots
+        self.non_block = []
+        self.send_list = [-1] * nb_slots
+        self.pure_send_list = []
+        self.receive_list = [-1] * nb_slots
+        self.free_slots = nb_slots
+        self.subpriority_slots = []
+
+    def update_free_slots(self):
+        self.non_block.clear()
+        self.subpriority_slots.clear()
+        self.free_slots = 0
+
+        for x in range(len(self.send_list)):
+            if self.send_list[x] != -1 or self.receive_list[x] != -1:
+                self.block[x] = 1
+            else:
+                self.non_block.append(x)
+                if self.send_list[x] == -2:
+                    self.subpriority_slots.append(x)
+                self.free_slots += 1
+
+    def set_send(self, slot: int, value: int) -> None:
+        self.send_list[slot] = value
+
+    def set_receive(self, slot: int, sender_id: int) -> None:
+        self.receive_list[slot] = sender_id
+
+    def is_blocked(self, slot: int) -> bool:
+        return self.block[slot] != -1
+
+    def update_pure_send_list(self):
+        self.pure_send_list = [x for x in range(len(self.send_list))
+                               if self.send_list[x] not in [-1, -2] and self.receive_list[x] == -1]
+
+    def is_own_slot(self, slot: int) -> bool:
+        return slot in self.pure_send_list
+
+
+def populate(slot_assignment, nb_slots: int, occupancy: float, rng: random.Random) -> None:
+    for slot in range(nb_slots):
+        if rng.random() < occupancy:
+            slot_assignment.set_receive(slot, NODE_ID + 1 + rng.randrange(20))
+        elif rng.random() < 0.2:
+            slot_assignment.set_send(slot, NODE_ID)
+    slot_assignment.update_free_slots()
+    slot_assignment.update_pure_send_list()
+
+
+def tick(slot_assignment, slot: int, action: int, current_slot: int) -> bool:
+    slot_assignment.update_free_slots()
+    if action == 0 and not slot_assignment.is_blocked(slot):
+        slot_assignment.set_receive(slot, NODE_ID + 1)  # A neighbor takes a free slot
+    elif action == 1:
+        slot_assignment.set_receive(slot, -1)  # An assignment is corrected
+    elif action == 2:
+        slot_assignment.set_send(slot, -2)  # Our proposal is refused
+    slot_assignment.update_free_slots()
+    slot_assignment.update_pure_send_list()
+    return slot_assignment.is_own_slot(current_slot)
+
+
+def measure(slot_assignment, nb_slots: int, args) -> tuple:
+    rng = random.Random(args.seed)
+    populate(slot_assignment, nb_slots, args.occupancy, rng)
+    events = [(rng.randrange(nb_slots), rng.randrange(4), rng.randrange(nb_slots)) for _ in range(args.ticks)]
+
+    own_checks, start = 0, perf_counter()
+    for slot, action, current_slot in events:
+        own_checks += tick(slot_assignment, slot, action, current_slot)
+    elapsed = perf_counter() - start
+
+    return elapsed / args.ticks, own_checks, list(slot_assignment.pure_send_list)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slots', type=int, nargs='+', default=[40, 256])
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--occupancy', type=float, default=0.5, help="fraction of the slots taken by neighbors")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'slots':>5} {'lists (us/tick)':>15} {'bitmasks (us/tick)':>18} {'speedup':>8}")
+    for nb_slots in args.slots:
+        legacy, legacy_checks, legacy_slots = measure(LegacySlotAssignment(nb_slots), nb_slots, args)
+        bitmasks, checks, slots = measure(SlotAssignment(nb_slots), nb_slots, args)
+        print(f"{nb_slots:5} {legacy * 1e6:15.2f} {bitmasks * 1e6:18.2f} {legacy / bitmasks:8.1f}")
+        if (legacy_checks, legacy_slots) != (checks, slots):
+            print("The own slots differ!")
+
+
+if __name__ == "__main__":
+    main()
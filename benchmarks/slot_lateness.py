@@ -0,0 +1,111 @@
+"""
+Simulates full TDMA cycles of many nodes in virtual time and reports how late the nodes enter their
+own task slots, when TDMANode ticks at a fixed TICK_FREQUENCY, as it used to, and when it also wakes
+up at the next event of its state (TDMANode.next_wakeup).
+
+An entry later than MAX_RANGING_DELAY leaves no time to localize in the slot. A missed slot went by
+between two ticks. The scheduling phase is shortened with --scheduling-cycles.
+
+Then measures the CPU used by the wait between two ticks on the wall clock: the former busy wait
+against the sleep until the next wake-up.
+
+Usage: python benchmarks/slot_lateness.py --nodes 10 --cycles 1 --scheduling-cycles 20
+"""
+
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+from time import perf_counter, process_time, sleep, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+import interfaces.timing as timing
+from clockSource import ClockSource, set_clock_source
+from simulation import RadioMedium, TDMASimulator, VirtualClock, add_anchors, apply_timing_parameters, create_tdma_nodes
+from states import State
+from tdmaNode import TDMANode, TICK_FREQUENCY
+
+
+def fixed_tick(node: TDMANode):
+    """The state machine ran at the fixed tick rate only, as TDMANode did."""
+
+    node.next_wakeup = lambda start_time, tick_period=1.0 / TICK_FREQUENCY: start_time + tick_period
+
+
+def simulate(nb_nodes: int, nb_cycles: float, seed: int, deadlines: bool) -> dict:
+    clock = VirtualClock()
+    set_clock_source(clock)
+    random.seed(seed)
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            medium = RadioMedium(seed=seed)
+            add_anchors(medium)
+            nodes = [node for _, node in create_tdma_nodes(medium, nb_nodes, 10000, random.Random(seed))]
+            simulator = TDMASimulator(clock)
+            for node in nodes:
+                if not deadlines:
+                    fixed_tick(node)
+                simulator.add_node(node, start_delay=random.uniform(0, simulator.tick_period))
+
+            simulator.run_until(timing.FULL_CYCLE_DURATION / timing.SECONDS_TO_MILLISECONDS * nb_cycles)
+    finally:
+        set_clock_source(ClockSource())
+
+    statistics = [node.slot_statistics() for node in nodes]
+    entries = sum(statistic['entries'] for statistic in statistics)
+    return {
+        'entries': entries,
+        'late': sum(statistic['late_entries'] for statistic in statistics),
+        'missed': sum(statistic['missed'] for statistic in statistics),
+        'mean_lateness': sum(statistic['mean_lateness'] * statistic['entries'] for statistic in statistics) / max(entries, 1),
+        'max_lateness': max(statistic['max_lateness'] for statistic in statistics),
+        'ticks': sum(simulator.state_ticks.values()) / nb_nodes / clock.now,
+        'task_ticks': simulator.state_ticks.get(State.TASK, 0),
+    }
+
+
+def busy_wait(start_time: float) -> None:
+    """The former TDMANode.wait."""
+
+    while (time() - start_time) <= 1.0 / TICK_FREQUENCY:
+        sleep(0.00000001)
+
+
+def cpu_usage(wait, duration: float) -> float:
+    start, cpu_start = perf_counter(), process_time()
+    while perf_counter() - start < duration:
+        wait(time())
+
+    return (process_time() - cpu_start) / (perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--cycles', type=float, default=1, help="number of full cycles to simulate")
+    parser.add_argument('--scheduling-cycles', type=int, default=20)
+    parser.add_argument('--cpu-duration', type=float, default=3, help="seconds of wall clock per wait measured")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    previous = apply_timing_parameters(NB_SCHEDULING_CYCLES=args.scheduling_cycles)
+    try:
+        print(f"{'wake-up':10} {'ticks/s':>8} {'task ticks':>10} {'slot entries':>12} {'late':>6} {'missed':>7} "
+              f"{'mean lateness (ms)':>18} {'max lateness (ms)':>17}")
+        for name, deadlines in [('tick', False), ('deadline', True)]:
+            result = simulate(args.nodes, args.cycles, args.seed, deadlines)
+            print(f"{name:10} {result['ticks']:8.1f} {result['task_ticks']:10} {result['entries']:12} "
+                  f"{result['late']:6} {result['missed']:7} {result['mean_lateness']:18.2f} {result['max_lateness']:17.2f}")
+    finally:
+        apply_timing_parameters(**previous)
+
+    print(f"\nCPU while waiting: busy wait {cpu_usage(busy_wait, args.cpu_duration) * 100:.1f} %, "
+          f"sleep {cpu_usage(lambda start_time: TDMANode.wait(perf_counter() + 1.0 / TICK_FREQUENCY), args.cpu_duration) * 100:.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Runs many TDMA nodes in a single process on top of simulated Pozyx devices
+and reports the radio statistics and the resulting slot assignment.
+
+Usage: python benchmarks/tdma_load.py --nodes 50 --duration 30
+"""
+
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import threading
+from time import sleep
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+from simulation import RadioMedium, add_anchors, create_tdma_nodes, slot_conflicts
+from tdmaNode import TDMANode
+
+
+def run_node(node: TDMANode, crashes: list) -> None:
+    try:
+        node.run()
+    except Exception as e:
+        crashes.append(repr(e))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=30, help="seconds of wall time")
+    parser.add_argument('--area', type=int, default=10000, help="side of the square deployment area (mm)")
+    parser.add_argument('--range', type=float, default=30000, help="communication range (mm)")
+    parser.add_argument('--latency', type=float, default=0.0005, help="radio latency (s)")
+    parser.add_argument('--loss', type=float, default=0.0, help="frame loss probability")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    medium = RadioMedium(communication_range=args.range, latency=args.latency, loss_rate=args.loss, seed=args.seed)
+    add_anchors(medium)
+    nodes = create_tdma_nodes(medium, args.nodes, args.area)
+
+    crashes = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _, node in nodes:
+            threading.Thread(target=run_node, args=(node, crashes), daemon=True).start()
+        sleep(args.duration)
+
+    statistics = medium.statistics.as_dict()
+    sends = sum(pozyx.calls.get('sendData', 0) for pozyx, _ in nodes)
+    states = {}
+    for _, node in nodes:
+        states[node.current_state_id.name] = states.get(node.current_state_id.name, 0) + 1
+
+    print(f"Nodes: {args.nodes}, duration: {args.duration} s")
+    print(f"Frames sent: {sends} ({sends / args.duration:.1f}/s)")
+    print(f"Frames delivered: {statistics['deliveries']} ({statistics['deliveries'] / args.duration:.1f}/s)")
+    print(f"Radio collisions: {statistics['collisions']}, losses: {statistics['losses']}, "
+          f"out of range: {statistics['out_of_range']}")
+    print(f"Current states: {states}")
+    print(f"Crashed nodes: {len(crashes)} {sorted(set(crashes))}")
+    print(f"Task slot conflicts between neighbors: {slot_conflicts(medium, nodes)}")
+
+
+if __name__ == "__main__":
+    main()
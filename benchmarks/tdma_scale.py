@@ -0,0 +1,210 @@
+"""
+Simulates a full TDMA cycle of more tags than the former addressing supported, in virtual time.
+
+The former scheduling phase broadcast in the slot of the low byte of the tag ID, in a period of
+NB_NODES slots, so the tags whose low byte is NB_NODES or more never broadcast. The local IDs, the
+lowest not held within two hops as announced during the synchronization, give every tag within two
+hops its own slot, in a period of a power of two above them.
+Reports the tags that broadcast during the scheduling phase, the task slots they own and the
+conflicts between neighbors. --task-slots should leave at least one slot per tag.
+
+Two deployments are simulated for each of --seeds seeds: all the tags within one radio range
+(--nodes, --area, --range), and tags spread over several hops (--multi-hop-nodes, --multi-hop-area,
+--multi-hop-range).
+
+Both runs send the topology in pages, the second degree neighbors known by the tags at the end are
+reported. Then encodes the neighborhood of every tag in topology messages, as the former single
+frame and as pages, and reports the neighbors the receivers recover.
+
+Usage: python benchmarks/tdma_scale.py --nodes 120 --task-slots 128 --scheduling-cycles 5 --seeds 3
+"""
+
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+from ctypes import c_uint32 as uint32
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+import interfaces.timing as timing
+from clockSource import ClockSource, set_clock_source
+from messages import MessageFactory, MessageType, UWBTopologyMessage
+from pypozyx import Data
+from simulation import RadioMedium, TDMASimulator, VirtualClock, add_anchors, apply_timing_parameters, create_tdma_nodes
+from states import State
+
+TAG_ID_MASK = 0xFF
+
+
+def low_byte_slots(scheduling) -> None:
+    """The scheduling phase broadcast in the slot of the low byte of the ID, as Scheduling did."""
+
+    def is_broadcast_slot():
+        elapsed = scheduling.timing.logical_clock.clock - scheduling.timing.sync_timestamp
+        return int(elapsed % (timing.NB_NODES * timing.SCHEDULING_SLOT_DURATION)
+                   / timing.SCHEDULING_SLOT_DURATION) == scheduling.id & TAG_ID_MASK
+
+    def next_event():
+        scheduling.timing.logical_clock.update_clock()
+        elapsed = scheduling.timing.logical_clock.clock - scheduling.timing.sync_timestamp
+        event = scheduling.timing.task_start_time
+
+        if (scheduling.id & TAG_ID_MASK) < timing.NB_NODES:
+            period = timing.NB_NODES * timing.SCHEDULING_SLOT_DURATION
+            broadcast = elapsed - elapsed % period + (scheduling.id & TAG_ID_MASK) * timing.SCHEDULING_SLOT_DURATION
+            event = min(event, broadcast if broadcast > elapsed else broadcast + period)
+
+        return (event - elapsed) / timing.SECONDS_TO_MILLISECONDS
+
+    scheduling.is_broadcast_slot = is_broadcast_slot
+    scheduling.next_event = next_event
+
+
+def record_schedules(scheduling, broadcasts: dict, schedules: dict) -> None:
+    """Counts the scheduling broadcasts of the node and records its own slots when the scheduling phase ends."""
+
+    broadcast_control_message, next_state = scheduling.messenger.broadcast_control_message, scheduling.next
+
+    def counted_broadcast():
+        broadcasts[scheduling.id] = broadcasts.get(scheduling.id, 0) + 1
+        broadcast_control_message()
+
+    def recorded_next():
+        state = next_state()
+        if state == State.LISTEN and scheduling.id not in schedules:
+            schedules[scheduling.id] = set(scheduling.slot_assignment.pure_send_list) - {-1}
+        return state
+
+    scheduling.messenger.broadcast_control_message = counted_broadcast
+    scheduling.next = recorded_next
+
+
+def tag_neighbors(medium: RadioMedium, nodes: list) -> dict:
+    ids = [pozyx.network_id for pozyx, _ in nodes]
+    return {first: {second for second in ids if second != first and medium.in_range(first, second)} for first in ids}
+
+
+def simulate(args, nb_nodes: int, area: int, communication_range: float, seed: int, local_ids: bool) -> dict:
+    clock = VirtualClock()
+    set_clock_source(clock)
+    random.seed(seed)
+    broadcasts, schedules = {}, {}
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            medium = RadioMedium(communication_range=communication_range, seed=seed)
+            add_anchors(medium)
+            nodes = create_tdma_nodes(medium, nb_nodes, area, random.Random(seed))
+            simulator = TDMASimulator(clock)
+            for _, node in nodes:
+                if not local_ids:
+                    low_byte_slots(node.states[State.SCHEDULING])
+                record_schedules(node.states[State.SCHEDULING], broadcasts, schedules)
+                simulator.add_node(node, start_delay=random.uniform(0, simulator.tick_period))
+
+            # Until every tag ends its scheduling phase, then the first frames spread the topology
+            while len(schedules) < nb_nodes and clock.now < args.timeout:
+                simulator.run_until(clock.now + 1)
+            scheduling_end = clock.now
+            simulator.run_until(clock.now + timing.FRAME_DURATION / timing.SECONDS_TO_MILLISECONDS * args.frames)
+    finally:
+        set_clock_source(ClockSource())
+
+    neighbors = tag_neighbors(medium, nodes)
+    known = total = 0
+    for pozyx, node in nodes:
+        for neighbor, (second_degree, _, _) in node.states[State.TASK].neighborhood.current_neighbors.items():
+            if neighbor in neighbors:
+                total += len(neighbors[neighbor])
+                known += len(neighbors[neighbor] & set(second_degree or []))
+
+    owned = list(schedules.items())
+    return {
+        'scheduling_end': scheduling_end,
+        'broadcasting': len(broadcasts),
+        'broadcasts': sum(broadcasts.values()),
+        'owners': sum(bool(slots) for slots in schedules.values()),
+        'owned_slots': sum(len(slots) for slots in schedules.values()),
+        'conflicts': sum(len(first_slots & second_slots) for i, (first_id, first_slots) in enumerate(owned)
+                         for second_id, second_slots in owned[i + 1:] if medium.in_range(first_id, second_id)),
+        'collisions': medium.statistics.collisions,
+        'second_degree': known / max(total, 1),
+        'neighbors': neighbors,
+    }
+
+
+def legacy_topology(neighbors: set) -> set:
+    """Encodes and decodes the neighbors in a single frame, as UWBTopologyMessage did."""
+
+    bitwise_neighbors = 0
+    for neighbor in neighbors:
+        bitwise_neighbors |= 1 << ((neighbor & TAG_ID_MASK) - 1)
+    data = uint32((MessageType.TOPOLOGY << 30) | bitwise_neighbors).value
+
+    if not isinstance(MessageFactory.create(0, Data([0xAA, data], 'BI')), UWBTopologyMessage):
+        return set()  # Neighbors beyond the 30th overwrite the message type
+
+    return {(i + 1 | 0x2000) for i in range(30) if (data >> i) & 0x1 == 1}
+
+
+def paged_topology(neighbors: set) -> (set, int):
+    received, pages = set(), UWBTopologyMessage.paginate(0, neighbors)
+    for page in pages:
+        page.encode()
+        message = MessageFactory.create(0, Data([0xAA, page.data], 'BI'))
+        message.decode()
+        received.update(message.neighborhood)
+
+    return received, len(pages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=120)
+    parser.add_argument('--task-slots', type=int, default=128)
+    parser.add_argument('--scheduling-cycles', type=int, default=5)
+    parser.add_argument('--frames', type=int, default=3, help="task frames simulated after the scheduling phase")
+    parser.add_argument('--timeout', type=float, default=120, help="virtual seconds before giving up on the scheduling phase")
+    parser.add_argument('--area', type=int, default=10000, help="side of the square deployment area (mm)")
+    parser.add_argument('--range', type=float, default=30000, help="communication range (mm)")
+    parser.add_argument('--multi-hop-nodes', type=int, default=40)
+    parser.add_argument('--multi-hop-area', type=int, default=40000, help="side of the multi-hop deployment area (mm)")
+    parser.add_argument('--multi-hop-range', type=float, default=12000, help="communication range of the multi-hop deployment (mm)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--seeds', type=int, default=1, help="deployments simulated, from --seed on")
+    args = parser.parse_args()
+
+    deployments = [('one range', args.nodes, args.area, args.range),
+                   ('multi-hop', args.multi_hop_nodes, args.multi_hop_area, args.multi_hop_range)]
+    previous = apply_timing_parameters(NB_TASK_SLOTS=args.task_slots, NB_SCHEDULING_CYCLES=args.scheduling_cycles)
+    try:
+        print(f"{args.task_slots} task slots\n")
+        print(f"{'deployment':10} {'tags':>4} {'seed':>4} {'scheduling':10} {'end (s)':>7} {'broadcasting tags':>17} "
+              f"{'broadcasts':>10} {'slot owners':>11} {'owned slots':>11} {'conflicts':>9} {'collisions':>10} "
+              f"{'2nd degree known':>16}")
+        for deployment, nb_nodes, area, communication_range in deployments:
+            for seed in range(args.seed, args.seed + args.seeds):
+                for name, local_ids in [('low byte', False), ('local IDs', True)]:
+                    result = simulate(args, nb_nodes, area, communication_range, seed, local_ids)
+                    print(f"{deployment:10} {nb_nodes:4} {seed:4} {name:10} {result['scheduling_end']:7.0f} "
+                          f"{result['broadcasting']:17} {result['broadcasts']:10} {result['owners']:11} "
+                          f"{result['owned_slots']:11} {result['conflicts']:9} {result['collisions']:10} "
+                          f"{result['second_degree'] * 100:15.1f}%")
+                    if deployment == 'one range' and local_ids:
+                        neighbors = result['neighbors']
+    finally:
+        apply_timing_parameters(**previous)
+
+    total = sum(len(ids) for ids in neighbors.values())
+    legacy = sum(len(legacy_topology(ids) & ids) for ids in neighbors.values())
+    paged = [paged_topology(ids) for ids in neighbors.values()]
+    print(f"\nTopology encoding: single frame {legacy / total * 100:.1f}% of the neighbors, "
+          f"pages {sum(len(received & ids) for (received, _), ids in zip(paged, neighbors.values())) / total * 100:.1f}% "
+          f"in {sum(pages for _, pages in paged) / len(paged):.1f} frames per tag")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Simulates full TDMA cycles of many nodes in virtual time, for every combination
+of the given timing parameters, and reports how the task phase behaves.
+
+Usage: python benchmarks/tdma_sweep.py --nodes 10 --task-slots 20,40 --slot-durations 25 --scheduling-cycles 50,200
+"""
+
+
+import argparse
+import contextlib
+import itertools
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'clamour')))
+
+import interfaces.timing as timing
+from clockSource import ClockSource, set_clock_source
+from simulation import (RadioMedium, TDMASimulator, VirtualClock, add_anchors, apply_timing_parameters,
+                        create_tdma_nodes, slot_conflicts)
+from states import State
+
+
+def simulate(nb_nodes: int, nb_cycles: float, seed: int, parameters: dict) -> dict:
+    previous = apply_timing_parameters(**parameters)
+    clock = VirtualClock()
+    set_clock_source(clock)
+    random.seed(seed)
+
+    try:
+        medium = RadioMedium(seed=seed)
+        add_anchors(medium)
+        nodes = create_tdma_nodes(medium, nb_nodes, 10000, random.Random(seed))
+        simulator = TDMASimulator(clock)
+        for _, node in nodes:
+            simulator.add_node(node, start_delay=random.uniform(0, simulator.tick_period))
+
+        virtual_duration = timing.FULL_CYCLE_DURATION / timing.SECONDS_TO_MILLISECONDS * nb_cycles
+        start = perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            simulator.run_until(virtual_duration)
+        wall_duration = perf_counter() - start
+
+        return {
+            'virtual_s': virtual_duration,
+            'wall_s': wall_duration,
+            'speedup': virtual_duration / wall_duration,
+            'task_ticks': simulator.state_ticks.get(State.TASK, 0),
+            'owned_slots': sum(len(set(node.states[State.TASK].slot_assignment.pure_send_list) - {-1})
+                               for _, node in nodes),
+            'slot_conflicts': slot_conflicts(medium, nodes),
+            'collisions': medium.statistics.collisions,
+        }
+    finally:
+        set_clock_source(ClockSource())
+        apply_timing_parameters(**previous)
+
+
+def parse_list(values: str) -> list:
+    return [int(value) for value in values.split(',')]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--cycles', type=float, default=1, help="number of full cycles to simulate")
+    parser.add_argument('--task-slots', type=parse_list, default=[timing.NB_TASK_SLOTS])
+    parser.add_argument('--slot-durations', type=parse_list, default=[timing.TASK_SLOT_DURATION])
+    parser.add_argument('--scheduling-cycles', type=parse_list, default=[timing.NB_SCHEDULING_CYCLES])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("NB_TASK_SLOTS TASK_SLOT_DURATION NB_SCHEDULING_CYCLES | virtual(s) wall(s) speedup "
+          "| task ticks owned slots conflicts collisions")
+    for nb_slots, slot_duration, nb_scheduling_cycles in itertools.product(args.task_slots, args.slot_durations,
+                                                                           args.scheduling_cycles):
+        result = simulate(args.nodes, args.cycles, args.seed, {'NB_TASK_SLOTS': nb_slots,
+                                                               'TASK_SLOT_DURATION': slot_duration,
+                                                               'NB_SCHEDULING_CYCLES': nb_scheduling_cycles})
+        print(f"{nb_slots:13} {slot_duration:18} {nb_scheduling_cycles:20} | {result['virtual_s']:10.1f} "
+              f"{result['wall_s']:7.1f} {result['speedup']:7.1f} | {result['task_ticks']:10} "
+              f"{result['owned_slots']:11} {result['slot_conflicts']:9} {result['collisions']:10}")
+
+
+if __name__ == "__main__":
+    main()
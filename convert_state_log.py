@@ -0,0 +1,28 @@
+"""
+Converts the binary state log written by the EKF manager (broadcast_state.bin)
+into the broadcast_state.csv layout read by plot.py.
+
+Usage: python convert_state_log.py broadcast_state.bin broadcast_state.csv
+"""
+
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src', 'clamour')))
+
+from ekf.stateLogger import convert_to_csv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', default='broadcast_state.bin')
+    parser.add_argument('csv', nargs='?', default='broadcast_state.csv')
+    args = parser.parse_args()
+
+    print(f"{convert_to_csv(args.log, args.csv)} states written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Prints the latency percentiles of the Pozyx calls and of the Pozyx lock of each CLAMOUR process,
+read from the pozyx_utils.PozyxProfile of a CLAMOUR started with instrumentation=True.
+The counts and durations are totals since CLAMOUR started.
+
+Usage: python pozyx_profile.py --period 5
+"""
+
+
+import argparse
+import os
+import sys
+from time import sleep
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src', 'clamour')))
+
+from pozyx_utils.pozyxProfile import PROFILE_NAME, PozyxProfile
+
+
+def print_profile(profile: PozyxProfile) -> None:
+    print(f"{'process':10} {'call':22} {'count':>8} {'mean (ms)':>10} {'p50 (ms)':>9} {'p90 (ms)':>9} "
+          f"{'p99 (ms)':>9} {'max (ms)':>9}")
+    for process, rows in profile.snapshot().items():
+        for name, statistics in sorted(rows.items(), key=lambda row: -row[1]['count'] * row[1]['mean']):
+            print(f"{process:10} {name:22} {statistics['count']:8} "
+                  + " ".join(f"{statistics[key] * 1e3:{width}.3f}" for key, width in
+                             [('mean', 10), ('p50', 9), ('p90', 9), ('p99', 9), ('max', 9)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--period', type=float, default=0, help="seconds between two prints, 0 prints once")
+    parser.add_argument('--name', default=PROFILE_NAME, help="name of the shared memory block")
+    args = parser.parse_args()
+
+    try:
+        profile = PozyxProfile(args.name, create=False)
+    except FileNotFoundError:
+        sys.exit(f"No profile named {args.name}: is CLAMOUR running with instrumentation=True?")
+
+    try:
+        while True:
+            print_profile(profile)
+            if args.period <= 0:
+                break
+            sleep(args.period)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        profile.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,14 @@
 
 import os
 import sys
+from contextlib import nullcontext
 from multiprocessing import Lock, Manager
 from pypozyx import PozyxSerial, get_first_pozyx_serial_port, Data
 from pypozyx.definitions.registers import POZYX_NETWORK_ID
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
-from ekf import EKFManager, CustomOdometry
+from ekf import EKFManager, CustomOdometry, DEFAULT_FILTER
 from tdmaNode import TDMANode
 from multiprocessing import Queue
 from contextManagedQueue import ContextManagedQueue
@@ -16,8 +17,14 @@ from contextManagedProcess import ContextManagedProcess
 from pedometer import Pedometer
 from messages import PoseMessage, CustomOdometryMessage
 from runnableProcess import RunnableProcess
+from sharedMemoryQueue import OverflowPolicy
+from priorityChannel import ServicePolicy
+from pozyxBroker import PozyxBroker
+from pozyx_utils import InstrumentedLock, InstrumentedPozyx, PozyxProfile
 #from soundmanager import SoundManager
 
+PROCESS_NAMES = ['main', 'ekf', 'pedometer', 'tdma']  # Users of the Pozyx, in the order of start_processes
+
 def connect_pozyx() -> PozyxSerial:
     serial_port = get_first_pozyx_serial_port()
 
@@ -42,41 +49,94 @@ def keep_alive(process: RunnableProcess) -> None:
             print("A process that needs to be kept alive died and will be restarted. Error:", str(e))
 
 class Clamour:
-    def __init__(self, custom_odometries):
+    def __init__(self, custom_odometries, pozyx_factory=connect_pozyx, filter_type: str = DEFAULT_FILTER,
+                 shared_memory: bool = False, overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+                 priority_lanes: bool = False, service_policy: ServicePolicy = ServicePolicy.STRICT,
+                 pozyx_broker: bool = False, instrumentation: bool = False):
+        """pozyx_factory returns the device shared by all processes: a PozyxSerial by default,
+        a pozyx_utils.RecordingPozyx to record a trace or a simulation.ReplayPozyx to play one back.
+        filter_type is one of ekf.FILTERS.
+        shared_memory makes the processes exchange messages through SharedMemoryQueue rings
+        instead of multiprocessing queues, overflow_policy is what they do when a ring is full.
+        priority_lanes sends the updates to the EKF through a PriorityChannel, one lane per UpdateType
+        served with service_policy, so that topology updates never delay the positioning updates.
+        pozyx_broker gives the device to a PozyxBroker process, the others call it through PozyxClients
+        instead of sharing it behind a lock.
+        instrumentation records the latency of the Pozyx calls and the wait for the Pozyx lock of each process
+        in a pozyx_utils.PozyxProfile, which pozyx_profile.py prints while CLAMOUR runs."""
+
         self.custom_odometries = custom_odometries
+        self.pozyx_factory = pozyx_factory
+        self.filter_type = filter_type
+        self.shared_memory = shared_memory
+        self.overflow_policy = overflow_policy
+        self.priority_lanes = priority_lanes
+        self.service_policy = service_policy
+        self.pozyx_broker = pozyx_broker
+        self.instrumentation = instrumentation
 
     def start(self, sound: bool, pose_callback, communication_queue):
         # The different levels of context managers are required to ensure everything starts and stops cleanly.
-        with ContextManagedQueue() as sound_queue:
-            shared_pozyx = connect_pozyx()
-            shared_pozyx_lock = Lock()
-            pozyx_id = get_pozyx_id(shared_pozyx)
-
-            ekf_manager = EKFManager(pose_callback, sound_queue, communication_queue, shared_pozyx, shared_pozyx_lock, pozyx_id, sound)
-            pedometer = Pedometer(communication_queue, shared_pozyx, shared_pozyx_lock)
-            tdma_node = TDMANode(communication_queue, shared_pozyx, shared_pozyx_lock, pozyx_id)
-
-            if sound:
-                sound_player = SoundManager(sound_queue)
-
-            with ContextManagedProcess(target=ekf_manager.run) as ekf_manager_process:
-                ekf_manager_process.start()
-                with ContextManagedProcess(target=tdma_node.run) as tdma_process:
-                    tdma_process.start()
-                    with ContextManagedProcess(target=pedometer.run) as pedometer_process:
-                        #pedometer_process.start()
-
-                        if sound:
-                            keep_alive(sound_player)
+        with ContextManagedQueue(self.shared_memory, self.overflow_policy) as sound_queue, \
+                (PozyxProfile() if self.instrumentation else nullcontext()) as profile:
+            if self.pozyx_broker:
+                broker = PozyxBroker(self.pozyx_factory)
+                pozyx_clients = [broker.client() for _ in range(4)]  # This process, EKF, pedometer and TDMA
+                with ContextManagedProcess(target=broker.run) as broker_process:
+                    broker_process.start()
+                    # The broker serializes the calls, there is nothing left to lock
+                    self.start_processes(sound, pose_callback, communication_queue, sound_queue,
+                                         pozyx_clients, nullcontext(), profile)
+            else:
+                shared_pozyx = self.pozyx_factory()
+                self.start_processes(sound, pose_callback, communication_queue, sound_queue,
+                                     [shared_pozyx] * 4, Lock(), profile)
+
+    def start_processes(self, sound: bool, pose_callback, communication_queue, sound_queue, pozyx_devices: list,
+                        shared_pozyx_lock, profile: PozyxProfile = None):
+        pozyx_locks = [shared_pozyx_lock] * len(PROCESS_NAMES)
+        if profile is not None:
+            pozyx_devices = [InstrumentedPozyx(pozyx, profile, name) for pozyx, name in zip(pozyx_devices, PROCESS_NAMES)]
+            pozyx_locks = [InstrumentedLock(shared_pozyx_lock, profile, name) for name in PROCESS_NAMES]
+
+        main_pozyx, ekf_pozyx, pedometer_pozyx, tdma_pozyx = pozyx_devices
+        _, ekf_lock, pedometer_lock, tdma_lock = pozyx_locks
+        pozyx_id = get_pozyx_id(main_pozyx)
+
+        ekf_manager = EKFManager(pose_callback, sound_queue, communication_queue, ekf_pozyx, ekf_lock, pozyx_id, sound,
+                                 self.filter_type)
+        pedometer = Pedometer(communication_queue, pedometer_pozyx, pedometer_lock)
+        tdma_node = TDMANode(communication_queue, tdma_pozyx, tdma_lock, pozyx_id)
+
+        if sound:
+            sound_player = SoundManager(sound_queue)
+
+        with ContextManagedProcess(target=ekf_manager.run) as ekf_manager_process:
+            ekf_manager_process.start()
+            with ContextManagedProcess(target=tdma_node.run) as tdma_process:
+                tdma_process.start()
+                with ContextManagedProcess(target=pedometer.run) as pedometer_process:
+                    #pedometer_process.start()
+
+                    if sound:
+                        keep_alive(sound_player)
 
     def start_non_blocking(self, sound: bool, pose_callback):
-        self.communication_queue = Queue()
+        communication_queue = ContextManagedQueue(self.shared_memory, self.overflow_policy,
+                                                  self.priority_lanes, self.service_policy)
+        self.communication_queue = communication_queue.queue
         for custom_odometry in self.custom_odometries:
             custom_odometry.set_pose_listener(self._on_custom_pose_update)
 
-        clamour_process = ContextManagedProcess(target=self.start, args=[sound, pose_callback, self.communication_queue])
+        clamour_process = ContextManagedProcess(target=self.start_managed, args=[sound, pose_callback, communication_queue])
         clamour_process.start()
 
+    def start_managed(self, sound: bool, pose_callback, communication_queue: ContextManagedQueue):
+        """Runs start in the CLAMOUR process, which closes the communication queue when it stops."""
+
+        with communication_queue as queue:
+            self.start(sound, pose_callback, queue)
+
     def _on_custom_pose_update(self, custom_odometry: CustomOdometry, pose: PoseMessage, timestamp: float):
         if(self.communication_queue is not None):
             message = CustomOdometryMessage(pose, custom_odometry.get_R(), timestamp)
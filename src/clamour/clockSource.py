@@ -0,0 +1,43 @@
+"""Time functions used by the TDMA stack.
+
+Every module that needs the time must use these functions instead of the time module,
+so that a simulation can replace the wall clock with a virtual one (see simulation.VirtualClock)."""
+
+import time as wall_time
+
+
+class ClockSource:
+    """Default source: the hardware clock."""
+
+    def perf_counter(self) -> float:
+        return wall_time.perf_counter()
+
+    def time(self) -> float:
+        return wall_time.time()
+
+    def sleep(self, seconds: float) -> None:
+        wall_time.sleep(seconds)
+
+
+_clock_source = ClockSource()
+
+
+def set_clock_source(clock_source: ClockSource) -> None:
+    global _clock_source
+    _clock_source = clock_source
+
+
+def get_clock_source() -> ClockSource:
+    return _clock_source
+
+
+def perf_counter() -> float:
+    return _clock_source.perf_counter()
+
+
+def time() -> float:
+    return _clock_source.time()
+
+
+def sleep(seconds: float) -> None:
+    _clock_source.sleep(seconds)
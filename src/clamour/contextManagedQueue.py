@@ -2,16 +2,32 @@ import sys
 import traceback as tb
 from multiprocessing import Queue
 
+from priorityChannel import PriorityChannel, ServicePolicy
+from sharedMemoryQueue import OverflowPolicy, SharedMemoryQueue
+
 
 class ContextManagedQueue:
-    def __init__(self):
-        self.queue = Queue(maxsize=20)
+    def __init__(self, shared_memory: bool = False, overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+                 priority_lanes: bool = False, service_policy: ServicePolicy = ServicePolicy.STRICT):
+        """shared_memory selects a SharedMemoryQueue instead of a multiprocessing.Queue,
+        priority_lanes a PriorityChannel served with service_policy, over shared memory lanes if shared_memory."""
+
+        if priority_lanes:
+            self.queue = PriorityChannel(service_policy=service_policy, shared_memory=shared_memory)
+        elif shared_memory:
+            self.queue = SharedMemoryQueue(overflow_policy=overflow_policy)
+        else:
+            self.queue = Queue(maxsize=20)
 
     def __enter__(self):
         return self.queue
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.queue.close()
-        self.queue.join_thread()
+        if isinstance(self.queue, (SharedMemoryQueue, PriorityChannel)):
+            self.queue.close()
+            self.queue.unlink()
+        else:
+            self.queue.close()
+            self.queue.join_thread()
         print(exc_type, exc_val)
-        tb.print_tb(exc_tb, file=sys.stdout)
\ No newline at end of file
+        tb.print_tb(exc_tb, file=sys.stdout)
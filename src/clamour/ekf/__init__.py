@@ -1,2 +1,2 @@
-from .ekfManager import EKFManager
+from .ekfManager import EKFManager, FILTERS, DEFAULT_FILTER
 from .customOdometry import CustomOdometry
\ No newline at end of file
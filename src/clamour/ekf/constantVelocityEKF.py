@@ -0,0 +1,293 @@
+from numpy import array, asarray, copyto, divide, dot, einsum, empty, eye, linalg, multiply, ndarray, sqrt, subtract, zeros
+from pypozyx import Coordinates
+
+from messages import UpdateType
+
+from .measurementHistory import MeasurementHistory
+
+STATE_SIZE = 8  # x, dx/dt, y, dy/dt, z, dz/dt, yaw, dyaw/dt
+MEASUREMENT_SIZE = 4  # x, y, z, yaw
+HISTORY_SIZE = 64  # Measurements kept to reorder late ones
+MAX_REPLAY_DEPTH = 16  # Newer measurements replayed at most for one late measurement
+
+# Squared Mahalanobis distance of the innovation, per measured value, above which a measurement is rejected.
+# The measurement covariances are far smaller than the actual UWB noise, so these are far above the
+# chi-square quantiles: they reject the few percents of jumps of the recorded broadcast_state.csv logs.
+GATE_THRESHOLDS = {
+    UpdateType.TRILATERATION: 25000,
+    UpdateType.RANGING: 25000,
+}
+MAX_CONSECUTIVE_REJECTIONS = 5  # After that, the filter is more likely to be wrong than the measurements
+
+
+class MeasurementBuffers:
+    """Preallocated matrices of an update observing `size` values."""
+
+    def __init__(self, size: int, direct: bool = False):
+        self.direct = direct  # H selects the values of the state
+        self.z = empty(size)
+        self.y = empty(size)
+        self.H = zeros((size, STATE_SIZE))
+        self.R = zeros((size, size))
+        self.PHT = empty((STATE_SIZE, size))
+        self.S = empty((size, size))
+        self.K = empty((STATE_SIZE, size))
+        self.KR = empty((STATE_SIZE, size))
+
+
+class RangingBuffers(MeasurementBuffers):
+    """N ranges followed by the yaw."""
+
+    def __init__(self, nb_ranges: int, range_variance: float, yaw_variance: float):
+        super(RangingBuffers, self).__init__(nb_ranges + 1)
+        self.deltas = empty((nb_ranges, 3))
+        self.norms = empty(nb_ranges)
+        self.H[nb_ranges, 6] = 1
+        self.R[range(nb_ranges), range(nb_ranges)] = range_variance
+        self.R[nb_ranges, nb_ranges] = yaw_variance
+
+
+class ConstantVelocityEKF:
+    """Same filter as CustomEKF, specialized for its constant velocity model.
+
+    The state is made of four independent (value, velocity) pairs, so F = I + dt * (velocity -> value)
+    and Q is diagonal: the prediction is done with in place row and column operations instead of
+    rebuilding F and Q and multiplying 8x8 matrices. Every update except ranging observes the values
+    directly, so P H^T is a column selection of P. Ranging updates fuse any number of ranges at once
+    with a vectorized measurement model. All the intermediate matrices are preallocated, once per
+    measurement size; x and P are modified in place and must not be rebound.
+
+    Measurements come from several processes through one queue and can arrive out of order:
+    the last ones are kept in a MeasurementHistory to insert late measurements at their place."""
+
+    def __init__(self, position: Coordinates, yaw: float, timestamp: float = 0):
+        """timestamp is the time of the measurement giving the initial state. With the default 0,
+        the first update predicts over a huge dt, as CustomEKF does."""
+
+        self.dt = 0.1
+        self.last_measurement_time = timestamp
+
+        self.x = array([position.x, 0, position.y, 0, position.z, 0, yaw, 0], dtype=float)
+        self.P = eye(STATE_SIZE)
+
+        self.R_pedometer = array([[20, 0, 0, 0],
+                                  [0, 20, 0, 0],
+                                  [0, 0, 20, 0],
+                                  [0, 0, 0, 0.5]])
+
+        self.R_trilateration = array([[20, 0, 0, 0],
+                                      [0, 20, 0, 0],
+                                      [0, 0, 20, 0],
+                                      [0, 0, 0, 0.5]])
+
+        self.R_ranging = array([[25, 0, 0, 0],
+                                [0, 25, 0, 0],
+                                [0, 0, 25, 0],
+                                [0, 0, 0, 0.5]])
+
+        self.R_zero_movement = eye(MEASUREMENT_SIZE)
+
+        # As we integrate to find position, we lose precision. Thus we trust x less than dx/dt, hence the dt*2 vs dt.
+        self.process_noise_scale = array([2, 1] * MEASUREMENT_SIZE, dtype=float)
+
+        # Views on x and P, they stay valid as long as x and P are only modified in place
+        self.values, self.velocities = self.x[0::2], self.x[1::2]
+        self.value_rows, self.velocity_rows = self.P[0::2, :], self.P[1::2, :]
+        self.value_columns, self.velocity_columns = self.P[:, 0::2], self.P[:, 1::2]
+        self.position = self.x[0:5:2]
+        self.P_diagonal = self.P.reshape(-1)[::STATE_SIZE + 1]
+
+        # Work buffers
+        self.value_buffer = empty(MEASUREMENT_SIZE)
+        self.state_buffer = empty(STATE_SIZE)
+        self.row_buffer = empty((MEASUREMENT_SIZE, STATE_SIZE))
+        self.column_buffer = empty((STATE_SIZE, MEASUREMENT_SIZE))
+        self.covariance_buffer = empty((STATE_SIZE, STATE_SIZE))
+        self.I_KH = empty((STATE_SIZE, STATE_SIZE))
+        self.identity = eye(STATE_SIZE)
+        self.direct_buffers = MeasurementBuffers(MEASUREMENT_SIZE, direct=True)
+        self.direct_buffers.H[range(MEASUREMENT_SIZE), range(0, STATE_SIZE, 2)] = 1
+        self.ranging_buffers = {}
+
+        self.covariance = self.P  # What the history saves to roll back P
+        self.history = MeasurementHistory(HISTORY_SIZE, STATE_SIZE)
+        self.late_measurements = 0
+        self.replayed_measurements = 0
+        self.dropped_measurements = 0
+
+        self.gate_thresholds = dict(GATE_THRESHOLDS)
+        self.rejected_measurements = {update_type: 0 for update_type in UpdateType}
+        self.consecutive_rejections = {update_type: 0 for update_type in UpdateType}
+
+    def get_position(self) -> Coordinates:
+        return Coordinates(self.x[0], self.x[2], self.x[4])
+
+    def get_yaw(self) -> float:
+        return self.x[6]
+
+    def predict(self) -> None:
+        """x = F x and P = F P F^T + Q, where F adds dt times each velocity to its value."""
+
+        multiply(self.velocities, self.dt, out=self.value_buffer)
+        self.values += self.value_buffer
+
+        multiply(self.velocity_rows, self.dt, out=self.row_buffer)
+        self.value_rows += self.row_buffer
+        multiply(self.velocity_columns, self.dt, out=self.column_buffer)
+        self.value_columns += self.column_buffer
+
+        multiply(self.process_noise_scale, self.dt, out=self.state_buffer)
+        self.P_diagonal += self.state_buffer
+
+    def pre_update(self, timestamp: float) -> None:
+        self.dt = timestamp - self.last_measurement_time
+        self.last_measurement_time = timestamp
+        self.predict()
+
+    def update(self, timestamp: float, correction, *arguments) -> bool:
+        """Predicts up to timestamp and applies correction(*arguments). A measurement older than the
+        last one rolls the filter back to the state before the first newer measurement of the history,
+        applies it and replays the newer ones. Too old measurements are dropped.
+        Returns False when the measurement is dropped or rejected by the gate."""
+
+        if timestamp < self.last_measurement_time:
+            return self.insert_late_measurement(timestamp, correction, arguments)
+
+        self.history.push(timestamp, correction, arguments, self.x, self.covariance, self.last_measurement_time, self.dt)
+        self.pre_update(timestamp)
+        return correction(*arguments)
+
+    def restore(self, i: int) -> None:
+        """Rolls back to the state saved with the i-th entry of the history."""
+
+        copyto(self.x, self.history.states[i])
+        copyto(self.covariance, self.history.covariances[i])
+        self.last_measurement_time = self.history.previous_times[i]
+        self.dt = self.history.previous_dts[i]
+
+    def insert_late_measurement(self, timestamp: float, correction, arguments: tuple) -> bool:
+        history = self.history
+        nb_newer = history.count_newer(timestamp, MAX_REPLAY_DEPTH)
+        first_newer = history.length - nb_newer
+
+        if nb_newer > MAX_REPLAY_DEPTH or nb_newer == 0 or history.previous_times[history.index(first_newer)] > timestamp:
+            self.dropped_measurements += 1
+            print("Received message with bad timestamp.")
+            return False
+
+        self.restore(history.index(first_newer))
+        newer_measurements = history.measurements_from(first_newer)
+        history.truncate(first_newer)
+
+        self.late_measurements += 1
+        self.replayed_measurements += nb_newer
+        accepted = self.update(timestamp, correction, *arguments)
+        for newer_timestamp, newer_correction, newer_arguments in newer_measurements:
+            self.update(newer_timestamp, newer_correction, *newer_arguments)
+
+        return accepted
+
+    def rejects(self, update_type: UpdateType, squared_distance: float) -> bool:
+        """Innovation gating: squared_distance is y^T S^-1 y per measured value,
+        compared to the threshold of the update type."""
+
+        threshold = self.gate_thresholds.get(update_type)
+        if threshold is None:
+            return False
+
+        if squared_distance <= threshold or self.consecutive_rejections[update_type] >= MAX_CONSECUTIVE_REJECTIONS:
+            self.consecutive_rejections[update_type] = 0
+            return False
+
+        self.rejected_measurements[update_type] += 1
+        self.consecutive_rejections[update_type] += 1
+        return True
+
+    def correct(self, buffers: MeasurementBuffers, R: ndarray, update_type: UpdateType) -> bool:
+        """Kalman correction once H and y are computed: S = H P H^T + R, K = P H^T S^-1, x += K y and
+        P = (I - K H) P (I - K H)^T + K R K^T. The Joseph form keeps P symmetric and positive
+        even after a huge dt. S is small, its inverse is the single allocation of an update.
+        Measurements rejected by the gate stop before the gain is computed."""
+
+        if buffers.direct:
+            buffers.PHT[:] = self.value_columns
+            buffers.S[:] = buffers.PHT[0::2, :]
+        else:
+            dot(self.P, buffers.H.T, out=buffers.PHT)
+            dot(buffers.H, buffers.PHT, out=buffers.S)
+        buffers.S += R
+
+        S_inverse = linalg.inv(buffers.S)
+        if self.rejects(update_type, buffers.y @ S_inverse @ buffers.y / len(buffers.y)):
+            return False
+
+        K = dot(buffers.PHT, S_inverse, out=buffers.K)
+        self.x += dot(K, buffers.y, out=self.state_buffer)
+
+        I_KH = self.I_KH
+        dot(K, buffers.H, out=I_KH)
+        subtract(self.identity, I_KH, out=I_KH)
+        dot(I_KH, self.P, out=self.covariance_buffer)
+        dot(self.covariance_buffer, I_KH.T, out=self.P)
+        dot(K, R, out=buffers.KR)
+        self.P += dot(buffers.KR, K.T, out=self.covariance_buffer)
+        return True
+
+    def direct_update(self, update_type: UpdateType, position: Coordinates, yaw: float, R: ndarray) -> bool:
+        """Update for measurements of x, y, z and yaw, H only selects the values of the state.
+        The yaw innovation is wrapped into [-180, 180), so that the gate sees 359 to 1 degrees as 2 degrees."""
+
+        buffers = self.direct_buffers
+        buffers.z[0] = position.x
+        buffers.z[1] = position.y
+        buffers.z[2] = position.z
+        buffers.z[3] = yaw
+
+        subtract(buffers.z, self.values, out=buffers.y)
+        buffers.y[3] = (buffers.y[3] + 180) % 360 - 180
+        return self.correct(buffers, R, update_type)
+
+    def custom_odometry_update(self, position: Coordinates, yaw: float, R, timestamp: float) -> bool:
+        print("Custom odometry update")
+        return self.update(timestamp, self.direct_update, UpdateType.CUSTOM_POSE, position, yaw, asarray(R))
+
+    def pedometer_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        return self.update(timestamp, self.direct_update, UpdateType.PEDOMETER, position, yaw, self.R_pedometer)
+
+    def trilateration_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        return self.update(timestamp, self.direct_update, UpdateType.TRILATERATION, position, yaw, self.R_trilateration)
+
+    def zero_movement_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        """This function updates the filter with its previous state.
+        This allows to keep the dt relatively small and avoid drift.
+        Indeed, if dt is too big, the process noise increase even if there was no change to the state."""
+
+        return self.update(timestamp, self.direct_update, UpdateType.ZERO_MOVEMENT, position, yaw, self.R_zero_movement)
+
+    def get_ranging_buffers(self, nb_ranges: int) -> RangingBuffers:
+        if nb_ranges not in self.ranging_buffers:
+            self.ranging_buffers[nb_ranges] = RangingBuffers(nb_ranges, self.R_ranging[0, 0], self.R_ranging[3, 3])
+
+        return self.ranging_buffers[nb_ranges]
+
+    def ranging_update(self, ranges: ndarray, yaw: float, timestamp: float, neighbor_positions: ndarray) -> bool:
+        """Fuses the distances to N neighbors, whose positions are the N rows of neighbor_positions.
+        The Jacobian of each range is the unit vector from the neighbor to the estimated position.
+        The yaw is part of the measurement but is not corrected, as in CustomEKF."""
+
+        return self.update(timestamp, self.ranging_correction, ranges, neighbor_positions)
+
+    def ranging_correction(self, ranges: ndarray, neighbor_positions: ndarray) -> bool:
+        nb_ranges = len(ranges)
+        buffers = self.get_ranging_buffers(nb_ranges)
+        deltas, norms, H, y = buffers.deltas, buffers.norms, buffers.H, buffers.y
+
+        subtract(self.position, neighbor_positions, out=deltas)
+        sqrt(einsum('ij,ij->i', deltas, deltas, out=norms), out=norms)
+        subtract(ranges, norms, out=y[:nb_ranges])
+        y[nb_ranges] = 0
+
+        H[:nb_ranges, 0:5:2] = 0
+        divide(deltas, norms[:, None], out=H[:nb_ranges, 0:5:2], where=norms[:, None] != 0)
+
+        return self.correct(buffers, buffers.R, UpdateType.RANGING)
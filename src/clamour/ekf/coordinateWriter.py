@@ -0,0 +1,81 @@
+import math
+import threading
+from multiprocessing import Lock
+from struct import error as StructError
+from time import perf_counter, sleep
+
+from pypozyx import Coordinates, PozyxSerial
+
+WRITE_BACK_RATE = 2  # Maximum number of setCoordinates per second
+MIN_COORDINATE_CHANGE = 50  # mm, smaller moves are not written back
+
+
+class CoordinateWriter:
+    """Writes the estimated position back to the Pozyx from a background thread, so the EKF never waits
+    for the Pozyx lock held by the TDMA process.
+
+    Only the latest submitted position is kept: positions submitted while the thread waits are superseded.
+    At most rate writes are done per second, and a position closer than min_change to the last written
+    one is skipped. The thread starts on the first submit, in the process running the EKF."""
+
+    def __init__(self, pozyx: PozyxSerial, pozyx_lock: Lock, rate: float = WRITE_BACK_RATE,
+                 min_change: float = MIN_COORDINATE_CHANGE):
+        self.pozyx = pozyx
+        self.pozyx_lock = pozyx_lock
+        self.period = 1 / rate
+        self.min_change = min_change
+
+        self.condition = threading.Condition()
+        self.pending = None
+        self.last_written = None
+        self.thread = None
+
+        self.submitted_writes = 0
+        self.writes = 0
+        self.superseded_writes = 0
+        self.unchanged_writes = 0
+        self.lock_hold_time = 0.0
+        self.max_lock_hold_time = 0.0
+
+    @property
+    def saved_writes(self) -> int:
+        return self.superseded_writes + self.unchanged_writes
+
+    def submit(self, position: Coordinates) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.write_coordinates, daemon=True)
+            self.thread.start()
+
+        with self.condition:
+            if self.pending is not None:
+                self.superseded_writes += 1
+            self.pending = [int(position.x), int(position.y), int(position.z)]
+            self.submitted_writes += 1
+            self.condition.notify()
+
+    def write_coordinates(self) -> None:
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                coordinates, self.pending = self.pending, None
+
+            if self.last_written is not None and math.dist(coordinates, self.last_written) < self.min_change:
+                self.unchanged_writes += 1
+                continue
+
+            start = perf_counter()
+            try:
+                with self.pozyx_lock:
+                    acquired = perf_counter()
+                    self.pozyx.setCoordinates(coordinates)
+                    hold_time = perf_counter() - acquired
+            except StructError as s:
+                print(str(s))
+                continue
+
+            self.last_written = coordinates
+            self.writes += 1
+            self.lock_hold_time += hold_time
+            self.max_lock_hold_time = max(self.max_lock_hold_time, hold_time)
+            sleep(max(self.period - (perf_counter() - start), 0))
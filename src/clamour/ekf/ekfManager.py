@@ -1,24 +1,40 @@
 import math
-import os.path
-import csv
 from multiprocessing import Lock
-from numpy import linalg
+from queue import Empty
+from numpy import asarray, linalg, ndarray
 from pypozyx import Coordinates, PozyxSerial
-from struct import error as StructError
 from time import time
 from pypozyx import Coordinates
 
-from .ekf import CustomEKF, DT_THRESHOLD
+from .constantVelocityEKF import ConstantVelocityEKF
+from .coordinateWriter import MIN_COORDINATE_CHANGE, WRITE_BACK_RATE, CoordinateWriter
+from .ekf import DT_THRESHOLD
+from .particleFilter import ParticleFilter
+from .squareRootEKF import SquareRootEKF
+from .stateLogger import StateLogger
 from contextManagedQueue import ContextManagedQueue
 from messages import UpdateMessage, SoundMessage, UpdateType, PoseMessage
 from rooms import Floorplan
 
+FILTERS = {
+    'constant_velocity': ConstantVelocityEKF,
+    'square_root': SquareRootEKF,
+    'particle': ParticleFilter,
+}
+DEFAULT_FILTER = 'constant_velocity'
+STATE_LOG_PATH = 'broadcast_state.bin'  # Converted to broadcast_state.csv by convert_state_log.py
+MAX_BATCH_SIZE = 64  # Messages applied before the position is written back, bounds the latency of a burst
+
 
 class EKFManager:
     def __init__(self, pose_callback, sound_queue: ContextManagedQueue, communication_queue: ContextManagedQueue,
-                 shared_pozyx: PozyxSerial, shared_pozyx_lock: Lock, pozyx_id: int, sound: bool):
+                 shared_pozyx: PozyxSerial, shared_pozyx_lock: Lock, pozyx_id: int, sound: bool,
+                 filter_type: str = DEFAULT_FILTER, write_back_rate: float = WRITE_BACK_RATE,
+                 min_coordinate_change: float = MIN_COORDINATE_CHANGE):
         self.pozyx_id = pozyx_id
+        self.filter_class = FILTERS[filter_type]
         self.ekf = None
+        self.update_functions = {}
         self.yaw_offset = 0  # Measured  in degrees relative to global coordinates X-Axis
         self.last_know_neighbors = {}
         self.sound = sound
@@ -29,46 +45,37 @@ class EKFManager:
         self.current_room = self.floorplan.rooms['24']
         self.pozyx = shared_pozyx
         self.pozyx_lock = shared_pozyx_lock
-        self.state_csv, self.writer = self.initialize_csv()
-
-    @staticmethod
-    def initialize_csv():
-        filepath = 'broadcast_state.csv'
-        is_new_file = os.path.exists(filepath)
-        fieldnames = ['pozyx_id', 'timestamp', 'synchronized_clock', 'offset', 'update_type',
-                      'coords_pos_x', 'ekf_pos_x', 'coords_pos_y', 'ekf_pos_y', 'ekf_pos_z', 'coords_pos_z', 'raw_yaw', 'ekf_yaw', 
-                      'ekf_covariance_matrix', 'slots', 'two_hop_neighbors']
-
-        state_csv = open(filepath, 'w')
-        writer = csv.DictWriter(state_csv, delimiter=',', fieldnames=fieldnames)
-        if is_new_file:
-            writer.writeheader()
-
-        return state_csv, writer
+        self.coordinate_writer = CoordinateWriter(shared_pozyx, shared_pozyx_lock, write_back_rate, min_coordinate_change)
+        self.state_logger = StateLogger(STATE_LOG_PATH)
 
     def run(self) -> None:
-        self.initialize_ekf()
-        while True:
-            self.process_latest_state_info()
+        """Closes the state log when the process stops (KeyboardInterrupt), so the last records are written."""
+
+        try:
+            self.initialize_ekf()
+            while True:
+                self.process_latest_state_info()
+        finally:
+            self.state_logger.close()
 
     def initialize_ekf(self) -> None:
         while self.ekf is None:
-            if not self.communication_queue.empty():
-                message = UpdateMessage.load(*self.communication_queue.get_nowait())
-                if message.update_type == UpdateType.TRILATERATION:
-                    self.yaw_offset = message.measured_yaw
-
-                    self.ekf = CustomEKF(message.measured_xyz, self.correct_yaw(message.measured_yaw))
-                    self.ekf.trilateration_update(message.measured_xyz, self.correct_yaw(message.measured_yaw), message.timestamp)
-                    
-                    self.save_to_csv(message.timestamp, message, self.ekf.get_position(), self.ekf.get_yaw())
-                    poseMsg = PoseMessage(self.ekf.get_position().x, self.ekf.get_position().y, self.ekf.get_position().z, self.ekf.get_yaw())
-                    self.pose_callback(poseMsg)
+            message = UpdateMessage.load(self.communication_queue.get())
+            if message.update_type == UpdateType.TRILATERATION:
+                self.yaw_offset = message.measured_yaw
+
+                self.ekf = self.filter_class(message.measured_xyz, self.correct_yaw(message.measured_yaw), message.timestamp)
+                self.ekf.trilateration_update(message.measured_xyz, self.correct_yaw(message.measured_yaw), message.timestamp)
+                self.update_functions = self.build_update_functions()
+
+                self.save_state(message.timestamp, message, self.ekf.get_position(), self.ekf.get_yaw())
+                poseMsg = PoseMessage(self.ekf.get_position().x, self.ekf.get_position().y, self.ekf.get_position().z, self.ekf.get_yaw())
+                self.pose_callback(poseMsg)
 
         print("EKF Initializing Done.")
 
-    def process_latest_state_info(self) -> None:
-        update_functions = {
+    def build_update_functions(self) -> dict:
+        return {
             UpdateType.PEDOMETER: self.ekf.pedometer_update,
             UpdateType.TRILATERATION: self.ekf.trilateration_update,
             UpdateType.RANGING: self.ekf.ranging_update,
@@ -77,36 +84,78 @@ class EKFManager:
             UpdateType.CUSTOM_POSE: self.ekf.custom_odometry_update,
         }
 
-        if not self.communication_queue.empty():
-            message = UpdateMessage.load(*self.communication_queue.get_nowait())
-            update_info = self.extract_update_info(message)
+    def process_latest_state_info(self) -> None:
+        """Applies all the pending messages in one pass, then writes the new position back once."""
+
+        # Wait for the next message, but no longer than the time of the next zero movement update
+        zero_movement_time = self.ekf.last_measurement_time + DT_THRESHOLD
+        try:
+            message = UpdateMessage.load(self.communication_queue.get(timeout=max(zero_movement_time - time(), 0)))
+        except Empty:
+            self.ekf.zero_movement_update(*self.generate_zero_update_info(zero_movement_time))
+            return
+
+        last_pose = None
+        for message in self.drain_batch(message):
+            pose = self.apply_update(message)
+            if pose is not None:
+                last_pose = pose
+
+        if last_pose is not None:
+            self.publish_pose(*last_pose)
+
+    def drain_batch(self, first_message: UpdateMessage) -> list:
+        """Returns the pending messages sorted by timestamp, where only the most recent topology update is kept."""
+
+        batch = [first_message]
+        while len(batch) < MAX_BATCH_SIZE:
+            try:
+                batch.append(UpdateMessage.load(self.communication_queue.get_nowait()))
+            except Empty:
+                break
+
+        batch.sort(key=lambda message: message.timestamp)
+        topologies = [i for i, message in enumerate(batch) if message.update_type == UpdateType.TOPOLOGY]
+        if len(topologies) > 1:
+            superseded = set(topologies[:-1])
+            batch = [message for i, message in enumerate(batch) if i not in superseded]
 
-            if message.update_type in [UpdateType.TRILATERATION, UpdateType.RANGING, UpdateType.TOPOLOGY]:
-                self.last_know_neighbors = message.topology
+        return batch
 
-            # if not self.validate_new_state(update_info[0]):
-            #     update_info = self.generate_zero_update_info(update_info[2])
-            #     message.update_type = UpdateType.ZERO_MOVEMENT
-            update_functions[message.update_type](*update_info)
+    def apply_update(self, message: UpdateMessage):
+        """Updates the filter and logs the message. Returns the measured coordinates and yaw,
+        or None when the filter dropped or rejected the measurement."""
 
-            try:
-                with self.pozyx_lock:
-                    self.pozyx.setCoordinates([int(self.ekf.get_position().x), int(self.ekf.get_position().y), int(self.ekf.get_position().z)])
-            except StructError as s:
-                print(str(s))
+        update_info = self.extract_update_info(message)
+
+        if message.update_type in [UpdateType.TRILATERATION, UpdateType.RANGING, UpdateType.TOPOLOGY]:
+            self.last_know_neighbors = message.topology
+
+        # if not self.validate_new_state(update_info[0]):
+        #     update_info = self.generate_zero_update_info(update_info[2])
+        #     message.update_type = UpdateType.ZERO_MOVEMENT
+        if not self.update_functions[message.update_type](*update_info):
+            return None  # Late or rejected by the gate: the pose did not change
 
-            coordinates, yaw = (update_info[0], update_info[1]) if message.update_type != UpdateType.TOPOLOGY else (self.ekf.get_position(), self.ekf.get_yaw())
-            self.save_to_csv(self.ekf.last_measurement_time, message, coordinates, yaw)
+        if message.update_type == UpdateType.TOPOLOGY:
+            coordinates, yaw = self.ekf.get_position(), self.ekf.get_yaw()
+        elif message.update_type == UpdateType.RANGING:
+            coordinates, yaw = message.measured_xyz, update_info[1]
+        else:
+            coordinates, yaw = update_info[0], update_info[1]
+        self.save_state(self.ekf.last_measurement_time, message, coordinates, yaw)
 
-            poseMsg = PoseMessage(coordinates.x, coordinates.y, coordinates.z, yaw)
-            self.pose_callback(poseMsg)
+        return coordinates, yaw
 
-            if self.sound:
-                sound_message = SoundMessage(self.ekf.get_position())
-                self.sound_queue.put(SoundMessage.save(sound_message))
+    def publish_pose(self, coordinates: Coordinates, yaw: float) -> None:
+        self.coordinate_writer.submit(self.ekf.get_position())
 
-        elif time() - self.ekf.last_measurement_time > DT_THRESHOLD:
-            update_functions[UpdateType.ZERO_MOVEMENT](*self.generate_zero_update_info(self.ekf.last_measurement_time + DT_THRESHOLD))
+        poseMsg = PoseMessage(coordinates.x, coordinates.y, coordinates.z, yaw)
+        self.pose_callback(poseMsg)
+
+        if self.sound:
+            sound_message = SoundMessage(self.ekf.get_position())
+            self.sound_queue.put(SoundMessage.save(sound_message))
 
     def extract_update_info(self, msg: UpdateMessage) -> tuple:
         if msg.update_type == UpdateType.PEDOMETER:
@@ -114,12 +163,21 @@ class EKFManager:
         elif msg.update_type == UpdateType.TRILATERATION:
             return msg.measured_xyz, self.correct_yaw(msg.measured_yaw), msg.timestamp
         elif msg.update_type == UpdateType.RANGING:
-            return msg.measured_xyz, self.correct_yaw(msg.measured_yaw), msg.timestamp, msg.neighbors
+            return self.get_ranges(msg), self.correct_yaw(msg.measured_yaw), msg.timestamp, asarray(msg.neighbors)
         elif msg.update_type == UpdateType.TOPOLOGY:
             return msg.topology,
         elif msg.update_type == UpdateType.CUSTOM_POSE:
             return Coordinates(msg.pose.x, msg.pose.y, msg.pose.z), msg.pose.yaw, msg.R, msg.timestamp
 
+    @staticmethod
+    def get_ranges(msg: UpdateMessage) -> ndarray:
+        """Messages from older senders only carry up to three ranges, in measured_xyz."""
+
+        if getattr(msg, 'ranges', None):
+            return asarray(msg.ranges, dtype=float)
+
+        return asarray([msg.measured_xyz.x, msg.measured_xyz.y, msg.measured_xyz.z][:len(msg.neighbors)], dtype=float)
+
     def infer_coordinates(self, measured_yaw: float) -> Coordinates:
         """When new information arrives from the pedometer, it is in the form of a yaw and timestamp.
         Since the step length is constant, we can infer cartesian coordinates from yaw and last know position."""
@@ -153,29 +211,11 @@ class EKFManager:
     def generate_zero_update_info(self, timestamp: float) -> tuple:
         return self.ekf.get_position(), self.ekf.get_yaw(), timestamp
 
-    def update_neighbors(self, neighbors: dict):
+    def update_neighbors(self, neighbors: dict) -> bool:
         self.last_know_neighbors = neighbors
+        return True
 
-    def save_to_csv(self, timestamp: float, message: UpdateMessage, coordinates: Coordinates, yaw: float) -> None:
+    def save_state(self, timestamp: float, message: UpdateMessage, coordinates: Coordinates, yaw: float) -> None:
         if coordinates is not None and message.update_type != UpdateType.CUSTOM_POSE:
-            csv_data = {
-                'pozyx_id': self.pozyx_id,
-                'timestamp': timestamp,
-                'synchronized_clock': message.synchronized_clock,
-                'offset': message.offset,
-                'update_type': message.update_type,
-                'coords_pos_x': coordinates.x,
-                'ekf_pos_x': self.ekf.get_position().x,
-                'coords_pos_y': coordinates.y,
-                'ekf_pos_y': self.ekf.get_position().y,
-                'coords_pos_z': coordinates.z,
-                'ekf_pos_z': self.ekf.get_position().z,
-                'raw_yaw': yaw,
-                'ekf_yaw': self.ekf.get_yaw(),
-                'ekf_covariance_matrix': linalg.det(self.ekf.P),
-                'slots': message.slots,
-                'two_hop_neighbors': self.last_know_neighbors
-            }
-
-            self.writer.writerow(csv_data)
-            self.state_csv.flush()
\ No newline at end of file
+            self.state_logger.log(self.pozyx_id, timestamp, message, coordinates, yaw, self.ekf.get_position(),
+                                  self.ekf.get_yaw(), linalg.det(self.ekf.P), self.last_know_neighbors)
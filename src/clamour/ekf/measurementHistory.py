@@ -0,0 +1,60 @@
+from numpy import copyto, empty, ndarray
+
+
+class MeasurementHistory:
+    """Fixed size ring of the last measurements applied to a filter, in time order.
+    Each entry keeps the measurement and the filter state just before it was applied,
+    so the filter can be rolled back to insert a late measurement and replay the following ones."""
+
+    def __init__(self, capacity: int, state_size: int):
+        self.capacity = capacity
+        self.start = 0
+        self.length = 0
+
+        self.timestamps = empty(capacity)
+        self.states = empty((capacity, state_size))
+        self.covariances = empty((capacity, state_size, state_size))
+        self.previous_times = empty(capacity)
+        self.previous_dts = empty(capacity)
+        self.corrections = [None] * capacity
+        self.arguments = [None] * capacity
+
+    def index(self, position: int) -> int:
+        return (self.start + position) % self.capacity
+
+    def push(self, timestamp: float, correction, arguments: tuple,
+             x: ndarray, P: ndarray, previous_time: float, previous_dt: float) -> None:
+        """Records a measurement and the state of the filter before it. The oldest entry is overwritten when full."""
+
+        if self.length == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.length += 1
+
+        i = self.index(self.length - 1)
+        self.timestamps[i] = timestamp
+        copyto(self.states[i], x)
+        copyto(self.covariances[i], P)
+        self.previous_times[i] = previous_time
+        self.previous_dts[i] = previous_dt
+        self.corrections[i] = correction
+        self.arguments[i] = arguments
+
+    def count_newer(self, timestamp: float, limit: int) -> int:
+        """Number of entries more recent than timestamp, counting from the newest and stopping after limit."""
+
+        count = 0
+        while count < self.length and count <= limit and self.timestamps[self.index(self.length - 1 - count)] > timestamp:
+            count += 1
+
+        return count
+
+    def measurements_from(self, position: int) -> list:
+        return [(self.timestamps[self.index(j)], self.corrections[self.index(j)], self.arguments[self.index(j)])
+                for j in range(position, self.length)]
+
+    def truncate(self, length: int) -> None:
+        for j in range(length, self.length):
+            self.corrections[self.index(j)] = self.arguments[self.index(j)] = None
+
+        self.length = length
@@ -0,0 +1,254 @@
+from numpy import (arange, arctan2, asarray, cos, cumsum, degrees, einsum, empty, exp, full, isfinite, ndarray, radians,
+                   searchsorted, sin, sqrt, stack, where, zeros)
+from numpy.linalg import inv
+from numpy.random import default_rng
+from pypozyx import Coordinates
+
+from messages import UpdateType
+from rooms import Floorplan
+
+from .constantVelocityEKF import STATE_SIZE
+
+NB_PARTICLES = 1000
+RESAMPLING_THRESHOLD = 0.5  # Resample when the effective number of particles drops below this fraction
+
+# Unlike the EKF covariances, these are physical noises: mm, mm/s and degrees.
+INITIAL_POSITION_STD = 200
+INITIAL_YAW_STD = 10
+ACCELERATION_STD = 500  # Random walk of the velocities, per square root of second
+YAW_ACCELERATION_STD = 30
+TRILATERATION_STD = 150
+PEDOMETER_STD = 400
+RANGING_STD = 150
+ZERO_MOVEMENT_STD = 50
+YAW_STD = 10
+
+# Squared distance, in standard deviations per measured value, from the measurement to the closest particle
+# above which the measurement is rejected: no particle explains it.
+GATE_THRESHOLDS = {
+    UpdateType.TRILATERATION: 25,
+    UpdateType.RANGING: 25,
+}
+MAX_CONSECUTIVE_REJECTIONS = 5
+
+OUTSIDE = -1  # Room index of the particles outside of the floorplan, they are not constrained
+
+
+class RoomConstraint:
+    """Vectorized version of Room.within_bounds and of the room adjacency of a Floorplan.
+    A particle can only stay in its room or move to a neighbor room, it cannot cross the other walls."""
+
+    def __init__(self, floorplan: Floorplan):
+        rooms = list(floorplan.rooms.values())
+        indexes = {room.label: i for i, room in enumerate(rooms)}
+
+        self.labels = [room.label for room in rooms]
+        self.world_to_local = asarray([inv(room.transformation_matrix)[:2] for room in rooms])
+        self.lower_limits = asarray([[-room.x_lim[0], -room.y_lim[0]] for room in rooms], dtype=float)
+        self.upper_limits = asarray([[room.x_lim[1], room.y_lim[1]] for room in rooms], dtype=float)
+
+        # reachable[i, j]: a particle in room i can move to room j. The last row is for OUTSIDE.
+        self.reachable = zeros((len(rooms) + 1, len(rooms)), dtype=bool)
+        for i, room in enumerate(rooms):
+            self.reachable[i, i] = True
+            for neighbor in room.neighbors:
+                label = neighbor.label if hasattr(neighbor, 'label') else str(neighbor).strip()
+                if label in indexes:
+                    self.reachable[i, indexes[label]] = True
+        self.reachable[OUTSIDE] = True
+
+    def inside(self, x: ndarray, y: ndarray) -> ndarray:
+        """inside[n, r] is True when the n-th point is within the bounds of room r."""
+
+        local = einsum('rij,jn->nri', self.world_to_local[:, :, :2], stack((x, y))) + self.world_to_local[:, :, 2]
+        return ((local >= self.lower_limits) & (local <= self.upper_limits)).all(axis=2)
+
+    def locate(self, x: ndarray, y: ndarray) -> ndarray:
+        inside = self.inside(x, y)
+        return where(inside.any(axis=1), inside.argmax(axis=1), OUTSIDE)
+
+    def move(self, rooms: ndarray, x: ndarray, y: ndarray) -> tuple:
+        """Returns the new rooms of the particles and a mask of the moves crossing a wall."""
+
+        in_floorplan = rooms != OUTSIDE
+        candidates = self.inside(x, y) & self.reachable[rooms]
+        valid = candidates.any(axis=1)
+        stays = in_floorplan & candidates[arange(len(rooms)), rooms]
+
+        # Particles outside of the floorplan move freely, they enter it as soon as they are in a room
+        blocked = in_floorplan & ~valid
+        new_rooms = where(stays | blocked, rooms, where(valid, candidates.argmax(axis=1), OUTSIDE))
+        return new_rooms, blocked
+
+
+class ParticleFilter:
+    """Particle filter with the same interface and state layout as ConstantVelocityEKF
+    (x, dx/dt, y, dy/dt, z, dz/dt, yaw, dyaw/dt), where the walls of the floorplan constrain the motion.
+
+    Every particle is a row of one array and every step updates all of them with array operations.
+    x and P are the weighted mean and covariance of the particles, refreshed after each update.
+    Late measurements cannot be rolled back and are dropped."""
+
+    def __init__(self, position: Coordinates, yaw: float, timestamp: float = 0, nb_particles: int = NB_PARTICLES,
+                 floorplan: Floorplan = None, seed: int = None):
+        self.nb_particles = nb_particles
+        self.last_measurement_time = timestamp
+        self.dt = 0.1
+        self.random = default_rng(seed)
+        self.constraint = RoomConstraint(floorplan if floorplan is not None else Floorplan())
+
+        self.particles = zeros((nb_particles, STATE_SIZE))
+        for axis, value in enumerate((position.x, position.y, position.z)):
+            self.particles[:, 2 * axis] = self.random.normal(value, INITIAL_POSITION_STD, nb_particles)
+        self.particles[:, 6] = self.random.normal(yaw, INITIAL_YAW_STD, nb_particles) % 360
+        self.weights = full(nb_particles, 1 / nb_particles)
+        self.rooms = self.constraint.locate(self.particles[:, 0], self.particles[:, 2])
+
+        self.values, self.velocities = self.particles[:, 0::2], self.particles[:, 1::2]
+        self.previous_values = empty((nb_particles, 4))
+        self.resampled = empty((nb_particles, STATE_SIZE))
+        self.log_likelihood = empty(nb_particles)
+        self.process_noise_std = asarray([ACCELERATION_STD] * 3 + [YAW_ACCELERATION_STD], dtype=float)
+
+        self.x = zeros(STATE_SIZE)
+        self.P = zeros((STATE_SIZE, STATE_SIZE))
+        self.nb_resamplings = 0
+        self.blocked_moves = 0
+        self.dropped_measurements = 0
+        self.gate_thresholds = dict(GATE_THRESHOLDS)
+        self.rejected_measurements = {update_type: 0 for update_type in UpdateType}
+        self.consecutive_rejections = {update_type: 0 for update_type in UpdateType}
+        self.update_estimate()
+
+    def get_position(self) -> Coordinates:
+        return Coordinates(self.x[0], self.x[2], self.x[4])
+
+    def get_yaw(self) -> float:
+        return self.x[6]
+
+    def predict(self, dt: float) -> None:
+        self.previous_values[:] = self.values
+        self.velocities += self.random.normal(0, 1, (self.nb_particles, 4)) * (self.process_noise_std * sqrt(dt))
+        self.values += dt * self.velocities
+        self.values[:, 3] %= 360
+
+        self.rooms, blocked = self.constraint.move(self.rooms, self.particles[:, 0], self.particles[:, 2])
+        if blocked.any():
+            # Moves through a wall are cancelled: the particle stays where it was and stops.
+            self.values[blocked] = self.previous_values[blocked]
+            self.velocities[blocked, :2] = 0
+            self.blocked_moves += int(blocked.sum())
+
+    def pre_update(self, timestamp: float) -> bool:
+        if timestamp < self.last_measurement_time:
+            self.dropped_measurements += 1
+            print("Received message with bad timestamp.")
+            return False
+
+        self.dt = timestamp - self.last_measurement_time
+        self.last_measurement_time = timestamp
+        self.predict(self.dt)
+        return True
+
+    def yaw_log_likelihood(self, yaw: float, std: float) -> ndarray:
+        residual = (yaw - self.values[:, 3] + 180) % 360 - 180
+        return -0.5 * (residual / std) ** 2
+
+    def direct_update(self, update_type: UpdateType, position: Coordinates, yaw: float, position_std, yaw_std: float) -> bool:
+        """position_std is a scalar or the standard deviations along x, y and z."""
+
+        residuals = asarray([position.x, position.y, position.z]) - self.values[:, :3]
+        residuals /= position_std
+        einsum('ij,ij->i', residuals, residuals, out=self.log_likelihood)
+        self.log_likelihood *= -0.5
+        self.log_likelihood += self.yaw_log_likelihood(yaw, yaw_std)
+        return self.correct(update_type, 4)
+
+    def rejects(self, update_type: UpdateType, squared_distance: float) -> bool:
+        threshold = self.gate_thresholds.get(update_type)
+        if threshold is None:
+            return False
+
+        if squared_distance <= threshold or self.consecutive_rejections[update_type] >= MAX_CONSECUTIVE_REJECTIONS:
+            self.consecutive_rejections[update_type] = 0
+            return False
+
+        self.rejected_measurements[update_type] += 1
+        self.consecutive_rejections[update_type] += 1
+        return True
+
+    def correct(self, update_type: UpdateType, nb_values: int) -> bool:
+        """Weights the particles by the likelihood of the measurement, then resamples them if needed.
+        The log likelihood of the best particle gives the gating distance."""
+
+        best = self.log_likelihood.max()
+        if self.rejects(update_type, -2 * best / nb_values):
+            return False
+
+        self.log_likelihood -= best
+        self.weights *= exp(self.log_likelihood)
+        total = self.weights.sum()
+        if total > 0 and isfinite(total):
+            self.weights /= total
+        else:
+            self.weights.fill(1 / self.nb_particles)
+
+        if 1 / (self.weights ** 2).sum() < RESAMPLING_THRESHOLD * self.nb_particles:
+            self.resample()
+        self.update_estimate()
+        return True
+
+    def resample(self) -> None:
+        """Systematic resampling: a single random offset, then one particle every 1/N of cumulated weight."""
+
+        positions = (self.random.random() + arange(self.nb_particles)) / self.nb_particles
+        cumulated = cumsum(self.weights)
+        cumulated[-1] = 1
+        indexes = searchsorted(cumulated, positions)
+
+        self.particles.take(indexes, axis=0, out=self.resampled)
+        self.particles[:] = self.resampled
+        self.rooms = self.rooms[indexes]
+        self.weights.fill(1 / self.nb_particles)
+        self.nb_resamplings += 1
+
+    def update_estimate(self) -> None:
+        self.x[:] = self.weights @ self.particles
+        angles = radians(self.values[:, 3])
+        self.x[6] = degrees(arctan2(self.weights @ sin(angles), self.weights @ cos(angles))) % 360
+
+        deviations = self.particles - self.x
+        deviations[:, 6] = (deviations[:, 6] + 180) % 360 - 180
+        self.P[:] = (deviations * self.weights[:, None]).T @ deviations
+
+    def custom_odometry_update(self, position: Coordinates, yaw: float, R, timestamp: float) -> bool:
+        print("Custom odometry update")
+        if not self.pre_update(timestamp):
+            return False
+
+        standard_deviations = sqrt(asarray(R, dtype=float).diagonal())
+        return self.direct_update(UpdateType.CUSTOM_POSE, position, yaw, standard_deviations[:3], standard_deviations[3])
+
+    def pedometer_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        return self.pre_update(timestamp) and self.direct_update(UpdateType.PEDOMETER, position, yaw, PEDOMETER_STD, YAW_STD)
+
+    def trilateration_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        return self.pre_update(timestamp) and self.direct_update(UpdateType.TRILATERATION, position, yaw,
+                                                                 TRILATERATION_STD, YAW_STD)
+
+    def zero_movement_update(self, position: Coordinates, yaw: float, timestamp: float) -> bool:
+        """Keeps the particles around the current estimate when nothing is measured for a while."""
+
+        return self.pre_update(timestamp) and self.direct_update(UpdateType.ZERO_MOVEMENT, position, yaw,
+                                                                 ZERO_MOVEMENT_STD, YAW_STD)
+
+    def ranging_update(self, ranges: ndarray, yaw: float, timestamp: float, neighbor_positions: ndarray) -> bool:
+        if not self.pre_update(timestamp):
+            return False
+
+        deltas = self.values[:, None, :3] - asarray(neighbor_positions)[None, :, :]
+        residuals = (asarray(ranges) - sqrt(einsum('nmi,nmi->nm', deltas, deltas))) / RANGING_STD
+        einsum('nm,nm->n', residuals, residuals, out=self.log_likelihood)
+        self.log_likelihood *= -0.5
+        self.log_likelihood += self.yaw_log_likelihood(yaw, YAW_STD)
+        return self.correct(UpdateType.RANGING, len(ranges) + 1)
@@ -0,0 +1,82 @@
+from numpy import copyto, diag, dot, empty, linalg, multiply, ndarray, sqrt, zeros
+from numpy.linalg import cholesky
+from pypozyx import Coordinates
+from scipy.linalg import solve_triangular
+
+from messages import UpdateType
+
+from .constantVelocityEKF import STATE_SIZE, ConstantVelocityEKF, MeasurementBuffers
+
+
+class SquareRootEKF(ConstantVelocityEKF):
+    """ConstantVelocityEKF propagating a lower triangular factor L of the covariance, P = L L^T.
+
+    Prediction and correction are done by triangularizing (QR) arrays built from L, so the covariance
+    stays symmetric positive definite by construction and its conditioning is the square root of the
+    one of P. P is recomputed from L after each step for the code reading it.
+
+    In float64, the Joseph form of ConstantVelocityEKF already keeps P symmetric positive definite:
+    on the recorded logs, even after the huge first dt of CustomEKF, both filters give the same
+    covariance (benchmarks/filter_stability.py) and this one costs about 4 times more per update.
+    It is kept as an option, ConstantVelocityEKF stays the default."""
+
+    def __init__(self, position: Coordinates, yaw: float, timestamp: float = 0):
+        super(SquareRootEKF, self).__init__(position, yaw, timestamp)
+
+        self.L = cholesky(self.P)
+        self.covariance = self.L
+        self.prediction_array = zeros((STATE_SIZE, 2 * STATE_SIZE))
+        self.update_arrays = {}
+
+    def update_covariance(self) -> None:
+        dot(self.L, self.L.T, out=self.P)
+
+    def restore(self, i: int) -> None:
+        super(SquareRootEKF, self).restore(i)
+        self.update_covariance()
+
+    def predict(self) -> None:
+        """[F L, sqrt(Q)] = L' U with U orthogonal, so that F P F^T + Q = L' L'^T."""
+
+        multiply(self.velocities, self.dt, out=self.value_buffer)
+        self.values += self.value_buffer
+
+        FL = self.prediction_array[:, :STATE_SIZE]
+        FL[:] = self.L
+        multiply(FL[1::2, :], self.dt, out=self.row_buffer)
+        FL[0::2, :] += self.row_buffer
+
+        multiply(self.process_noise_scale, self.dt, out=self.state_buffer)
+        self.prediction_array[:, STATE_SIZE:] = diag(sqrt(self.state_buffer))
+
+        copyto(self.L, linalg.qr(self.prediction_array.T, mode='r').T)
+        self.update_covariance()
+
+    def correct(self, buffers: MeasurementBuffers, R: ndarray, update_type: UpdateType) -> bool:
+        """Triangularizes [[sqrt(R), H L], [0, L]] into [[sqrt(S), 0], [K sqrt(S), L']],
+        where S = H P H^T + R, K is the Kalman gain and P' = L' L'^T.
+        The gate uses y^T S^-1 y = |sqrt(S)^-1 y|^2."""
+
+        size = buffers.y.shape[0]
+        if size not in self.update_arrays:
+            self.update_arrays[size] = empty((size + STATE_SIZE, size + STATE_SIZE))
+        pre_array = self.update_arrays[size]
+
+        pre_array.fill(0)
+        pre_array[:size, :size] = cholesky(R)
+        pre_array[:size, size:] = dot(buffers.H, self.L)
+        pre_array[size:, size:] = self.L
+
+        post_array = linalg.qr(pre_array.T, mode='r').T
+        square_root_S, scaled_gain = post_array[:size, :size], post_array[size:, :size]
+
+        whitened_innovation = solve_triangular(square_root_S, buffers.y, lower=True)
+        if self.rejects(update_type, whitened_innovation @ whitened_innovation / size):
+            return False
+
+        # K = (K sqrt(S)) sqrt(S)^-1, solved as sqrt(S)^T K^T = (K sqrt(S))^T
+        K = solve_triangular(square_root_S.T, scaled_gain.T, lower=False).T
+        self.x += dot(K, buffers.y, out=self.state_buffer)
+        copyto(self.L, post_array[size:, size:])
+        self.update_covariance()
+        return True
@@ -0,0 +1,184 @@
+import csv
+import os
+import threading
+from queue import Full, Queue
+from time import time
+
+from numpy import dtype, fromfile, zeros
+from pypozyx import Coordinates
+
+from interfaces import State
+from interfaces.timing import NB_TASK_SLOTS
+from messages import UpdateMessage, UpdateType
+
+CHUNK_SIZE = 256  # Records written at once
+MAX_PENDING_CHUNKS = 8  # Chunks waiting for the writer thread, the records of a chunk that does not fit are dropped
+FLUSH_PERIOD = 5  # Seconds before a partial chunk is handed to the writer thread
+FSYNC_PERIOD = 30  # Seconds between two fsync of the log
+MAX_LOGGED_NEIGHBORS = 16
+NO_SLOTS = -1  # nb_slots of a message without a slot list
+
+STATE_RECORD = dtype([
+    ('pozyx_id', '<u2'),
+    ('update_type', 'u1'),
+    ('nb_neighbors', 'u1'),
+    ('nb_slots', '<i2'),
+    ('timestamp', '<f8'),
+    ('synchronized_clock', '<f8'),
+    ('offset', '<f8'),
+    ('coords_pos', '<f8', 3),
+    ('ekf_pos', '<f8', 3),
+    ('raw_yaw', '<f8'),
+    ('ekf_yaw', '<f8'),
+    ('ekf_covariance_matrix', '<f8'),  # Determinant, as in broadcast_state.csv
+    ('slots', '<i2', NB_TASK_SLOTS),
+    ('neighbor_ids', '<u2', MAX_LOGGED_NEIGHBORS),
+    ('neighbor_times', '<f8', MAX_LOGGED_NEIGHBORS),
+    ('neighbor_states', 'i1', MAX_LOGGED_NEIGHBORS),
+])
+
+CSV_FIELDNAMES = ['pozyx_id', 'timestamp', 'synchronized_clock', 'offset', 'update_type',
+                  'coords_pos_x', 'ekf_pos_x', 'coords_pos_y', 'ekf_pos_y', 'ekf_pos_z', 'coords_pos_z', 'raw_yaw',
+                  'ekf_yaw', 'ekf_covariance_matrix', 'slots', 'two_hop_neighbors']
+
+
+class StateLogger:
+    """Logs the EKF state after each update as fixed size binary records (STATE_RECORD).
+
+    Records are filled in place in a chunk, and full chunks are written by a background thread,
+    so the EKF process never waits for the SD card. At most MAX_PENDING_CHUNKS chunks wait for the
+    writer: when it falls behind, new chunks are dropped and counted instead of growing the memory.
+    convert_to_csv turns a log into the broadcast_state.csv layout."""
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE, max_pending_chunks: int = MAX_PENDING_CHUNKS,
+                 flush_period: float = FLUSH_PERIOD, fsync_period: float = FSYNC_PERIOD):
+        self.file = open(path, 'wb')
+        self.chunk_size = chunk_size
+        self.flush_period = flush_period
+        self.fsync_period = fsync_period
+
+        self.records = zeros(chunk_size, dtype=STATE_RECORD)
+        self.length = 0
+        self.last_flush = time()
+        self.pending_chunks = Queue(maxsize=max_pending_chunks)
+        self.logged_records = 0
+        self.dropped_records = 0
+
+        self.writer = None
+
+    def log(self, pozyx_id: int, timestamp: float, message: UpdateMessage, coordinates: Coordinates, yaw: float,
+            ekf_position: Coordinates, ekf_yaw: float, ekf_determinant: float, neighbors: dict) -> None:
+        slots = message.slots[:NB_TASK_SLOTS] if message.slots is not None else []
+        neighbors = list(neighbors.items())[:MAX_LOGGED_NEIGHBORS]
+        padding = [0] * (MAX_LOGGED_NEIGHBORS - len(neighbors))
+
+        # Assigning the whole record at once is much faster than field by field
+        self.records[self.length] = (
+            pozyx_id, message.update_type, len(neighbors), len(slots) if message.slots is not None else NO_SLOTS,
+            timestamp, message.synchronized_clock, message.offset,
+            (coordinates.x, coordinates.y, coordinates.z), (ekf_position.x, ekf_position.y, ekf_position.z),
+            yaw, ekf_yaw, ekf_determinant,
+            slots + [0] * (NB_TASK_SLOTS - len(slots)),
+            [neighbor_id for neighbor_id, _ in neighbors] + padding,
+            [data[1] for _, data in neighbors] + padding,
+            [data[2].value if isinstance(data[2], State) else data[2] for _, data in neighbors] + padding,
+        )
+
+        self.length += 1
+        if self.length == self.chunk_size or time() - self.last_flush > self.flush_period:
+            self.flush()
+
+    def start_writer(self) -> None:
+        """The logger is created before the EKF process is forked, so the thread starts with the first chunk."""
+
+        if self.writer is None or not self.writer.is_alive():
+            self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+            self.writer.start()
+
+    def flush(self) -> None:
+        """Hands the records logged so far to the writer thread."""
+
+        self.last_flush = time()
+        if self.length == 0:
+            return
+
+        self.start_writer()
+
+        try:
+            self.pending_chunks.put_nowait(self.records[:self.length])
+            self.logged_records += self.length
+            self.records = zeros(self.chunk_size, dtype=STATE_RECORD)
+        except Full:
+            self.dropped_records += self.length
+            self.records.fill(0)
+
+        self.length = 0
+
+    def write_chunks(self) -> None:
+        last_fsync = time()
+        while True:
+            chunk = self.pending_chunks.get()
+            if chunk is None:
+                break
+
+            self.file.write(chunk.tobytes())
+            self.file.flush()
+            if time() - last_fsync > self.fsync_period:
+                os.fsync(self.file.fileno())
+                last_fsync = time()
+
+    def close(self) -> None:
+        self.flush()
+        self.start_writer()
+        self.pending_chunks.put(None)
+        self.writer.join()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def read_records(path: str):
+    """Reads a log, ignoring the last record if it was only partially written."""
+
+    with open(path, 'rb') as log:
+        return fromfile(log, dtype=STATE_RECORD, count=os.path.getsize(path) // STATE_RECORD.itemsize)
+
+
+def format_neighbors(record) -> str:
+    """Renders the neighbors as the dict of Neighborhood.current_neighbors.
+    The second degree neighbors are not logged and appear as None."""
+
+    neighbors = [f"{record['neighbor_ids'][i]}: (None, {float(record['neighbor_times'][i])!r}, "
+                 f"{State(int(record['neighbor_states'][i]))!r})" for i in range(record['nb_neighbors'])]
+    return '{' + ', '.join(neighbors) + '}'
+
+
+def convert_to_csv(log_path: str, csv_path: str) -> int:
+    """Writes the records of a binary log in the broadcast_state.csv layout. Returns the number of rows."""
+
+    records = read_records(log_path)
+    with open(csv_path, 'w') as state_csv:
+        writer = csv.DictWriter(state_csv, delimiter=',', fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+
+        for record in records:
+            slots = None if record['nb_slots'] == NO_SLOTS else [int(slot) for slot in record['slots'][:record['nb_slots']]]
+            writer.writerow({
+                'pozyx_id': int(record['pozyx_id']),
+                'timestamp': float(record['timestamp']),
+                'synchronized_clock': float(record['synchronized_clock']),
+                'offset': float(record['offset']),
+                'update_type': f"UpdateType.{UpdateType(int(record['update_type'])).name}",
+                'coords_pos_x': float(record['coords_pos'][0]),
+                'ekf_pos_x': float(record['ekf_pos'][0]),
+                'coords_pos_y': float(record['coords_pos'][1]),
+                'ekf_pos_y': float(record['ekf_pos'][1]),
+                'coords_pos_z': float(record['coords_pos'][2]),
+                'ekf_pos_z': float(record['ekf_pos'][2]),
+                'raw_yaw': float(record['raw_yaw']),
+                'ekf_yaw': float(record['ekf_yaw']),
+                'ekf_covariance_matrix': float(record['ekf_covariance_matrix']),
+                'slots': slots,
+                'two_hop_neighbors': format_neighbors(record),
+            })
+
+    return len(records)
@@ -1,5 +1,8 @@
+import random
 from enum import Enum
-from time import perf_counter
+from clockSource import perf_counter
+
+from messages.uwbMessage import HELD, SHARED
 
 
 OBSOLESCENCE_DELAY = 20  # nb of seconds beyond which a neighbor becomes irrelevant
@@ -21,6 +24,83 @@ class Neighborhood:
         self.neighbor_synchronization_received = {}
         self.synchronized_active_neighbor_count = 0
         self.changed = False  # Indicates if the neighborhood has changed since the last topology broadcast
+        self.last_heard = {}  # id -> timestamp, kept for OBSOLESCENCE_DELAY even when collected from current_neighbors
+        self.local_id = None  # Scheduling broadcast slot of the node, distinct within two hops, see claim_local_id
+        self.nb_local_ids = 1  # Local IDs held within two hops, the node included
+        self.local_id_period = 1  # Scheduling slots of a broadcast period, a power of two above the local IDs within two hops
+        self.neighbor_local_ids = {}  # id -> local ID announced by the neighbor
+        self.announced_local_ids = {}  # id -> {local ID: HELD or SHARED} within one hop of the neighbor
+
+    def assign_local_ids(self, own_id: int) -> None:
+        """Settles the local ID of the node at the end of the synchronization, see claim_local_id.
+        The local IDs of the neighbors heard within OBSOLESCENCE_DELAY are kept: when the channel is busy, some
+        were not heard within the short garbage collection delay of the synchronization.
+
+        The local IDs within two hops are distinct, so a broadcast period of a power of two above all of them
+        gives every node within two hops its own slot, even when the neighbors of a node count different nodes.
+        The scheduling phase lasts as many slots per cycle as there are local IDs within two hops: each node
+        broadcasts at least once every two cycles."""
+
+        for id in [id for id, timestamp in self.last_heard.items() if timestamp < perf_counter() - OBSOLESCENCE_DELAY]:
+            del self.last_heard[id]
+        for table in (self.neighbor_local_ids, self.announced_local_ids):
+            for id in [id for id in table if id not in self.last_heard and id not in self.current_neighbors]:
+                del table[id]
+
+        self.claim_local_id(own_id)
+        local_ids = self.two_hop_local_ids() | {self.local_id}
+        self.nb_local_ids = len(local_ids)
+        self.local_id_period = 1 << max(local_ids).bit_length()
+
+    def claim_local_id(self, own_id: int) -> None:
+        """Takes the lowest local ID that no node within two hops holds, when the node has none or gives its own up.
+        A neighbor holding the same local ID makes the node with the higher ID give it up, or the node alone
+        once the neighbor has left the synchronization and cannot change its own anymore. A local ID held
+        by several neighbors of a neighbor, none of them within one hop, is given up with a probability of one half
+        by each of them, as they cannot tell each other apart. Such a conflict is ignored when every neighbor
+        of the reporting neighbor is a neighbor of the node: it has only not heard yet that it was resolved."""
+
+        if self.local_id is not None:
+            holders = [id for id, local_id in self.neighbor_local_ids.items() if local_id == self.local_id]
+            if holders:
+                keep = own_id < min(holders) and all(self.current_neighbors.get(id, (None, 0, State.SYNCHRONIZATION))[2]
+                                                     == State.SYNCHRONIZATION for id in holders)
+            else:
+                keep = all(local_ids.get(self.local_id) != SHARED or self.knows_neighbors_of(neighbor, own_id)
+                           for neighbor, local_ids in self.announced_local_ids.items()) or random.random() < 0.5
+            if keep:
+                return
+
+        held = self.two_hop_local_ids()
+        self.local_id = min(set(range(len(held) + 1)) - held)
+
+    def knows_neighbors_of(self, neighbor: int, own_id: int) -> bool:
+        """True when the last topology of the neighbor only lists nodes whose local IDs the node hears itself."""
+
+        second_degree_neighbors = self.current_neighbors.get(neighbor, (None,))[0]
+        return second_degree_neighbors is not None and \
+            set(second_degree_neighbors) - {own_id} <= self.neighbor_local_ids.keys()
+
+    def two_hop_local_ids(self) -> set:
+        """The local IDs held by the neighbors and by their neighbors, as last announced."""
+
+        held = {local_id for local_id in self.neighbor_local_ids.values() if local_id is not None}
+        for local_ids in self.announced_local_ids.values():
+            held.update(local_ids)
+
+        return held
+
+    def local_id_states(self) -> dict:
+        """The local IDs held within one hop, the node included, marked SHARED when several nodes hold them."""
+
+        holders = [local_id for local_id in [self.local_id, *self.neighbor_local_ids.values()] if local_id is not None]
+        return {local_id: SHARED if holders.count(local_id) > 1 else HELD for local_id in holders}
+
+    def add_local_ids(self, device_id: int, local_id: int, local_ids: dict) -> None:
+        """The local ID of a neighbor and those it announced within one hop of it."""
+
+        self.neighbor_local_ids[device_id] = local_id
+        self.announced_local_ids[device_id] = local_ids
 
     def collect_garbage(self, delay: float = OBSOLESCENCE_DELAY) -> None:
         for id in [id for id, data in self.current_neighbors.items() if data[1] < perf_counter() - delay]:
@@ -42,6 +122,7 @@ class Neighborhood:
             updated_second_degree_neighbors = second_degree_neighbors
 
         self.current_neighbors[device_id] = (updated_second_degree_neighbors, timestamp, state)
+        self.last_heard[device_id] = timestamp
         self.changed = True
 
     def add_synced_neighbor(self, device_id: int) -> None:
@@ -1,36 +1,99 @@
 from .timing import NB_TASK_SLOTS
 
 
+def bit_count(mask: int) -> int:
+    return bin(mask).count('1')  # int.bit_count needs Python 3.10
+
+
+def slots_of(mask: int) -> list:
+    """Slots whose bit is set, in increasing order."""
+
+    slots = []
+    while mask:
+        lowest = mask & -mask
+        slots.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return slots
+
+
 class SlotAssignment:
-    def __init__(self):
-        self.block = [-1] * NB_TASK_SLOTS
-        self.non_block = []
-        self.send_list = [-1] * NB_TASK_SLOTS
-        self.pure_send_list = []
-        self.receive_list = [-1] * NB_TASK_SLOTS
-        self.free_slots = NB_TASK_SLOTS
-        self.subpriority_slots = []
+    """Task slots of the node and of its neighbors.
+
+    send_list holds, per slot, the id of the node if it proposed to send in it, -2 if its proposal was
+    rejected, -1 otherwise. receive_list holds the id of the neighbor sending in it, -1 otherwise.
+    Both are written with set_send and set_receive, which keep bitmasks of the slots up to date, so
+    that the free, blocked and own slots are found with a few integer operations instead of scans."""
+
+    def __init__(self, nb_slots: int = None):
+        self.nb_slots = NB_TASK_SLOTS if nb_slots is None else nb_slots
+        self.all_slots = (1 << self.nb_slots) - 1
+        self.send_list = [-1] * self.nb_slots
+        self.receive_list = [-1] * self.nb_slots
+        self.sending = 0  # Slots where send_list is not -1
+        self.rejected = 0  # Slots where send_list is -2
+        self.receiving = 0  # Slots where receive_list is not -1
+        self.blocked = 0  # Slots that were sending or receiving at an update_free_slots, until the next reset
+        self.free = self.all_slots  # Slots neither sending nor receiving at the last update_free_slots
+        self.free_slots = self.nb_slots
+        self.own = 0  # Slots of pure_send_list
+        self._pure_send_list = []
+
+    @property
+    def pure_send_list(self) -> list:
+        return self._pure_send_list
+
+    @pure_send_list.setter
+    def pure_send_list(self, slots: list) -> None:
+        """Slots where the node sends. -1 entries are allowed and ignored."""
+
+        self._pure_send_list = list(slots)
+        self.own = 0
+        for slot in self._pure_send_list:
+            if 0 <= slot < self.nb_slots:
+                self.own |= 1 << slot
+
+    @property
+    def non_block(self) -> list:
+        return slots_of(self.free)
+
+    @property
+    def subpriority_slots(self) -> list:
+        return slots_of(self.free & self.rejected)
+
+    def set_send(self, slot: int, value: int) -> None:
+        self.send_list[slot] = value
+        bit = 1 << slot
+        self.sending = self.sending | bit if value != -1 else self.sending & ~bit
+        self.rejected = self.rejected | bit if value == -2 else self.rejected & ~bit
+
+    def set_receive(self, slot: int, sender_id: int) -> None:
+        self.receive_list[slot] = sender_id
+        bit = 1 << slot
+        self.receiving = self.receiving | bit if sender_id != -1 else self.receiving & ~bit
+
+    def is_blocked(self, slot: int) -> bool:
+        return bool(self.blocked >> slot & 1)
+
+    def is_own_slot(self, slot: int) -> bool:
+        return 0 <= slot < self.nb_slots and bool(self.own >> slot & 1)
 
     def update_free_slots(self):
-        self.non_block.clear()
-        self.subpriority_slots.clear()
-        self.free_slots = 0
-
-        for x in range(NB_TASK_SLOTS):
-            if self.send_list[x] != -1 or self.receive_list[x] != -1:
-                self.block[x] = 1
-            else:
-                self.non_block.append(x)
-                if self.send_list[x] == -2:
-                    self.subpriority_slots.append(x) 
-                self.free_slots += 1
+        occupied = self.sending | self.receiving
+        self.blocked |= occupied
+        self.free = self.all_slots & ~occupied
+        self.free_slots = bit_count(self.free)
+
+    def update_pure_send_list(self):
+        """The node sends in the slots it proposed and that no neighbor took."""
+
+        self.pure_send_list = slots_of(self.sending & ~self.rejected & ~self.receiving)
 
     def first_task_slot_in_frame(self) -> int:
         return [slot for slot in self.pure_send_list if slot != -1][0]
 
     def reset(self):
-        self.block = [-1] * len(self.block)
-        self.send_list = [-1] * len(self.send_list)
-        self.receive_list = [-1] * len(self.receive_list)
+        self.send_list = [-1] * self.nb_slots
+        self.receive_list = [-1] * self.nb_slots
+        self.sending = self.rejected = self.receiving = self.blocked = 0
         self.pure_send_list = []
         self.update_free_slots()
@@ -13,7 +13,7 @@ SLOT_FOR_RESET = 30
 THRESHOLD_SYNCTIME = 15
 
 SYNCHRONIZATION_PERIOD = 5000
-NB_NODES = 40 # The number should bigger than the maximum ID sequence (not the practical amount of nodes involved. eg. ID 8228 (10000000100100 & 0xFF) UWB tag send message on slot 36. So the number should bigger than 36.)
+NB_NODES = 40  # Nodes assumed within two hops until a synchronization numbers them, see Neighborhood.assign_local_ids
 SCHEDULING_SLOT_DURATION = 30
 NB_SCHEDULING_CYCLES = 200
 
@@ -55,9 +55,9 @@ class Timing:
         self.update_current_time()
         return (self.current_time_in_cycle < self.task_process_time - SLOT_FOR_RESET)
 
-    def in_taskslot(self, assigned_list) -> bool:
+    def in_taskslot(self, slot_assignment) -> bool:
         self.update_current_time()
-        return (self.current_slot_id in assigned_list)
+        return slot_assignment.is_own_slot(self.current_slot_id)
 
     def update_current_time(self):
         self.logical_clock.update_clock()
@@ -65,6 +65,29 @@ class Timing:
         self.frame_id = floor(self.current_time_in_cycle / FRAME_DURATION)
         self.current_slot_id = floor((self.current_time_in_cycle % FRAME_DURATION) / TASK_SLOT_DURATION)
 
+    def time_until_slot(self, slots: int = None):
+        """Seconds until the start of the next task slot, or of the next one of the slots bitmask
+        (None if it is empty)."""
+
+        self.update_current_time()
+        time_in_frame = self.current_time_in_cycle % FRAME_DURATION
+        next_slot = floor(time_in_frame / TASK_SLOT_DURATION) + 1
+        if slots is not None:
+            later = slots >> (next_slot % NB_TASK_SLOTS)
+            if later:
+                next_slot += ((later & -later).bit_length() - 1)
+            elif slots:
+                next_slot += NB_TASK_SLOTS - next_slot % NB_TASK_SLOTS + (slots & -slots).bit_length() - 1
+            else:
+                return None
+
+        return (next_slot * TASK_SLOT_DURATION - time_in_frame) / SECONDS_TO_MILLISECONDS
+
+    def time_in_slot(self) -> float:
+        """Milliseconds elapsed since the start of the current task slot."""
+
+        return self.current_time_in_cycle % TASK_SLOT_DURATION
+
     def enough_time_left(self) -> bool:
         return (self.current_time_in_cycle % TASK_SLOT_DURATION) < MAX_RANGING_DELAY
 
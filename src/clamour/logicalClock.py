@@ -1,4 +1,4 @@
-from time import perf_counter
+from clockSource import perf_counter
 
 
 class LogicalClock:
@@ -1,9 +1,11 @@
+from .duplicateFilter import DuplicateFilter
 from .messageBox import MessageBox
 from .messageFactory import MessageFactory
 from .synchronizationMessage import SynchronizationMessage
-from .types import MessageType, UpdateType
+from .types import MessageType, UpdateType, WireTag
 from .updateMessage import UpdateMessage
-from .uwbMessage import (UWBMessage, UWBSynchronizationMessage, UWBTDMAMessage, UWBTopologyMessage)
+from .uwbMessage import (UWBMessage, UWBSynchronizationMessage, UWBTDMAMessage, UWBTopologyMessage, UWBLocalIdMessage)
 from .soundMessage import SoundMessage
 from .poseMessage import PoseMessage
-from .customOdometryMessage import CustomOdometryMessage
\ No newline at end of file
+from .customOdometryMessage import CustomOdometryMessage
+from .wireFormat import decode, encode, update_type_of
\ No newline at end of file
@@ -1,21 +1,41 @@
+from struct import Struct, pack, unpack_from
+
 from messages import PoseMessage
-from .types import UpdateType
+from .types import UpdateType, WireTag
+from .wireFormat import decode, encode, wire_type
+
+CUSTOM_ODOMETRY = Struct('<BddddBBd')  # tag, x, y, z, yaw, rows and columns of R, timestamp
 
+
+@wire_type(WireTag.CUSTOM_ODOMETRY)
 class CustomOdometryMessage:
+    __slots__ = ('pose', 'R', 'timestamp', 'update_type')
+
     def __init__(self, pose: PoseMessage, R, timestamp: float):
         self.pose = pose
         self.R = R
         self.timestamp = timestamp
         self.update_type = UpdateType.CUSTOM_POSE
 
+    def pack(self) -> bytes:
+        rows, columns = len(self.R), len(self.R[0])
+        values = [value for row in self.R for value in row]
+        return CUSTOM_ODOMETRY.pack(self.TAG, self.pose.x, self.pose.y, self.pose.z, self.pose.yaw,
+                                    rows, columns, self.timestamp) + pack(f'<{len(values)}d', *values)
+
+    @staticmethod
+    def unpack(data: bytes) -> "CustomOdometryMessage":
+        _, x, y, z, yaw, rows, columns, timestamp = CUSTOM_ODOMETRY.unpack_from(data)
+        values = unpack_from(f'<{rows * columns}d', data, CUSTOM_ODOMETRY.size)
+        R = [list(values[i * columns:(i + 1) * columns]) for i in range(rows)]
+        return CustomOdometryMessage(PoseMessage(x, y, z, yaw), R, timestamp)
+
     @staticmethod
-    def save(message):
-        """"Pickles the message"""
-        return message.__class__, message.__dict__
+    def save(message) -> bytes:
+        """Packs the message"""
+        return encode(message)
 
     @staticmethod
-    def load(cls, attributes) -> "UpdateMessage":
-        """Unpickles the message"""
-        obj = cls.__new__(cls)
-        obj.__dict__.update(attributes)
-        return obj
+    def load(data: bytes):
+        """Unpacks a message of any type"""
+        return decode(data)
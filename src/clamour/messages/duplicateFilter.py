@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+from clockSource import perf_counter
+
+from .uwbMessage import UWBMessage
+
+DUPLICATE_WINDOW = 10  # s, a message seen again after this delay is treated as a new one
+DUPLICATE_CAPACITY = 1024  # Messages remembered at most, the least recently seen are forgotten first
+
+
+class DuplicateFilter:
+    """Set of the UWB messages received recently, used to ignore the ones read again from the Pozyx RX buffer.
+
+    A message is keyed by the integer (sender_id << 32) | data, with the time it was last seen.
+    Keys are kept in the order they were last seen, so expired ones are popped from the front.
+    Unlike a plain set, it stays bounded over a long task phase."""
+
+    def __init__(self, window: float = DUPLICATE_WINDOW, capacity: int = DUPLICATE_CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.last_seen = OrderedDict()
+        self.next_expiry = 0.0  # Time at which the least recently seen key may expire
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(message: UWBMessage) -> int:
+        return (message.sender_id << 32) | message.data
+
+    def add(self, message: UWBMessage) -> bool:
+        """Records that the message was seen now. Returns False if it was already seen within the window.
+        Seeing a message again extends its window, so a frame left in the RX buffer stays a duplicate."""
+
+        now = perf_counter()
+        key = self.key(message)
+        seen = self.last_seen.get(key)
+        if seen is not None:
+            self.last_seen.move_to_end(key)
+        self.last_seen[key] = now
+
+        if now >= self.next_expiry:
+            self.expire(now)
+        if len(self.last_seen) > self.capacity:
+            self.last_seen.popitem(last=False)
+            self.evicted += 1
+
+        return seen is None or now - seen > self.window
+
+    def expire(self, now: float) -> None:
+        while self.last_seen:
+            key = next(iter(self.last_seen))
+            if now - self.last_seen[key] <= self.window:
+                self.next_expiry = self.last_seen[key] + self.window
+                return
+            del self.last_seen[key]
+            self.expired += 1
+
+        self.next_expiry = now + self.window
+
+    def clear(self) -> None:
+        self.last_seen.clear()
+
+    def __contains__(self, message: UWBMessage) -> bool:
+        seen = self.last_seen.get(self.key(message))
+        return seen is not None and perf_counter() - seen <= self.window
+
+    def __len__(self) -> int:
+        return len(self.last_seen)
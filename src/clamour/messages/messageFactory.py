@@ -1,9 +1,11 @@
 from pypozyx import Data
 from .types import MessageType
-from .uwbMessage import (UWBMessage, UWBSynchronizationMessage, UWBTDMAMessage, UWBTopologyMessage)
+from .uwbMessage import (UWBMessage, UWBSynchronizationMessage, UWBTDMAMessage, UWBTopologyMessage,
+                         UWBLocalIdMessage)
 
 
 CUSTOM_MESSAGE_SIGNATURE = 0xAA
+LOCAL_ID_SIGNATURE = 0xAB  # The local ID messages use all 32 data bits
 TYPE_A_BIT_MASK = 0x80000000
 TYPE_B_BIT_MASK = 0xC0000000
 
@@ -13,8 +15,11 @@ class MessageFactory:
     def create(sender_id: int, raw_data: Data) -> UWBMessage:
         """For SYNC messages, only one bit (MSB) is used for type. The second one is used as an OK.
         For  TDMA and topology, the 2 MSB are used for type. The difference in nb bits used for type
-        explains the 2 message_type variables.
+        explains the 2 message_type variables. Local ID messages have their own signature.
         """
+        if raw_data[0] == LOCAL_ID_SIGNATURE:
+            return UWBLocalIdMessage(sender_id, MessageType.LOCAL_ID, raw_data[1])
+
         if MessageFactory.is_custom_message(raw_data[0]): # check  is_custom_message first
             message_type_a = (raw_data[1] & TYPE_A_BIT_MASK) >> 31
             message_type_b = (raw_data[1] & TYPE_B_BIT_MASK) >> 30
@@ -1,18 +1,34 @@
+from struct import Struct
+
+from .types import WireTag
+from .wireFormat import decode, encode, wire_type
+
+POSE = Struct('<Bdddd')  # tag, x, y, z, yaw
+
+
+@wire_type(WireTag.POSE)
 class PoseMessage:
+    __slots__ = ('x', 'y', 'z', 'yaw')
+
     def __init__(self, x, y, z, yaw):
         self.x = x
         self.y = y
         self.z = z
         self.yaw = yaw
 
+    def pack(self) -> bytes:
+        return POSE.pack(self.TAG, self.x, self.y, self.z, self.yaw)
+
+    @staticmethod
+    def unpack(data: bytes) -> "PoseMessage":
+        return PoseMessage(*POSE.unpack_from(data)[1:])
+
     @staticmethod
-    def save(message):
-        """"Pickles the message"""
-        return message.__class__, message.__dict__
+    def save(message) -> bytes:
+        """Packs the message"""
+        return encode(message)
 
     @staticmethod
-    def load(cls, attributes) -> "UpdateMessage":
-        """Unpickles the message"""
-        obj = cls.__new__(cls)
-        obj.__dict__.update(attributes)
-        return obj
+    def load(data: bytes):
+        """Unpacks a message of any type"""
+        return decode(data)
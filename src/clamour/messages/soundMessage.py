@@ -1,22 +1,37 @@
 """"This type of message conveys information about a new state measurement.
-It is intended to be passed to a ContextManagedQueue as a pickled class + dictionary tuple.
+It is intended to be passed to a ContextManagedQueue as bytes packed by save.
 The state information passed within the message will be used to choose which sound to play next."""
 
+from struct import Struct
+
 from pypozyx import Coordinates
 
+from .types import WireTag
+from .wireFormat import decode, encode, wire_type
+
+SOUND = Struct('<Bddd')  # tag, x, y, z
 
+
+@wire_type(WireTag.SOUND)
 class SoundMessage:
+    __slots__ = ('coordinates',)
+
     def __init__(self, coordinates: Coordinates):
         self.coordinates = coordinates
 
+    def pack(self) -> bytes:
+        return SOUND.pack(self.TAG, self.coordinates.x, self.coordinates.y, self.coordinates.z)
+
+    @staticmethod
+    def unpack(data: bytes) -> "SoundMessage":
+        return SoundMessage(Coordinates(*SOUND.unpack_from(data)[1:]))
+
     @staticmethod
-    def save(message):
-        """"Pickles the message"""
-        return message.__class__, message.__dict__
+    def save(message) -> bytes:
+        """Packs the message"""
+        return encode(message)
 
     @staticmethod
-    def load(cls, attributes) -> "SoundMessage":
-        """Unpickles the message"""
-        obj = cls.__new__(cls)
-        obj.__dict__.update(attributes)
-        return obj
+    def load(data: bytes):
+        """Unpacks a message of any type"""
+        return decode(data)
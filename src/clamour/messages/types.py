@@ -5,6 +5,7 @@ class MessageType(IntEnum):
     SYNC = 0  # 0b0(0/1)
     TDMA = 2  # 0b10
     TOPOLOGY = 3  # 0b11
+    LOCAL_ID = 4  # No type bits, sent with LOCAL_ID_SIGNATURE
 
 
 class UpdateType(IntEnum):
@@ -14,3 +15,11 @@ class UpdateType(IntEnum):
     ZERO_MOVEMENT = 3
     TOPOLOGY = 4
     CUSTOM_POSE = 5
+
+
+class WireTag(IntEnum):
+    """First byte of the messages exchanged between processes, see wireFormat."""
+    UPDATE = 1
+    SOUND = 2
+    POSE = 3
+    CUSTOM_ODOMETRY = 4
@@ -1,16 +1,30 @@
 """"This type of message conveys information about a new state measurement.
-It is intended to be passed to a ContextManagedQueue as a pickled class + dictionary tuple.
+It is intended to be passed to a ContextManagedQueue as bytes packed by save.
 The state information passed within the message will be used to update the device's EKF."""
 
+import pickle
+from struct import Struct, calcsize, pack, unpack_from
+
 from pypozyx import Coordinates
-from .types import UpdateType
+from .types import UpdateType, WireTag
+from .wireFormat import decode, encode, wire_type
+
+# tag, update type, timestamp, synchronized clock, offset, yaw, has coordinates,
+# number of slots, neighbors and ranges (NONE when the list is None), size of the pickled topology
+HEADER = Struct('<BBdddd?hhhI')
+COORDINATES = Struct('<ddd')
+NONE = -1
 
 
+@wire_type(WireTag.UPDATE)
 class UpdateMessage:
+    __slots__ = ('timestamp', 'synchronized_clock', 'offset', 'update_type', 'measured_xyz', 'measured_yaw',
+                 'slots', 'neighbors', 'topology', 'ranges')
+
     def __init__(self, update_type: UpdateType, timestamp: float,
                  synchronized_clock: float=0.0, offset: float=0.0,
                  measured_yaw: float=0.0, measured_xyz: Coordinates=None,
-                 slots: list=None, neighbors: list=None, topology: dict=None):
+                 slots: list=None, neighbors: list=None, topology: dict=None, ranges: list=None):
         self.timestamp = timestamp
         self.synchronized_clock = synchronized_clock
         self.offset = offset
@@ -20,15 +34,55 @@ class UpdateMessage:
         self.slots = slots
         self.neighbors = neighbors if neighbors is not None else []
         self.topology = topology if topology is not None else {}
+        self.ranges = ranges  # Distances to each neighbor, measured_xyz only holds the first three
+
+    def pack(self) -> bytes:
+        """The topology is the only field of variable structure, it is pickled."""
+
+        slots = self.slots if self.slots is not None else []
+        neighbors = [value for neighbor in self.neighbors for value in neighbor]
+        ranges = self.ranges if self.ranges is not None else []
+        topology = pickle.dumps(self.topology, pickle.HIGHEST_PROTOCOL) if self.topology else b''
+
+        header = HEADER.pack(self.TAG, self.update_type, self.timestamp, self.synchronized_clock, self.offset,
+                             self.measured_yaw, self.measured_xyz is not None,
+                             len(slots) if self.slots is not None else NONE, len(self.neighbors),
+                             len(ranges) if self.ranges is not None else NONE, len(topology))
+        coordinates = b'' if self.measured_xyz is None else \
+            COORDINATES.pack(self.measured_xyz.x, self.measured_xyz.y, self.measured_xyz.z)
+
+        return b''.join((header, coordinates, pack(f'<{len(slots)}h{len(neighbors)}d{len(ranges)}d',
+                                                   *slots, *neighbors, *ranges), topology))
+
+    @staticmethod
+    def unpack(data: bytes) -> "UpdateMessage":
+        (_, update_type, timestamp, synchronized_clock, offset, measured_yaw, has_coordinates,
+         nb_slots, nb_neighbors, nb_ranges, topology_size) = HEADER.unpack_from(data)
+        position = HEADER.size
+
+        measured_xyz = None
+        if has_coordinates:
+            measured_xyz = Coordinates(*COORDINATES.unpack_from(data, position))
+            position += COORDINATES.size
+
+        values_format = f'<{max(nb_slots, 0)}h{3 * nb_neighbors}d{max(nb_ranges, 0)}d'
+        values = unpack_from(values_format, data, position)
+        position += calcsize(values_format)
+        slots = list(values[:max(nb_slots, 0)]) if nb_slots != NONE else None
+        values = values[max(nb_slots, 0):]
+        neighbors = [list(values[3 * i:3 * i + 3]) for i in range(nb_neighbors)]
+        ranges = list(values[3 * nb_neighbors:]) if nb_ranges != NONE else None
+        topology = pickle.loads(data[position:position + topology_size]) if topology_size else None
+
+        return UpdateMessage(UpdateType(update_type), timestamp, synchronized_clock, offset, measured_yaw, measured_xyz,
+                             slots, neighbors, topology, ranges)
 
     @staticmethod
-    def save(message):
-        """"Pickles the message"""
-        return message.__class__, message.__dict__
+    def save(message) -> bytes:
+        """Packs the message"""
+        return encode(message)
 
     @staticmethod
-    def load(cls, attributes) -> "UpdateMessage":
-        """Unpickles the message"""
-        obj = cls.__new__(cls)
-        obj.__dict__.update(attributes)
-        return obj
+    def load(data: bytes):
+        """Unpacks a message of any type: the communication queue also carries CustomOdometryMessage"""
+        return decode(data)
@@ -1,6 +1,14 @@
 from .types import MessageType
 from ctypes import c_uint32 as uint32
 
+TAG_BASE_VALUE = 0x2000
+TOPOLOGY_PAGE_SIZE = 25  # Tags per topology frame, the other 5 data bits hold the page
+TOPOLOGY_NB_PAGES = 16
+LOCAL_ID_PAGE_SIZE = 9  # Local IDs per local ID frame, 2 bits each
+LOCAL_ID_NB_PAGES = 16
+NO_LOCAL_ID = 0x1FF  # Local ID of a sender that has none yet
+FREE, HELD, SHARED = range(3)  # A local ID is held by none, one or several of the tags within one hop of the sender
+
 
 class InvalidValueException(Exception):
     pass
@@ -42,7 +50,7 @@ class UWBSynchronizationMessage(UWBMessage):
         self.data = uint32((bool(self.message_type) << 31) | (self.synchronized << 30) | (self.synchronized_clock.value >> 2)).value
 
     def __hash__(self):
-        return hash(str(self.sender_id) + str(self.data))
+        return hash((self.sender_id << 32) | self.data)
 
     def __eq__(self, other):
         return self.__hash__() == other.__hash__()
@@ -76,7 +84,7 @@ class UWBTDMAMessage(UWBMessage):
         self.data = uint32((self.message_type << 30) | (self.slot << 15) | self.code).value
 
     def __hash__(self):
-        return hash(str(self.sender_id) + str(self.data))
+        return hash((self.sender_id << 32) | self.data)
 
     def __repr__(self):
         return "Type: " + str(self.message_type) + "slot: " + str(self.slot) + "code: " + str(self.code)
@@ -86,30 +94,110 @@ class UWBTDMAMessage(UWBMessage):
 
 
 class UWBTopologyMessage(UWBMessage):
+    """The neighbors of the sender, as a bitmap of the tag IDs TAG_BASE_VALUE + 1 to TAG_BASE_VALUE + 400.
+
+    The 30 data bits hold a final page bit, a 4 bit page number and the bitmap of the 25 tags of the page.
+    A neighborhood is sent as the pages 0 to the last one holding a neighbor, the last one has the final bit,
+    so that the receivers can forget the pages that are not sent anymore. Other IDs cannot be encoded."""
+
     def __init__(self, sender_id: int, message_type: MessageType = MessageType.TOPOLOGY,
-                 data: int = 0, topology: list = None):
+                 data: int = 0, topology: list = None, page: int = 0, final: bool = True):
         super(UWBTopologyMessage, self).__init__(sender_id, message_type, data)
-        self.TAG_ID_MASK = 0xFF
-        self.TAG_BASE_VALUE = 0x2000
-        self.NB_BITS = 30  # Only the last 30 bits are used for data, because the 2 MSB are for message type
+        self.TAG_BASE_VALUE = TAG_BASE_VALUE
+        self.NB_BITS = TOPOLOGY_PAGE_SIZE
+        self.PAGE_MASK = 0x1E000000
+        self.FINAL_MASK = 0x20000000
         self.data = data
         self.neighborhood = topology if topology is not None else []
+        self.page = page
+        self.final = final
         self.bitwise_neighbors = 0
 
+    @staticmethod
+    def paginate(sender_id: int, topology: list) -> list:
+        """The pages needed to send the topology, the last one is final."""
+
+        indexes = [index for index in map(topology_index, topology) if index is not None]
+        nb_pages = max(indexes) // TOPOLOGY_PAGE_SIZE + 1 if indexes else 1
+        return [UWBTopologyMessage(sender_id, topology=list(topology), page=page, final=page == nb_pages - 1)
+                for page in range(nb_pages)]
+
     def decode(self):
-        self.neighborhood = [(i + 1 | self.TAG_BASE_VALUE) for i in range(self.NB_BITS) if (self.data >> i) & 0x1 == 1]
+        self.final = bool(self.data & self.FINAL_MASK)
+        self.page = (self.data & self.PAGE_MASK) >> 25
+        first = self.page * self.NB_BITS + 1
+        self.neighborhood = [(first + i) | self.TAG_BASE_VALUE for i in range(self.NB_BITS) if (self.data >> i) & 0x1 == 1]
 
     def encode(self):
         self.calculate_bitwise_neighbors()
-        self.data = uint32((self.message_type << 30) | self.bitwise_neighbors).value
+        self.data = uint32((self.message_type << 30) | (self.final << 29) | (self.page << 25) | self.bitwise_neighbors).value
 
     def calculate_bitwise_neighbors(self) -> None:
         self.bitwise_neighbors = 0
-        for neighbor in self.neighborhood:
-            self.bitwise_neighbors |= 1 << ((neighbor & self.TAG_ID_MASK) - 1)
+        for index in map(topology_index, self.neighborhood):
+            if index is not None and index // self.NB_BITS == self.page:
+                self.bitwise_neighbors |= 1 << (index % self.NB_BITS)
 
     def __eq__(self, other: 'UWBTDMAMessage'):
         return self.__hash__() == other.__hash__()
 
     def __hash__(self):
-        return hash(str(self.sender_id) + str(self.data))
+        return hash((self.sender_id << 32) | self.data)
+
+
+class UWBLocalIdMessage(UWBMessage):
+    """The local ID of the sender and the states of the local IDs 0 to 143 within one hop of it, itself included.
+
+    The 32 data bits hold the local ID of the sender (9 bits, NO_LOCAL_ID before it has one), a final page bit,
+    a 4 bit page number and the FREE, HELD or SHARED state of the 9 local IDs of the page. The frame is told apart
+    by its signature, see MessageFactory. Pages are sent as those of UWBTopologyMessage."""
+
+    def __init__(self, sender_id: int, message_type: MessageType = MessageType.LOCAL_ID,
+                 data: int = 0, local_id: int = None, local_ids: dict = None, page: int = 0, final: bool = True):
+        super(UWBLocalIdMessage, self).__init__(sender_id, message_type, data)
+        self.LOCAL_ID_MASK = 0xFF800000
+        self.FINAL_MASK = 0x400000
+        self.PAGE_MASK = 0x3C0000
+        self.local_id = local_id
+        self.local_ids = local_ids if local_ids is not None else {}  # local ID -> HELD or SHARED
+        self.page = page
+        self.final = final
+
+    @staticmethod
+    def paginate(sender_id: int, local_id: int, local_ids: dict) -> list:
+        """The pages needed to send the local IDs, the last one is final."""
+
+        encodable = [id for id in local_ids if id < LOCAL_ID_PAGE_SIZE * LOCAL_ID_NB_PAGES]
+        nb_pages = max(encodable) // LOCAL_ID_PAGE_SIZE + 1 if encodable else 1
+        return [UWBLocalIdMessage(sender_id, local_id=local_id, local_ids=dict(local_ids), page=page,
+                                  final=page == nb_pages - 1) for page in range(nb_pages)]
+
+    def decode(self):
+        local_id = (self.data & self.LOCAL_ID_MASK) >> 23
+        self.local_id = None if local_id == NO_LOCAL_ID else local_id
+        self.final = bool(self.data & self.FINAL_MASK)
+        self.page = (self.data & self.PAGE_MASK) >> 18
+        first = self.page * LOCAL_ID_PAGE_SIZE
+        self.local_ids = {first + i: (self.data >> 2 * i) & 0x3 for i in range(LOCAL_ID_PAGE_SIZE) if (self.data >> 2 * i) & 0x3}
+
+    def encode(self):
+        local_id = NO_LOCAL_ID if self.local_id is None or self.local_id >= NO_LOCAL_ID else self.local_id
+        states = 0
+        for id, state in self.local_ids.items():
+            if id // LOCAL_ID_PAGE_SIZE == self.page:
+                states |= state << (2 * (id % LOCAL_ID_PAGE_SIZE))
+
+        self.data = uint32((local_id << 23) | (self.final << 22) | (self.page << 18) | states).value
+
+    def __eq__(self, other: 'UWBLocalIdMessage'):
+        return self.__hash__() == other.__hash__()
+
+    def __hash__(self):
+        return hash((self.sender_id << 32) | self.data)
+
+
+def topology_index(tag_id: int):
+    """Position of the tag in the topology bitmaps, None if it cannot be encoded."""
+
+    index = tag_id - TAG_BASE_VALUE - 1
+    return index if 0 <= index < TOPOLOGY_PAGE_SIZE * TOPOLOGY_NB_PAGES else None
@@ -0,0 +1,38 @@
+"""Binary format of the messages exchanged between the CLAMOUR processes.
+
+Every message packs itself with struct into bytes starting with its WireTag,
+so the receiving process can decode any message without knowing its class in advance."""
+
+from .types import UpdateType, WireTag
+
+WIRE_TYPES = {}
+
+
+def wire_type(tag: WireTag):
+    """Class decorator registering the class decoding the messages with this tag."""
+
+    def register(cls):
+        cls.TAG = tag
+        WIRE_TYPES[tag] = cls
+        return cls
+
+    return register
+
+
+def encode(message) -> bytes:
+    return message.pack()
+
+
+def decode(data: bytes):
+    return WIRE_TYPES[data[0]].unpack(data)
+
+
+def update_type_of(data: bytes):
+    """UpdateType of a packed message without decoding it, None for the messages that are not updates.
+    The update type is the second byte of an UpdateMessage."""
+
+    if data[0] == WireTag.UPDATE:
+        return UpdateType(data[1])
+    if data[0] == WireTag.CUSTOM_ODOMETRY:
+        return UpdateType.CUSTOM_POSE
+    return None
@@ -1,22 +1,31 @@
 import random
 from multiprocessing import Lock
 from struct import error as StructError
-from time import perf_counter, time
+from clockSource import perf_counter, time
 
 from pypozyx import Data, PozyxSerial, RXInfo, SingleRegister, Coordinates
+from pypozyx.definitions.bitmasks import POZYX_INT_STATUS_RX_DATA
+from pypozyx.definitions.constants import POZYX_SUCCESS
 
 from contextManagedQueue import ContextManagedQueue
 from interfaces import Neighborhood, SlotAssignment, State
 from interfaces.timing import NB_TASK_SLOTS
-from messages import (MessageBox, MessageFactory, UWBSynchronizationMessage, UWBTDMAMessage,
-                      UWBTopologyMessage, UpdateMessage, UpdateType)
-from messages.messageFactory import CUSTOM_MESSAGE_SIGNATURE
+from messages import (DuplicateFilter, MessageBox, MessageFactory, UWBLocalIdMessage, UWBSynchronizationMessage,
+                      UWBTDMAMessage, UWBTopologyMessage, UpdateMessage, UpdateType)
+from messages.messageFactory import CUSTOM_MESSAGE_SIGNATURE, LOCAL_ID_SIGNATURE
+
+# Reading the interrupt status clears it, including inside the library calls that wait for a flag
+# (positioning, ranging): the RX info is read anyway when no RX interrupt was seen for this long.
+FALLBACK_POLL_PERIOD = 0.05  # s
 
 
 class Messenger:
     def __init__(self, id: int, shared_pozyx: PozyxSerial, neighborhood: Neighborhood,
                  slot_assignment: SlotAssignment, shared_pozyx_lock: Lock,
-                 multiprocess_communication_queue: ContextManagedQueue):
+                 multiprocess_communication_queue: ContextManagedQueue, use_interrupts: bool = True):
+        """use_interrupts only reads the RX info and buffer when the RX data interrupt is pending,
+        instead of reading them on every tick."""
+
         self.id = id
         self.message_box = MessageBox()
         self.pozyx = shared_pozyx
@@ -24,14 +33,30 @@ class Messenger:
         self.neighborhood = neighborhood
         self.slot_assignment = slot_assignment
         self.multiprocess_communication_queue = multiprocess_communication_queue
-        self.received_messages = set()
+        self.received_messages = DuplicateFilter()
         self.should_go_back_to_sync = 0
 
+        self.use_interrupts = use_interrupts
+        self.last_rx_read = 0.0
+        self.last_receive_check = perf_counter()
+        self.interrupt_checks = 0
+        self.skipped_polls = 0  # Ticks where no RX interrupt was pending, so nothing else was read
+        self.rx_reads = 0
+        self.last_topology_frame = (0, 0, 0)
+        self.topology_pages = []  # Pages of the own topology and local IDs left to broadcast
+        self.local_id_pages = []  # Pages of the own local IDs left to broadcast during the synchronization
+        self.received_topology_pages = {}  # sender -> {page: neighbors}
+        self.received_local_id_pages = {}  # sender -> {page: {local ID: state}}
+        self.wasted_polls = 0  # RX reads that found no new message
+        self.received = 0
+        self.receive_latency_sum = 0.0
+        self.receive_latency_max = 0.0
+
     def send_ekf_update(self, update_type: UpdateType, clock: float, offset: float,
                         measured_position: Coordinates, yaw: float,
-                        neighbors: list=None, topology: dict=None) -> None:
+                        neighbors: list=None, topology: dict=None, ranges: list=None) -> None:
         message = UpdateMessage(update_type, time(), clock, offset, yaw, measured_position, 
-                                self.slot_assignment.pure_send_list, neighbors, topology)
+                                self.slot_assignment.pure_send_list, neighbors, topology, ranges)
         self.multiprocess_communication_queue.put(UpdateMessage.save(message))
 
     def send_topology_update(self, clock: float, offset: float, topology: dict) -> None:
@@ -53,12 +78,12 @@ class Messenger:
             code = -1
             if self.should_chose_from_non_block():
                 # Propose new slot by randomly choosing from non_block
-                slot = random.randint(0, len(self.slot_assignment.non_block) - 1)
-                self.slot_assignment.send_list[slot] = self.id
+                slot = random.randint(0, self.slot_assignment.free_slots - 1)
+                self.slot_assignment.set_send(slot, self.id)
             elif self.should_chose_from_subpriority():
                 # Propose new slot by randomly choosing from subpriority_slots
                 slot = random.choice(self.slot_assignment.subpriority_slots)
-                self.slot_assignment.send_list[slot] = self.id
+                self.slot_assignment.set_send(slot, self.id)
             else:
                 slot = random.choice(self.slot_assignment.pure_send_list)
         else:
@@ -68,16 +93,35 @@ class Messenger:
         self.broadcast(slot, code)
 
     def broadcast_topology_message(self):
-        message = UWBTopologyMessage(sender_id=self.id, topology=self.neighborhood.current_neighbors.keys())
+        """Broadcasts the next page of the topology or of the local IDs, new ones are paginated once the previous
+        ones were sent. A single page is sent per call: frames sent back to back collide at the receivers."""
+
+        if not self.topology_pages:
+            self.topology_pages = UWBTopologyMessage.paginate(self.id, self.neighborhood.current_neighbors.keys()) + \
+                self.paginate_local_ids()
+        self.send_page(self.topology_pages.pop(0))
+
+    def broadcast_local_id_message(self):
+        """Broadcasts the next page of the local IDs, as broadcast_topology_message."""
+
+        if not self.local_id_pages:
+            self.local_id_pages = self.paginate_local_ids()
+        self.send_page(self.local_id_pages.pop(0))
+
+    def paginate_local_ids(self) -> list:
+        return UWBLocalIdMessage.paginate(self.id, self.neighborhood.local_id, self.neighborhood.local_id_states())
+
+    def send_page(self, message) -> None:
         message.encode()
+        signature = LOCAL_ID_SIGNATURE if isinstance(message, UWBLocalIdMessage) else CUSTOM_MESSAGE_SIGNATURE
 
         with self.pozyx_lock:
-            self.pozyx.sendData(destination=0, data=Data([0xAA, message.data], 'BI'))
+            self.pozyx.sendData(destination=0, data=Data([signature, message.data], 'BI'))
         
     def should_chose_from_non_block(self) -> bool:
         return len(self.slot_assignment.pure_send_list) < \
                int((NB_TASK_SLOTS + 1) / (len(self.neighborhood.current_neighbors) + 1)) \
-               and len(self.slot_assignment.non_block) > 0
+               and self.slot_assignment.free_slots > 0
 
     def should_chose_from_subpriority(self) -> bool:
         return len(self.slot_assignment.pure_send_list) < \
@@ -105,7 +149,7 @@ class Messenger:
         return should_go_to_sync
 
     def handle_control_message(self, control_message: UWBTDMAMessage) -> None:
-        if control_message.slot > len(self.slot_assignment.receive_list):
+        if control_message.slot > self.slot_assignment.nb_slots:
             return  # Invalid slot, skipping message
 
         if control_message.code == -1:
@@ -116,7 +160,7 @@ class Messenger:
             self.handle_assignment_correction(control_message)
 
     def handle_assignment_request(self, message: UWBTDMAMessage) -> None:
-        if self.slot_assignment.block[message.slot] == -1:
+        if not self.slot_assignment.is_blocked(message.slot):
             self.accept_proposal(message)
         elif self.slot_assignment.send_list[message.slot] == -2:
             self.accept_receiving(message)
@@ -126,14 +170,14 @@ class Messenger:
     def accept_proposal(self, message: UWBTDMAMessage) -> None:
         """Assigns requested slot to the message's sender."""
 
-        self.slot_assignment.receive_list[message.slot] = message.sender_id
+        self.slot_assignment.set_receive(message.slot, message.sender_id)
 
     def accept_receiving(self, message: UWBTDMAMessage) -> None:
         """Since this slot is unavailable for sending message,
         the current node will listen while this slot is active."""
 
-        self.slot_assignment.send_list[message.slot] = -1
-        self.slot_assignment.receive_list[message.slot] = message.sender_id
+        self.slot_assignment.set_send(message.slot, -1)
+        self.slot_assignment.set_receive(message.slot, message.sender_id)
 
     def reject_proposal(self, message: UWBTDMAMessage) -> None:
         """This slot was already occupied, so the proposal must be rejected."""
@@ -153,29 +197,34 @@ class Messenger:
         if message not in self.message_box:
             self.message_box.append(message)
 
-        self.slot_assignment.send_list[message.slot] = -2
+        self.slot_assignment.set_send(message.slot, -2)
 
     def handle_assignment_correction(self, message: UWBTDMAMessage) -> None:
         """A previous assignment was wrong
         and there was a request for it to be corrected."""
 
-        self.slot_assignment.receive_list[message.slot] = -1
+        self.slot_assignment.set_receive(message.slot, -1)
 
     def receive_new_message(self, state: State) -> (bool, bool):
         """Attempts to get a message from the Pozyx tag.
         If the attempt fails or if the same message was received before,
         returns False."""
 
-        is_new_message = False
+        is_new_message = is_new_topology = False
+        rx_reads = self.rx_reads
         sender_id, data = self.obtain_message_from_pozyx()
 
-        if sender_id != 0 and data[0] == CUSTOM_MESSAGE_SIGNATURE:
+        if sender_id != 0 and data[0] in (CUSTOM_MESSAGE_SIGNATURE, LOCAL_ID_SIGNATURE):
             received_message = MessageFactory.create(sender_id, data)
-            if isinstance(received_message, UWBTopologyMessage):
+            if isinstance(received_message, (UWBTopologyMessage, UWBLocalIdMessage)):
                 received_message.decode()
-                self.update_topology(State.LISTEN, topology_info=received_message.neighborhood, sender_id=sender_id)
-            elif received_message not in self.received_messages:
-                self.received_messages.add(received_message)
+                if isinstance(received_message, UWBTopologyMessage):
+                    self.update_topology(State.LISTEN, topology_info=self.assemble_topology(received_message), sender_id=sender_id)
+                else:
+                    self.neighborhood.add_local_ids(sender_id, received_message.local_id, self.assemble_local_ids(received_message))
+                is_new_topology = (sender_id, data[0], data[1]) != self.last_topology_frame  # Not filtered, re-read otherwise
+                self.last_topology_frame = (sender_id, data[0], data[1])
+            elif self.received_messages.add(received_message):
                 self.message_box.append(received_message)
                 is_new_message = True
                 self.should_go_back_to_sync += int(state != State.SYNCHRONIZATION and isinstance(received_message, UWBSynchronizationMessage))
@@ -183,8 +232,85 @@ class Messenger:
             if self.should_go_back_to_sync > max(len(self.neighborhood.current_neighbors) * 3, 10):
                 print("Received sync messages, going back to sync.", self.should_go_back_to_sync, len(self.neighborhood.current_neighbors))
 
+        self.record_reception(is_new_message or is_new_topology, self.rx_reads > rx_reads)
+
         return is_new_message, (self.should_go_back_to_sync > max(len(self.neighborhood.current_neighbors) * 3, 10))
 
+    def assemble_topology(self, message: UWBTopologyMessage) -> list:
+        """The neighbors of the sender, from the last version of each of its pages.
+        A final page drops the pages after it, which the sender does not need anymore."""
+
+        pages = self.received_topology_pages.setdefault(message.sender_id, {})
+        pages[message.page] = message.neighborhood
+        if message.final:
+            for page in [page for page in pages if page > message.page]:
+                del pages[page]
+
+        return [neighbor for page in sorted(pages) for neighbor in pages[page]]
+
+    def assemble_local_ids(self, message: UWBLocalIdMessage) -> dict:
+        """The local IDs within one hop of the sender, from the last version of each of its pages, as assemble_topology."""
+
+        pages = self.received_local_id_pages.setdefault(message.sender_id, {})
+        pages[message.page] = message.local_ids
+        if message.final:
+            for page in [page for page in pages if page > message.page]:
+                del pages[page]
+
+        return {local_id: state for page in sorted(pages) for local_id, state in pages[page].items()}
+
+    def record_reception(self, received: bool, rx_read: bool) -> None:
+        """A message received now arrived after the previous check: the time since then bounds its latency."""
+
+        now = perf_counter()
+        if received:
+            latency = now - self.last_receive_check
+            self.received += 1
+            self.receive_latency_sum += latency
+            self.receive_latency_max = max(self.receive_latency_max, latency)
+        elif rx_read:
+            self.wasted_polls += 1
+
+        self.last_receive_check = now
+
+    def receive_statistics(self) -> dict:
+        return {
+            'interrupt_checks': self.interrupt_checks,
+            'skipped_polls': self.skipped_polls,
+            'rx_reads': self.rx_reads,
+            'wasted_polls': self.wasted_polls,
+            'received': self.received,
+            'mean_receive_latency': self.receive_latency_sum / self.received if self.received else 0.0,
+            'max_receive_latency': self.receive_latency_max,
+        }
+
+    def rx_data_pending(self) -> bool:
+        """Checks the RX data interrupt. Without interrupts, or when the check fails, the RX info must be read."""
+
+        now = perf_counter()
+        if not self.use_interrupts or now - self.last_rx_read >= FALLBACK_POLL_PERIOD:
+            self.last_rx_read = now
+            return True
+
+        interrupts = SingleRegister()
+        try:
+            with self.pozyx_lock:
+                status = self.pozyx.getInterruptStatus(interrupts)
+        except StructError as s:
+            print("Interrupt status crashes! ", str(s))
+            status = None
+        except AttributeError:
+            self.use_interrupts = False  # A device without the interrupt register, such as a scripted one
+            status = None
+
+        self.interrupt_checks += 1
+        if status == POZYX_SUCCESS and not interrupts[0] & POZYX_INT_STATUS_RX_DATA:
+            self.skipped_polls += 1
+            return False
+
+        self.last_rx_read = now
+        return True
+
     def obtain_message_from_pozyx(self) -> (int, Data, int):
         data = Data([0, 0], 'BI')
         sender_id, message_byte_size = self.get_message_metadata()
@@ -197,7 +323,10 @@ class Messenger:
 
     def get_message_metadata(self) -> (int, int):
         info = RXInfo()
+        if not self.rx_data_pending():
+            return info[0], info[1]
 
+        self.rx_reads += 1
         try:
             with self.pozyx_lock:
                 self.pozyx.getRxInfo(info)
@@ -3,62 +3,69 @@ import math
 import numpy as np
 
 from multiprocessing import Lock
-from pypozyx import PozyxSerial, LinearAcceleration, EulerAngles
+from pypozyx import PozyxSerial, LinearAcceleration, SensorData
 from time import sleep, time
 from struct import error as StructError
 from messages import UpdateMessage, UpdateType
 from .pedometerMeasurement import PedometerMeasurement
 
+SAMPLE_PERIOD = 0.01  # s
+
 
 class Pedometer:
-    def __init__(self, communication_queue, pozyx: PozyxSerial, pozyx_lock: Lock):
+    def __init__(self, communication_queue, pozyx: PozyxSerial, pozyx_lock: Lock, sample_period: float = SAMPLE_PERIOD):
         self.pozyx = pozyx
         self.pozyx_lock = pozyx_lock
         self.steps = []
         self.buffer = np.array([PedometerMeasurement(0, 0, 0)] * 20)
         self.communication_queue = communication_queue
+        self.start_time = time()
+        self.previous_angles = np.array([0.0, 0.0, 0.0, 0.0])
+        self.nb_measurements = 0
+        self.sample_period = sample_period
 
     def run(self):
         print("Running pedometer")
-        start_time = time()
-        previous_angles = np.array([0.0, 0.0, 0.0, 0.0])
-        nb_measurements = 0
+        self.start_time = time()
+        next_sample = self.start_time
 
         while True:
-            linear_acceleration = self.get_acceleration_measurement()
-            yaw, previous_angles = self.get_filtered_yaw_measurement(previous_angles, nb_measurements)
-            vertical_acceleration = self.vertical_acceleration(self.holding_angle(), linear_acceleration)
+            self.step()
+            next_sample += self.sample_period
+            sleep(max(next_sample - time(), 0))
 
-            # Only used to verify if previous_angles has been filled before using it for smoothing.
-            if nb_measurements < 5:
-                nb_measurements += 1
+    def step(self) -> None:
+        """Takes one IMU sample and looks for a step in the buffer."""
 
-            self.buffer = np.append(self.buffer[1:],
-                                    [PedometerMeasurement(time() - start_time, vertical_acceleration, yaw)])
+        sensor_data = self.get_sensor_data()
+        yaw, self.previous_angles = self.get_filtered_yaw_measurement(sensor_data.euler_angles.heading,
+                                                                      self.previous_angles, self.nb_measurements)
+        vertical_acceleration = self.vertical_acceleration(self.holding_angle(sensor_data.gravity_vector),
+                                                           sensor_data.acceleration)
 
-            self.detect_step()
-            sleep(0.01)
+        # Only used to verify if previous_angles has been filled before using it for smoothing.
+        if self.nb_measurements < 5:
+            self.nb_measurements += 1
 
-    def get_acceleration_measurement(self) -> LinearAcceleration:
-        linear_acceleration = LinearAcceleration()
-        try:
-            with self.pozyx_lock:
-                self.pozyx.getAcceleration_mg(linear_acceleration)
-        except StructError as s:
-            print(str(s))
+        self.buffer = np.append(self.buffer[1:],
+                                [PedometerMeasurement(time() - self.start_time, vertical_acceleration, yaw)])
+
+        self.detect_step()
 
-        return linear_acceleration
+    def get_sensor_data(self) -> SensorData:
+        """Reads the acceleration, Euler angles and gravity vector, with all the other sensor registers,
+        in a single register block read instead of one lock acquisition and serial round trip each."""
 
-    def get_filtered_yaw_measurement(self, previous_angles: np.ndarray, i: int) -> (np.ndarray, np.ndarray):
-        angles = EulerAngles()
+        sensor_data = SensorData([0] * len(SensorData.data_format))
         try:
             with self.pozyx_lock:
-                self.pozyx.getEulerAngles_deg(angles)
+                self.pozyx.getAllSensorData(sensor_data)
         except StructError as s:
-            print(s)
+            print(str(s))
 
-        yaw = angles.heading
+        return sensor_data
 
+    def get_filtered_yaw_measurement(self, yaw: float, previous_angles: np.ndarray, i: int) -> (np.ndarray, np.ndarray):
         if self.jump(previous_angles[-1], yaw):
             previous_angles = [yaw] * 4
 
@@ -102,14 +109,8 @@ class Pedometer:
         return (all(previous_smaller) or len(previous_smaller) == 0) \
             and (all(subsequent_smaller) or len(subsequent_smaller) == 0)
 
-    def holding_angle(self) -> float:
-        gravity = LinearAcceleration()
-        try:
-            with self.pozyx_lock:
-                self.pozyx.getGravityVector_mg(gravity)
-        except StructError as s:
-            print(str(s))
-
+    @staticmethod
+    def holding_angle(gravity: LinearAcceleration) -> float:
         return math.atan(abs(gravity[2]/gravity[1])) if gravity[1] != 0 else 0
 
     @staticmethod
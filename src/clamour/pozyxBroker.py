@@ -0,0 +1,262 @@
+"""Process owning the Pozyx serial port and serving the calls of the other CLAMOUR processes.
+
+Instead of sharing a PozyxSerial behind a multiprocessing.Lock, every process gets a PozyxClient
+with the same methods. A call is sent to the broker as a request and waits for its response.
+The broker serves the pending requests by priority, so the TDMA radio traffic goes before positioning
+and IMU polling, and reads registers requested at the same time in a single serial exchange when
+they are close enough. A serial exchange in progress is never interrupted: a slow call such as
+doDiscovery still delays the requests that arrive meanwhile, but they no longer queue on a lock."""
+
+import heapq
+import itertools
+import threading
+from collections import namedtuple
+from multiprocessing import Pipe, SimpleQueue
+from time import monotonic
+
+from pypozyx import POZYX_SUCCESS, Data, PozyxRegisters
+from pypozyx.definitions.constants import MAX_SERIAL_SIZE
+from pypozyx.lib import PozyxLib
+from pypozyx.structures.byte_structure import ByteStructure
+
+from runnableProcess import RunnableProcess
+
+TDMA_PRIORITY, POSITIONING_PRIORITY, SENSOR_PRIORITY, CONFIGURATION_PRIORITY = range(4)
+
+# Methods not listed are served with CONFIGURATION_PRIORITY
+PRIORITIES = {
+    'sendData': TDMA_PRIORITY,
+    'getRxInfo': TDMA_PRIORITY,
+    'readRXBufferData': TDMA_PRIORITY,
+    'getInterruptStatus': TDMA_PRIORITY,
+    'doPositioning': POSITIONING_PRIORITY,
+    'doRanging': POSITIONING_PRIORITY,
+    'getCoordinates': POSITIONING_PRIORITY,
+    'setCoordinates': POSITIONING_PRIORITY,
+    'getEulerAngles_deg': SENSOR_PRIORITY,
+    'getAcceleration_mg': SENSOR_PRIORITY,
+    'getGravityVector_mg': SENSOR_PRIORITY,
+    'getAllSensorData': SENSOR_PRIORITY,
+}
+
+# First register read by the methods that only fill one ByteStructure: the ones that can be batched
+REGISTER_READS = {
+    'getCoordinates': PozyxRegisters.POSITION_X,
+    'getAllSensorData': PozyxRegisters.PRESSURE,
+    'getAcceleration_mg': PozyxRegisters.ACCELERATION_X,
+    'getEulerAngles_deg': PozyxRegisters.EULER_ANGLE_HEADING,
+    'getGravityVector_mg': PozyxRegisters.GRAVITY_VECTOR_X,
+}
+MAX_BATCH_SPAN = MAX_SERIAL_SIZE  # bytes, the most a single serial exchange reads
+REPORT_PERIOD = 60  # s between two latency reports printed by the broker
+STATISTICS = '__statistics__'  # Request answered by the broker itself
+
+Request = namedtuple('Request', ['client_id', 'method', 'args', 'kwargs', 'sent', 'index'])  # index in its call_all
+
+
+class PozyxClient:
+    """Stands for the Pozyx device in one process: every method call is served by the PozyxBroker.
+    The ByteStructure arguments filled by the device are loaded back into the caller's objects."""
+
+    def __init__(self, client_id: int, requests: SimpleQueue, responses):
+        self.client_id = client_id
+        self.requests = requests
+        self.responses = responses
+        self.lock = threading.Lock()  # Threads of a process share its client, one call_all at a time
+
+    def call(self, method: str, args: tuple = (), kwargs: dict = None):
+        return self.call_all([(method, args, kwargs)])[0]
+
+    def call_all(self, calls: list) -> list:
+        """Sends all the (method, args, kwargs) calls before waiting for their results,
+        so that the broker can read their registers in a single exchange.
+        The broker answers them in its own order, each response carries the index of its call."""
+
+        calls = [(method, args, kwargs or {}) for method, args, kwargs in calls]
+        with self.lock:
+            sent = monotonic()
+            self.requests.put([Request(self.client_id, method, args, kwargs, sent, index)
+                               for index, (method, args, kwargs) in enumerate(calls)])
+            responses = sorted((self.responses.recv() for _ in calls), key=lambda response: response[0])
+
+        results = []
+        for (method, args, kwargs), (_, result, filled_args, filled_kwargs, error) in zip(calls, responses):
+            if error is not None:
+                raise error
+
+            filled = list(zip(args, filled_args)) + [(kwargs[name], filled_kwargs[name]) for name in filled_kwargs]
+            for argument, filled_argument in filled:
+                if filled_argument is not None:
+                    argument.load(list(filled_argument.data))
+            results.append(result)
+
+        return results
+
+    def statistics(self) -> dict:
+        return self.call(STATISTICS)
+
+    def __getattr__(self, name: str):
+        if name in ('client_id', 'requests', 'responses', 'lock'):
+            raise AttributeError(name)  # Not initialized yet, avoids an infinite recursion when copied
+
+        def call(*args, **kwargs):
+            return self.call(name, args, kwargs)
+
+        return call
+
+
+class PozyxBroker(RunnableProcess):
+    """Creates the device with pozyx_factory in its own process and serves the requests of its clients.
+
+    The clients must all be created with client() before the broker process starts.
+    Register reads are batched when batch_reads is True, by default when the device is a PozyxLib
+    (a PozyxSerial): simulated and replayed devices implement the read methods themselves."""
+
+    def __init__(self, pozyx_factory, batch_reads: bool = None, report_period: float = REPORT_PERIOD):
+        super().__init__()
+        self.pozyx_factory = pozyx_factory
+        self.batch_reads = batch_reads
+        self.report_period = report_period
+        self.requests = SimpleQueue()
+        self.response_pipes = []
+        self.pozyx = None
+
+        self.pending = []  # Heap of (priority, arrival, request)
+        self.arrivals = itertools.count()
+        self.latencies = {}  # method -> [count, total wait, max wait, total service, max service]
+        self.batched_requests = 0
+        self.saved_exchanges = 0
+
+    def client(self) -> PozyxClient:
+        receiving, sending = Pipe(duplex=False)
+        self.response_pipes.append(sending)
+        return PozyxClient(len(self.response_pipes) - 1, self.requests, receiving)
+
+    def run(self):
+        self.pozyx = self.pozyx_factory()
+        if self.batch_reads is None:
+            self.batch_reads = isinstance(self.pozyx, PozyxLib)
+
+        next_report = monotonic() + self.report_period
+        while True:
+            self.receive(block=not self.pending)
+            self.serve(heapq.heappop(self.pending)[2])
+
+            if monotonic() >= next_report:
+                self.print_report()
+                next_report += self.report_period
+
+    def receive(self, block: bool) -> None:
+        """Moves the requests sent by the clients to the heap of pending requests."""
+
+        if block:
+            self.push(self.requests.get())
+        while not self.requests.empty():
+            self.push(self.requests.get())
+
+    def push(self, requests: list) -> None:
+        for request in requests:
+            priority = PRIORITIES.get(request.method, CONFIGURATION_PRIORITY)
+            heapq.heappush(self.pending, (priority, next(self.arrivals), request))
+
+    def serve(self, request: Request) -> None:
+        if request.method == STATISTICS:
+            self.respond(request, self.statistics(), None, monotonic())
+        elif self.batch_reads and self.is_register_read(request):
+            batch = [request] + [entry[2] for entry in self.pending if self.is_register_read(entry[2])]
+            self.pending = [entry for entry in self.pending if not self.is_register_read(entry[2])]
+            heapq.heapify(self.pending)
+            for group in self.group_reads(batch):
+                self.read_registers(group)
+        else:
+            self.execute(request)
+
+    @staticmethod
+    def is_register_read(request: Request) -> bool:
+        return request.method in REGISTER_READS and len(request.args) == 1 and not request.kwargs \
+            and isinstance(request.args[0], ByteStructure)
+
+    @staticmethod
+    def group_reads(batch: list) -> list:
+        """Groups the register reads whose registers fit in a single serial exchange."""
+
+        groups = []
+        for request in sorted(batch, key=lambda request: REGISTER_READS[request.method]):
+            address = REGISTER_READS[request.method]
+            end = address + request.args[0].byte_size
+            if groups and end - groups[-1][0] <= MAX_BATCH_SPAN:
+                groups[-1][1] = max(groups[-1][1], end)
+                groups[-1][2].append(request)
+            else:
+                groups.append([address, end, [request]])
+
+        return [requests for _, _, requests in groups]
+
+    def execute(self, request: Request) -> None:
+        start = monotonic()
+        try:
+            result, error = getattr(self.pozyx, request.method)(*request.args, **request.kwargs), None
+        except Exception as e:
+            result, error = None, e
+
+        self.respond(request, result, error, start)
+
+    def read_registers(self, group: list) -> None:
+        if len(group) == 1:
+            self.execute(group[0])
+            return
+
+        first_address = REGISTER_READS[group[0].method]
+        size = max(REGISTER_READS[request.method] + request.args[0].byte_size for request in group) - first_address
+        span = Data([0] * size)
+
+        start = monotonic()
+        try:
+            result, error = self.pozyx.getRead(first_address, span), None
+        except Exception as e:
+            result, error = None, e
+
+        if result == POZYX_SUCCESS:
+            registers = bytes(span.data)
+            for request in group:
+                offset = REGISTER_READS[request.method] - first_address
+                request.args[0].load_packed(registers[offset:offset + request.args[0].byte_size])
+
+        self.batched_requests += len(group)
+        self.saved_exchanges += len(group) - 1
+        for request in group:
+            self.respond(request, result, error, start)
+
+    def respond(self, request: Request, result, error, start: float) -> None:
+        filled_args = [argument if isinstance(argument, ByteStructure) else None for argument in request.args]
+        filled_kwargs = {name: argument for name, argument in request.kwargs.items() if isinstance(argument, ByteStructure)}
+        self.response_pipes[request.client_id].send((request.index, result, filled_args, filled_kwargs, error))
+
+        end = monotonic()
+        latency = self.latencies.setdefault(request.method, [0, 0.0, 0.0, 0.0, 0.0])
+        latency[0] += 1
+        latency[1] += start - request.sent
+        latency[2] = max(latency[2], start - request.sent)
+        latency[3] += end - start
+        latency[4] = max(latency[4], end - start)
+
+    def statistics(self) -> dict:
+        """Time spent by the requests of each method waiting for the broker and being served (s)."""
+
+        return {
+            'methods': {method: {'count': count, 'mean_wait': total_wait / count, 'max_wait': max_wait,
+                                 'mean_service': total_service / count, 'max_service': max_service}
+                        for method, (count, total_wait, max_wait, total_service, max_service) in self.latencies.items()},
+            'pending': len(self.pending),
+            'batched_requests': self.batched_requests,
+            'saved_exchanges': self.saved_exchanges,
+        }
+
+    def print_report(self) -> None:
+        statistics = self.statistics()
+        print("Pozyx broker:", statistics['batched_requests'], "batched reads,",
+              statistics['saved_exchanges'], "serial exchanges saved")
+        for method, latency in sorted(statistics['methods'].items()):
+            print("  {:22} {:8} calls, wait {:7.2f} ms (max {:7.2f}), service {:7.2f} ms (max {:7.2f})".format(
+                method, latency['count'], latency['mean_wait'] * 1e3, latency['max_wait'] * 1e3,
+                latency['mean_service'] * 1e3, latency['max_service'] * 1e3))
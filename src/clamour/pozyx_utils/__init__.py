@@ -1 +1,4 @@
 from .discovery import PozyxDiscoverer
+from .recordingPozyx import RecordingPozyx
+from .deviceListMirror import DeviceListMirror
+from .pozyxProfile import InstrumentedLock, InstrumentedPozyx, PozyxProfile
@@ -0,0 +1,79 @@
+from multiprocessing import Lock
+from struct import error as StructError
+
+from pypozyx import PozyxSerial
+from pypozyx.definitions.constants import POZYX_SUCCESS
+
+
+class DeviceListMirror:
+    """Cached copy of the device list of the Pozyx, {device_id: (flag, x, y, z)}, so that syncing it
+    only sends the changes instead of clearing the list and adding every device again.
+
+    Adding a device that is already listed overwrites its entry, so a listed device with other
+    coordinates only needs an addDevice. PozyxLib.removeDevice reads back the coordinates of every
+    other device and configures them all again: it costs more serial transactions than clearing the
+    list and adding the remaining devices, which is what is done when entries must go.
+
+    The copy only holds while the list is changed through the mirror: after a discovery, clear() and
+    listed() establish it again. None stands for a list or coordinates that are not known."""
+
+    def __init__(self, pozyx: PozyxSerial, pozyx_lock: Lock):
+        self.pozyx = pozyx
+        self.pozyx_lock = pozyx_lock
+        self.devices = None
+        self.selection = None  # (mode, number of anchors) last set
+        self.syncs = 0
+        self.transactions = 0
+        self.saved_transactions = 0
+
+    def clear(self) -> None:
+        with self.pozyx_lock:
+            status = self.pozyx.clearDevices()
+        self.devices = {} if status == POZYX_SUCCESS else None
+
+    def listed(self, device_ids: list) -> None:
+        """The ids read from the device list, e.g. after a discovery added the devices it found."""
+
+        known = self.devices or {}
+        self.devices = {int(device_id): known.get(int(device_id)) for device_id in device_ids}
+
+    def sync(self, devices: list, selection: tuple = None) -> tuple:
+        """Makes the device list hold exactly the given DeviceCoordinates, and sets the anchor selection
+        when given and changed, under a single lock acquisition.
+        Returns the serial transactions made, and the ones saved compared to clearing the list,
+        adding every device and setting the selection."""
+
+        wanted = {device.network_id: tuple(device.data[1:]) for device in devices}
+        must_clear = self.devices is None or any(device_id not in wanted for device_id in self.devices)
+        listed = {} if must_clear else self.devices
+        additions = [device for device in devices if listed.get(device.network_id) != wanted[device.network_id]]
+        set_selection = selection is not None and selection != self.selection
+
+        statuses, crashed = [], False
+        try:
+            with self.pozyx_lock:
+                if must_clear:
+                    statuses.append(self.pozyx.clearDevices())
+                for device in additions:
+                    statuses.append(self.pozyx.addDevice(device))
+                if set_selection:
+                    statuses.append(self.pozyx.setSelectionOfAnchors(*selection))
+        except StructError as s:
+            print(str(s))
+            crashed = True
+
+        if not crashed and all(status == POZYX_SUCCESS for status in statuses):
+            self.devices = wanted
+            self.selection = selection if set_selection else self.selection
+        else:
+            self.devices, self.selection = None, None  # The next sync starts from scratch
+
+        transactions = len(statuses)
+        saved = 1 + len(devices) + (selection is not None) - transactions
+        self.syncs += 1
+        self.transactions += transactions
+        self.saved_transactions += saved
+        return transactions, saved
+
+    def statistics(self) -> dict:
+        return {'syncs': self.syncs, 'transactions': self.transactions, 'saved_transactions': self.saved_transactions}
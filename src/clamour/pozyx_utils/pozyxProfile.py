@@ -0,0 +1,212 @@
+"""Latency histograms of the Pozyx calls and of the shared Pozyx lock, kept in shared memory.
+
+Each process writes its own region of a PozyxProfile: one row per Pozyx method, plus LOCK_WAIT and
+LOCK_HOLD for the time spent waiting for the lock and holding it. A row is a histogram with
+BUCKETS_PER_OCTAVE logarithmic buckets per doubling of the duration, its sum and its maximum.
+The block is named PROFILE_NAME, so pozyx_profile.py can read it from another terminal while
+CLAMOUR runs."""
+
+import threading
+from math import log2
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+from pypozyx import PozyxSerial
+
+PROFILE_NAME = 'clamour_pozyx_profile'
+MAX_PROCESSES = 8
+MAX_ROWS = 64  # Rows per process
+NAME_SIZE = 32  # Bytes, longer names are truncated
+NB_BUCKETS = 96
+BUCKETS_PER_OCTAVE = 4  # Each bucket is 19 % wider than the previous one
+SMALLEST_BUCKET = 1e-6  # s, upper bound of the first bucket: the buckets go up to 16 s
+LOCK_WAIT = 'lock wait'
+LOCK_HOLD = 'lock hold'
+TOTAL, MAXIMUM = range(2)
+
+
+class PozyxProfile:
+    """Histograms in a named shared memory block, created by CLAMOUR and attached to by readers.
+
+    The regions are given to the processes with region() before they start. A region is written by
+    a single process, under a threading lock for its threads, so the writers never wait for each other.
+    A row is filled before the number of rows is increased, a reader never sees a partial row."""
+
+    def __init__(self, name: str = PROFILE_NAME, create: bool = True):
+        sizes = [(1 + MAX_PROCESSES) * 4, MAX_PROCESSES * NAME_SIZE, MAX_PROCESSES * MAX_ROWS * NAME_SIZE,
+                 MAX_PROCESSES * MAX_ROWS * NB_BUCKETS * 8, MAX_PROCESSES * MAX_ROWS * 2 * 8]
+        if create:
+            try:
+                SharedMemory(name=name).unlink()  # Left over by a CLAMOUR that did not stop cleanly
+            except FileNotFoundError:
+                pass
+            self.memory = SharedMemory(name=name, create=True, size=sum(sizes))
+        else:
+            self.memory = SharedMemory(name=name)
+            # Otherwise the resource tracker of the reader unlinks the block when the reader exits
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+
+        offsets = [sum(sizes[:i]) for i in range(len(sizes) + 1)]
+        buffer = self.memory.buf
+        self.counts = buffer[offsets[0]:offsets[1]].cast('I')  # Processes, then the rows of each process
+        self.process_names = buffer[offsets[1]:offsets[2]]
+        self.row_names = buffer[offsets[2]:offsets[3]]
+        self.buckets = buffer[offsets[3]:offsets[4]].cast('Q')
+        self.totals = buffer[offsets[4]:offsets[5]].cast('d')
+        if create:
+            buffer[:offsets[5]] = bytes(offsets[5])
+
+        self.lock = threading.Lock()
+        self.rows = {}  # (region, name) -> row, only valid in the process writing the region
+
+    def region(self, process_name: str) -> int:
+        """Returns the region of the process, to call before the processes start."""
+
+        for region, name in enumerate(self.names(self.process_names, 0, self.counts[0])):
+            if name == process_name:
+                return region
+
+        region = self.counts[0]
+        if region >= MAX_PROCESSES:
+            raise RuntimeError(f"More than {MAX_PROCESSES} processes in a PozyxProfile")
+        self.write_name(self.process_names, region, process_name)
+        self.counts[0] = region + 1
+        return region
+
+    def record(self, region: int, name: str, duration: float) -> None:
+        bucket = int(BUCKETS_PER_OCTAVE * log2(duration / SMALLEST_BUCKET)) if duration > SMALLEST_BUCKET else 0
+
+        with self.lock:
+            row = self.rows.get((region, name))
+            if row is None:
+                row = self.add_row(region, name)
+                if row is None:
+                    return
+
+            self.buckets[row * NB_BUCKETS + min(bucket, NB_BUCKETS - 1)] += 1
+            self.totals[2 * row + TOTAL] += duration
+            if duration > self.totals[2 * row + MAXIMUM]:
+                self.totals[2 * row + MAXIMUM] = duration
+
+    def add_row(self, region: int, name: str):
+        nb_rows = self.counts[1 + region]
+        if nb_rows >= MAX_ROWS:
+            return None
+
+        row = region * MAX_ROWS + nb_rows
+        self.write_name(self.row_names, row, name)
+        self.counts[1 + region] = nb_rows + 1
+        self.rows[(region, name)] = row
+        return row
+
+    def snapshot(self) -> dict:
+        """{process: {row: statistics}} with the call count, the mean, the maximum and percentiles (s).
+        A percentile is the upper bound of its bucket, so it overestimates by 19 % at most."""
+
+        profile = {}
+        for region, process_name in enumerate(self.names(self.process_names, 0, self.counts[0])):
+            rows = profile.setdefault(process_name, {})
+            first_row = region * MAX_ROWS
+            for row, name in enumerate(self.names(self.row_names, first_row, self.counts[1 + region]), first_row):
+                buckets = list(self.buckets[row * NB_BUCKETS:(row + 1) * NB_BUCKETS])
+                count, maximum = sum(buckets), self.totals[2 * row + MAXIMUM]
+                if count:
+                    rows[name] = {
+                        'count': count,
+                        'mean': self.totals[2 * row + TOTAL] / count,
+                        'p50': min(self.percentile(buckets, count, 0.5), maximum),
+                        'p90': min(self.percentile(buckets, count, 0.9), maximum),
+                        'p99': min(self.percentile(buckets, count, 0.99), maximum),
+                        'max': maximum,
+                    }
+
+        return profile
+
+    @staticmethod
+    def percentile(buckets: list, count: int, fraction: float) -> float:
+        rank, seen = fraction * count, 0
+        for bucket, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return SMALLEST_BUCKET * 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE)
+
+        return SMALLEST_BUCKET * 2 ** (NB_BUCKETS / BUCKETS_PER_OCTAVE)
+
+    @staticmethod
+    def write_name(names, index: int, name: str) -> None:
+        encoded = name.encode()[:NAME_SIZE]
+        names[index * NAME_SIZE:(index + 1) * NAME_SIZE] = encoded + bytes(NAME_SIZE - len(encoded))
+
+    @staticmethod
+    def names(names, first: int, count: int) -> list:
+        return [bytes(names[index * NAME_SIZE:(index + 1) * NAME_SIZE]).rstrip(b'\0').decode(errors='replace')
+                for index in range(first, first + count)]
+
+    def close(self) -> None:
+        """The views must be released before the shared memory can be closed."""
+
+        if self.buckets is not None:
+            for view in (self.counts, self.process_names, self.row_names, self.buckets, self.totals):
+                view.release()
+            self.buckets = None
+            self.memory.close()
+
+    def unlink(self) -> None:
+        self.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unlink()
+
+
+class InstrumentedPozyx:
+    """Wraps the Pozyx of a process and records the duration of every call in its region of the profile."""
+
+    def __init__(self, pozyx: PozyxSerial, profile: PozyxProfile, process_name: str):
+        self.pozyx = pozyx
+        self.profile = profile
+        self.region = profile.region(process_name)
+
+    def __getattr__(self, name: str):
+        if name in ('pozyx', 'profile', 'region'):
+            raise AttributeError(name)  # Not initialized yet, avoids an infinite recursion when copied
+
+        attribute = getattr(self.pozyx, name)
+        if not callable(attribute):
+            return attribute
+
+        def measure(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self.profile.record(self.region, name, perf_counter() - start)
+
+        return measure
+
+
+class InstrumentedLock:
+    """Wraps the Pozyx lock of a process and records how long the process waits for it and holds it."""
+
+    def __init__(self, lock, profile: PozyxProfile, process_name: str):
+        self.lock = lock
+        self.profile = profile
+        self.region = profile.region(process_name)
+        self.acquired = threading.local()
+
+    def __enter__(self):
+        start = perf_counter()
+        result = self.lock.__enter__()
+        self.acquired.time = perf_counter()
+        self.profile.record(self.region, LOCK_WAIT, self.acquired.time - start)
+        return result
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        held = perf_counter() - self.acquired.time
+        result = self.lock.__exit__(exc_type, exc_val, exc_tb)
+        self.profile.record(self.region, LOCK_HOLD, held)
+        return result
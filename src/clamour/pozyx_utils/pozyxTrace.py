@@ -0,0 +1,160 @@
+"""Compact binary trace of the calls made to a Pozyx device.
+
+A trace starts with TRACE_MAGIC, followed by one record per call:
+    timestamp (double) | method id (uint16) | number of items (uint8) | items...
+The first item is the return value of the call, the following ones are its arguments,
+captured after the call so that the register buffers filled by the device are recorded.
+Each item starts with a one byte tag describing how it is encoded."""
+
+import os
+import struct
+
+from pypozyx.structures.byte_structure import ByteStructure
+
+TRACE_MAGIC = b'CLAMOUR-TRACE-1\n'
+RECORD_HEADER = struct.Struct('<dHB')
+INLINE_METHOD_NAME = 0xFFFF
+
+# Known methods get a two bytes id, the others are stored by name.
+METHODS = ['sendData', 'getRxInfo', 'readRXBufferData', 'doRanging', 'doPositioning', 'doDiscovery',
+           'getEulerAngles_deg', 'getAcceleration_mg', 'getGravityVector_mg', 'setCoordinates', 'getCoordinates',
+           'getDeviceListSize', 'getDeviceIds', 'clearDevices', 'addDevice', 'removeDevice', 'setSelectionOfAnchors',
+           'getRead', 'getErrorCode', 'getErrorMessage', 'resetSystem', 'getAllSensorData', 'getInterruptStatus']
+METHOD_IDS = {name: index for index, name in enumerate(METHODS)}
+
+NONE_TAG, INT_TAG, FLOAT_TAG, STRING_TAG, STRUCTURE_TAG, LIST_TAG = b'N', b'i', b'f', b's', b'b', b'l'
+INTEGER_FORMATS = 'bBhHiIlLqQ'
+
+
+class TraceRecord:
+    def __init__(self, timestamp: float, method: str, result, arguments: list):
+        self.timestamp = timestamp
+        self.method = method
+        self.result = result
+        self.arguments = arguments
+
+    def __repr__(self):
+        return "{:.6f} {}{} -> {}".format(self.timestamp, self.method, tuple(self.arguments), self.result)
+
+
+class RecordedStructure:
+    """Content of a ByteStructure argument: its format and its values after the call."""
+
+    def __init__(self, data_format: str, values: list):
+        self.data_format = data_format
+        self.values = values
+
+    def __repr__(self):
+        return "{}{}".format(self.data_format, self.values)
+
+
+def pack_values(data_format: str, values: list) -> bytes:
+    try:
+        return struct.pack('<' + data_format, *values)
+    except struct.error:
+        # Containers are often filled with floats (ex: Coordinates computed by the EKF)
+        return struct.pack('<' + data_format, *[int(value) if fmt in INTEGER_FORMATS else float(value)
+                                                for fmt, value in zip(data_format, values)])
+
+
+def encode_item(item) -> bytes:
+    if item is None:
+        return NONE_TAG
+    if isinstance(item, int):
+        return INT_TAG + struct.pack('<q', item)
+    if isinstance(item, float):
+        return FLOAT_TAG + struct.pack('<d', item)
+    if isinstance(item, str):
+        encoded = item.encode()
+        return STRING_TAG + struct.pack('<H', len(encoded)) + encoded
+    if isinstance(item, ByteStructure):
+        data_format = item.data_format[:len(item.data)]
+        payload = pack_values(data_format, item.data)
+        return STRUCTURE_TAG + struct.pack('<B', len(data_format)) + data_format.encode() \
+            + struct.pack('<H', len(payload)) + payload
+    if isinstance(item, (list, tuple)):
+        return LIST_TAG + struct.pack('<H', len(item)) + struct.pack('<{}d'.format(len(item)), *item)
+
+    return encode_item(str(item))
+
+
+def encode_record(timestamp: float, method: str, result, arguments: tuple) -> bytes:
+    method_id = METHOD_IDS.get(method, INLINE_METHOD_NAME)
+    items = [result] + list(arguments)
+    record = RECORD_HEADER.pack(timestamp, method_id, len(items))
+    if method_id == INLINE_METHOD_NAME:
+        record += encode_item(method)
+
+    return record + b''.join(encode_item(item) for item in items)
+
+
+def decode_item(buffer: bytes, offset: int) -> tuple:
+    tag, offset = buffer[offset:offset + 1], offset + 1
+
+    if tag == NONE_TAG:
+        return None, offset
+    if tag == INT_TAG:
+        return struct.unpack_from('<q', buffer, offset)[0], offset + 8
+    if tag == FLOAT_TAG:
+        return struct.unpack_from('<d', buffer, offset)[0], offset + 8
+    if tag == STRING_TAG:
+        length = struct.unpack_from('<H', buffer, offset)[0]
+        return buffer[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+    if tag == STRUCTURE_TAG:
+        format_length = buffer[offset]
+        data_format = buffer[offset + 1:offset + 1 + format_length].decode()
+        offset += 1 + format_length
+        length = struct.unpack_from('<H', buffer, offset)[0]
+        values = list(struct.unpack_from('<' + data_format, buffer, offset + 2))
+        return RecordedStructure(data_format, values), offset + 2 + length
+    if tag == LIST_TAG:
+        length = struct.unpack_from('<H', buffer, offset)[0]
+        return list(struct.unpack_from('<{}d'.format(length), buffer, offset + 2)), offset + 2 + 8 * length
+
+    raise ValueError("Corrupted trace: unknown item tag {} at offset {}".format(tag, offset - 1))
+
+
+def read_trace(path: str) -> list:
+    with open(path, 'rb') as trace:
+        buffer = trace.read()
+
+    if not buffer.startswith(TRACE_MAGIC):
+        raise ValueError(path + " is not a CLAMOUR Pozyx trace")
+
+    records, offset = [], len(TRACE_MAGIC)
+    while offset < len(buffer):
+        timestamp, method_id, nb_items = RECORD_HEADER.unpack_from(buffer, offset)
+        offset += RECORD_HEADER.size
+        if method_id == INLINE_METHOD_NAME:
+            method, offset = decode_item(buffer, offset)
+        else:
+            method = METHODS[method_id]
+
+        items = []
+        for _ in range(nb_items):
+            item, offset = decode_item(buffer, offset)
+            items.append(item)
+        records.append(TraceRecord(timestamp, method, items[0], items[1:]))
+
+    return records
+
+
+class TraceWriter:
+    """Appends records to a trace file. Safe to share between forked processes:
+    every process opens its own descriptor and each record is written with a single append."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = None
+        self.descriptor = None
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as trace:
+                trace.write(TRACE_MAGIC)
+
+    def write(self, timestamp: float, method: str, result, arguments: tuple) -> None:
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+
+        os.write(self.descriptor, encode_record(timestamp, method, result, arguments))
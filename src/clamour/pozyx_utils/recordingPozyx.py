@@ -0,0 +1,29 @@
+from pypozyx import PozyxSerial
+
+from clockSource import time
+
+from .pozyxTrace import TraceWriter
+
+
+class RecordingPozyx:
+    """Wraps a PozyxSerial and logs every call, with its arguments, result and filled buffers, to a trace.
+    The trace can be fed back to CLAMOUR with simulation.ReplayPozyx."""
+
+    def __init__(self, pozyx: PozyxSerial, trace_path: str):
+        self.pozyx = pozyx
+        self.trace = TraceWriter(trace_path)
+
+    def __getattr__(self, name: str):
+        if name in ('pozyx', 'trace'):
+            raise AttributeError(name)  # Not initialized yet, avoids an infinite recursion when copied
+
+        attribute = getattr(self.pozyx, name)
+        if not callable(attribute):
+            return attribute
+
+        def record(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            self.trace.write(time(), name, result, args + tuple(kwargs.values()))
+            return result
+
+        return record
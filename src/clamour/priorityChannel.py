@@ -0,0 +1,165 @@
+"""Communication channel to the EKF split into one lane per UpdateType, so that positioning updates
+are never queued behind bookkeeping traffic such as topology updates.
+
+Each lane has its own capacity and overflow policy: a full topology lane drops its oldest topology
+updates instead of blocking the TDMA process, the EKF gets the latest topology. The consumer picks the next lane with a ServicePolicy."""
+
+from collections import namedtuple
+from enum import Enum
+from multiprocessing import Lock, RawArray, RawValue, Semaphore, SimpleQueue
+from queue import Empty, Full
+from time import monotonic
+
+from messages import UpdateType, update_type_of
+from sharedMemoryQueue import OverflowPolicy, SharedMemoryQueue
+
+LaneConfiguration = namedtuple('LaneConfiguration', ['priority', 'capacity', 'weight', 'overflow_policy'])
+
+# Priority 0 is served first. Weights are used by ServicePolicy.WEIGHTED.
+LANES = {
+    UpdateType.TRILATERATION: LaneConfiguration(0, 8, 8, OverflowPolicy.BLOCK),
+    UpdateType.RANGING: LaneConfiguration(0, 8, 8, OverflowPolicy.BLOCK),
+    UpdateType.CUSTOM_POSE: LaneConfiguration(0, 8, 8, OverflowPolicy.BLOCK),
+    UpdateType.PEDOMETER: LaneConfiguration(1, 16, 4, OverflowPolicy.BLOCK),
+    UpdateType.ZERO_MOVEMENT: LaneConfiguration(1, 4, 4, OverflowPolicy.DROP_NEWEST),
+    UpdateType.TOPOLOGY: LaneConfiguration(2, 4, 1, OverflowPolicy.DROP_OLDEST),
+}
+
+
+class ServicePolicy(Enum):
+    STRICT = 'strict'  # Always the non empty lane of highest priority, ties are served in turn
+    WEIGHTED = 'weighted'  # Smooth weighted round robin among the non empty lanes, no lane starves
+
+
+class PipeLane:
+    """Bounded lane over a multiprocessing.SimpleQueue. Unlike multiprocessing.Queue, its put writes
+    to the pipe before returning, so the consumer can check which lanes hold a message.
+    To drop the oldest message, the producer reads it from the pipe under the lock of the consumer."""
+
+    def __init__(self, capacity: int, overflow_policy: OverflowPolicy):
+        self.queue = SimpleQueue()
+        self.free_slots = Semaphore(capacity)
+        self.overflow_policy = overflow_policy
+        self.read_lock = Lock()
+        self.dropped_oldest = RawValue('I', 0)
+
+    def put(self, data: bytes, block: bool = True, timeout: float = None) -> bool:
+        if not self.free_slots.acquire(block and self.overflow_policy == OverflowPolicy.BLOCK, timeout):
+            if self.overflow_policy == OverflowPolicy.BLOCK:
+                raise Full
+            if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                return False
+            self.drop_oldest()
+
+        self.queue.put(data)
+        return True
+
+    def drop_oldest(self) -> None:
+        """The new message takes the slot of the oldest one."""
+
+        with self.read_lock:
+            if self.queue.empty():
+                self.free_slots.acquire()  # The consumer took the message and is releasing its slot
+            else:
+                self.queue.get()
+                self.dropped_oldest.value += 1
+
+    def get_nowait(self) -> bytes:
+        with self.read_lock:
+            data = self.queue.get()
+        self.free_slots.release()
+        return data
+
+    def empty(self) -> bool:
+        return self.queue.empty()
+
+    def statistics(self) -> dict:
+        return {'dropped_oldest': self.dropped_oldest.value}
+
+
+class PriorityChannel:
+    """Queue-like channel (put, get, get_nowait, empty) routing packed messages to one lane per UpdateType.
+    A semaphore counts the messages written to all the lanes, so the consumer blocks on a single object.
+    Counters of served and dropped messages per lane are in shared memory."""
+
+    def __init__(self, lanes: dict = None, service_policy: ServicePolicy = ServicePolicy.STRICT,
+                 shared_memory: bool = False):
+        self.configurations = lanes if lanes is not None else LANES
+        self.service_policy = service_policy
+        self.lanes = {update_type: SharedMemoryQueue(capacity=lane.capacity, overflow_policy=lane.overflow_policy)
+                      if shared_memory else PipeLane(lane.capacity, lane.overflow_policy)
+                      for update_type, lane in self.configurations.items()}
+        self.service_order = sorted(self.lanes, key=lambda update_type: self.configurations[update_type].priority)
+        self.ready = Semaphore(0)
+
+        self.served = RawArray('I', len(UpdateType))
+        self.dropped = RawArray('I', len(UpdateType))
+        self.credits = {update_type: 0 for update_type in self.lanes}
+
+    def put(self, data: bytes, block: bool = True, timeout: float = None) -> None:
+        update_type = update_type_of(data)
+        if update_type not in self.lanes:
+            raise ValueError(f"No lane for the messages of type {update_type}")
+
+        if self.lanes[update_type].put(data, block, timeout):
+            self.ready.release()
+        else:
+            self.dropped[update_type] += 1
+
+    def put_nowait(self, data: bytes) -> None:
+        self.put(data, False)
+
+    def get(self, block: bool = True, timeout: float = None) -> bytes:
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - monotonic(), 0)
+            if not self.ready.acquire(block, remaining):
+                raise Empty
+
+            # A lane dropping its oldest messages may hold fewer messages than were announced
+            update_type = self.next_lane()
+            if update_type is not None:
+                self.served[update_type] += 1
+                return self.lanes[update_type].get_nowait()
+
+    def get_nowait(self) -> bytes:
+        return self.get(False)
+
+    def next_lane(self):
+        non_empty = [update_type for update_type in self.service_order if not self.lanes[update_type].empty()]
+        if not non_empty:
+            return None
+
+        if self.service_policy == ServicePolicy.STRICT:
+            highest = self.configurations[non_empty[0]].priority
+            candidates = [update_type for update_type in non_empty
+                          if self.configurations[update_type].priority == highest]
+            for update_type in candidates:
+                self.credits[update_type] += 1
+            selected = max(candidates, key=lambda update_type: self.credits[update_type])
+            self.credits[selected] -= len(candidates)
+            return selected
+
+        for update_type in non_empty:
+            self.credits[update_type] += self.configurations[update_type].weight
+        selected = max(non_empty, key=lambda update_type: self.credits[update_type])
+        self.credits[selected] -= sum(self.configurations[update_type].weight for update_type in non_empty)
+        return selected
+
+    def empty(self) -> bool:
+        return all(lane.empty() for lane in self.lanes.values())
+
+    def statistics(self) -> dict:
+        return {update_type.name: {'served': self.served[update_type],
+                                   'dropped': self.dropped[update_type] + lane.statistics()['dropped_oldest']}
+                for update_type, lane in self.lanes.items()}
+
+    def close(self) -> None:
+        for lane in self.lanes.values():
+            if isinstance(lane, SharedMemoryQueue):
+                lane.close()
+
+    def unlink(self) -> None:
+        for lane in self.lanes.values():
+            if isinstance(lane, SharedMemoryQueue):
+                lane.unlink()
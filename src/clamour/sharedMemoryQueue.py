@@ -0,0 +1,296 @@
+"""Shared memory transport for the messages exchanged between the CLAMOUR processes,
+an alternative to multiprocessing.Queue with the same put/get interface.
+
+Each producer thread claims its own single producer, single consumer ring in shared memory,
+so writing a message is a copy into a slot followed by an update of the head index: there is no
+feeder thread, no pipe and no lock on the data path. Only the wake-up of a waiting side goes
+through a semaphore. Messages are bytes, as packed by the save methods of the messages package."""
+
+import os
+import threading
+from enum import Enum
+from multiprocessing import Lock, RawValue, Semaphore
+from multiprocessing.shared_memory import SharedMemory
+from queue import Empty, Full
+from time import monotonic
+
+NB_PRODUCERS = 4  # Producer threads with a ring of their own, the others share one ring
+CAPACITY = 64  # Slots per producer
+SLOT_SIZE = 2048  # Bytes, larger messages are dropped
+MASK = 0xFFFFFFFF  # Positions are uint32, safe to read and write on a 32 bit Raspberry Pi, and wrap around
+WAKE_UP_PERIOD = 0.05  # s, a waiting side checks again at least this often in case a wake-up was missed
+
+# Indexes of the uint32 control words of a ring. The head and the producer counters are only written
+# by the producer, the tail and the consumer counters only by the consumer.
+HEAD, TAIL, OWNER_PID, OWNER_THREAD, PUTS, GETS, DROPPED_NEWEST, DROPPED_OLDEST, OVERSIZED = range(9)
+NB_CONTROLS = 9
+LATENCY_SUM, LATENCY_MAX = range(2)
+
+
+class OverflowPolicy(Enum):
+    BLOCK = 'block'  # The producer waits for a free slot, as multiprocessing.Queue.put
+    DROP_OLDEST = 'drop_oldest'  # The producer overwrites the oldest message, the reader skips it
+    DROP_NEWEST = 'drop_newest'  # The new message is discarded
+
+
+class RingBuffer:
+    """Single producer, single consumer ring of fixed size slots over a block of shared memory.
+
+    A slot holds the length of the message, the time it was written and a stamp: position + 1 once
+    the message is complete, 0 while it is written. The reader copies a slot and checks its stamp
+    again, which detects a slot overwritten under it when the producer drops the oldest messages."""
+
+    def __init__(self, capacity: int = CAPACITY, slot_size: int = SLOT_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK):
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.overflow_policy = overflow_policy
+        self.not_full = Semaphore(0)
+        self.producer_waiting = RawValue('B', 0)  # The consumer only releases not_full when it is needed
+
+        sizes = [NB_CONTROLS * 4, 2 * 8, capacity * 4, capacity * 4, capacity * 8, capacity * slot_size]
+        self.memory = SharedMemory(create=True, size=sum(sizes))
+        offsets = [sum(sizes[:i]) for i in range(len(sizes))]
+
+        # Typed memoryviews: indexing them is several times faster than indexing NumPy arrays
+        buffer = self.memory.buf
+        self.control = buffer[offsets[0]:offsets[1]].cast('I')
+        self.latency = buffer[offsets[1]:offsets[2]].cast('d')
+        self.stamps = buffer[offsets[2]:offsets[3]].cast('I')
+        self.lengths = buffer[offsets[3]:offsets[4]].cast('I')
+        self.times = buffer[offsets[4]:offsets[5]].cast('d')
+        self.slots = buffer[offsets[5]:]
+        buffer[:offsets[5]] = bytes(offsets[5])
+
+    def depth(self) -> int:
+        return min((self.control[HEAD] - self.control[TAIL]) & MASK, self.capacity)
+
+    def full(self) -> bool:
+        return (self.control[HEAD] - self.control[TAIL]) & MASK >= self.capacity
+
+    def push(self, data: bytes, block: bool = True, timeout: float = None) -> bool:
+        """Returns False when the message is dropped. Raises Full when blocking times out."""
+
+        if len(data) > self.slot_size:
+            self.control[OVERSIZED] = (self.control[OVERSIZED] + 1) & MASK
+            print("Message of", len(data), "bytes dropped, slots are", self.slot_size, "bytes.")
+            return False
+
+        if self.full():
+            if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                self.control[DROPPED_NEWEST] = (self.control[DROPPED_NEWEST] + 1) & MASK
+                return False
+            if self.overflow_policy == OverflowPolicy.BLOCK:
+                self.wait_for_slot(block, timeout)
+
+        head = self.control[HEAD]
+        i = head % self.capacity
+        self.stamps[i] = 0
+        self.slots[i * self.slot_size:i * self.slot_size + len(data)] = data
+        self.lengths[i] = len(data)
+        self.times[i] = monotonic()
+        self.stamps[i] = (head + 1) & MASK
+        self.control[HEAD] = (head + 1) & MASK
+        self.control[PUTS] = (self.control[PUTS] + 1) & MASK
+        return True
+
+    def wait_for_slot(self, block: bool, timeout: float) -> None:
+        deadline = None if timeout is None else monotonic() + timeout
+        try:
+            while self.full():
+                remaining = None if deadline is None else deadline - monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise Full
+
+                self.producer_waiting.value = 1
+                if self.full():
+                    self.not_full.acquire(timeout=WAKE_UP_PERIOD if remaining is None else min(remaining, WAKE_UP_PERIOD))
+        finally:
+            self.producer_waiting.value = 0
+
+    def pop(self):
+        """Returns the oldest message, or None when the ring is empty."""
+
+        while True:
+            head, tail = self.control[HEAD], self.control[TAIL]
+            depth = (head - tail) & MASK
+            if depth == 0:
+                return None
+
+            if depth > self.capacity:
+                # The producer dropped the oldest messages: skip to the oldest one still in the ring
+                self.control[DROPPED_OLDEST] = (self.control[DROPPED_OLDEST] + depth - self.capacity) & MASK
+                tail = (head - self.capacity) & MASK
+
+            i = tail % self.capacity
+            data = self.slots[i * self.slot_size:i * self.slot_size + self.lengths[i]].tobytes()
+            sent = self.times[i]
+            if self.stamps[i] != (tail + 1) & MASK:
+                # Overwritten while it was copied
+                self.control[TAIL] = (tail + 1) & MASK
+                self.control[DROPPED_OLDEST] = (self.control[DROPPED_OLDEST] + 1) & MASK
+                continue
+
+            self.control[TAIL] = (tail + 1) & MASK
+            self.control[GETS] = (self.control[GETS] + 1) & MASK
+            latency = monotonic() - sent
+            self.latency[LATENCY_SUM] += latency
+            self.latency[LATENCY_MAX] = max(self.latency[LATENCY_MAX], latency)
+            if self.producer_waiting.value:
+                self.not_full.release()
+            return data
+
+    def close(self) -> None:
+        """The views must be released before the shared memory can be closed."""
+
+        if self.slots is not None:
+            for view in (self.control, self.latency, self.stamps, self.lengths, self.times, self.slots):
+                view.release()
+            self.slots = None
+            self.memory.close()
+
+    def unlink(self) -> None:
+        self.close()
+        self.memory.unlink()
+
+    def __del__(self):
+        self.close()
+
+
+class SharedMemoryQueue:
+    """Multi-producer queue made of one RingBuffer per producer thread, read by a single consumer.
+
+    A producer claims a free ring on its first put, under a lock, by writing its pid and thread id in it.
+    Rings of producers that died are claimed again: those of dead processes, and those of the exited
+    threads of the claiming process, such as the short lived workers of a thread pool. Producers beyond
+    nb_producers share one more ring, written under a lock of its own. Messages of a producer are read in order,
+    the rings are served in turn."""
+
+    def __init__(self, nb_producers: int = NB_PRODUCERS, capacity: int = CAPACITY, slot_size: int = SLOT_SIZE,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK):
+        self.not_empty = Semaphore(0)
+        self.consumer_waiting = RawValue('B', 0)  # Producers only release not_empty when it is needed
+        self.rings = [RingBuffer(capacity, slot_size, overflow_policy) for _ in range(nb_producers + 1)]
+        self.shared_ring = self.rings[-1]  # Written under shared_ring_lock by the producers that found no free ring
+        self.shared_ring_lock = Lock()  # Apart from claim_lock: a producer blocked on the full shared ring holds it
+        self.claim_lock = Lock()
+        self.claimed_rings = {}  # (pid, thread id) -> ring, only valid in the process that claimed it
+        self.next_ring = 0
+
+    def producer_ring(self) -> RingBuffer:
+        producer = (os.getpid(), threading.get_ident() & MASK)
+        ring = self.claimed_rings.get(producer)
+        if ring is self.shared_ring or \
+                (ring is not None and (ring.control[OWNER_PID], ring.control[OWNER_THREAD]) == producer):
+            return ring
+
+        with self.claim_lock:
+            for ring in self.rings[:-1]:
+                if (ring.control[OWNER_PID], ring.control[OWNER_THREAD]) == producer:
+                    break
+            else:
+                free_rings = [ring for ring in self.rings[:-1] if not self.owner_alive(ring)]
+                if not free_rings:
+                    self.claimed_rings[producer] = self.shared_ring
+                    return self.shared_ring
+                ring = free_rings[0]
+                ring.control[OWNER_PID], ring.control[OWNER_THREAD] = producer
+
+        self.claimed_rings = {owner: claimed for owner, claimed in self.claimed_rings.items() if claimed is not ring}
+        self.claimed_rings[producer] = ring
+        return ring
+
+    @staticmethod
+    def owner_alive(ring: RingBuffer) -> bool:
+        pid = ring.control[OWNER_PID]
+        if pid == 0:
+            return False
+        if pid == os.getpid():
+            return ring.control[OWNER_THREAD] in {thread.ident & MASK for thread in threading.enumerate()}
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def put(self, data: bytes, block: bool = True, timeout: float = None) -> bool:
+        """Returns False when the message is dropped."""
+
+        ring = self.producer_ring()
+        if ring is self.shared_ring:
+            with self.shared_ring_lock:
+                written = ring.push(data, block, timeout)
+        else:
+            written = ring.push(data, block, timeout)
+        if written and self.consumer_waiting.value:
+            self.not_empty.release()
+        return written
+
+    def put_nowait(self, data: bytes) -> bool:
+        return self.put(data, False)
+
+    def pop(self):
+        for _ in range(len(self.rings)):
+            ring = self.rings[self.next_ring]
+            self.next_ring = (self.next_ring + 1) % len(self.rings)
+            data = ring.pop()
+            if data is not None:
+                return data
+
+        return None
+
+    def get(self, block: bool = True, timeout: float = None) -> bytes:
+        deadline = None if timeout is None else monotonic() + timeout
+        try:
+            while True:
+                data = self.pop()
+                if data is not None:
+                    return data
+
+                remaining = None if deadline is None else deadline - monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise Empty
+
+                self.consumer_waiting.value = 1
+                data = self.pop()  # A message may have been written before the flag was set
+                if data is not None:
+                    return data
+                self.not_empty.acquire(timeout=WAKE_UP_PERIOD if remaining is None else min(remaining, WAKE_UP_PERIOD))
+        finally:
+            self.consumer_waiting.value = 0
+
+    def get_nowait(self) -> bytes:
+        return self.get(False)
+
+    def qsize(self) -> int:
+        return sum(ring.depth() for ring in self.rings)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def statistics(self) -> dict:
+        """Counters summed over the rings. They live in shared memory and can be read from any process."""
+
+        counters = [sum(ring.control[i] for ring in self.rings) for i in range(NB_CONTROLS)]
+        gets = counters[GETS]
+
+        return {
+            'depth': self.qsize(),
+            'puts': counters[PUTS],
+            'gets': gets,
+            'dropped_newest': counters[DROPPED_NEWEST],
+            'dropped_oldest': counters[DROPPED_OLDEST],
+            'oversized': counters[OVERSIZED],
+            'mean_latency': sum(ring.latency[LATENCY_SUM] for ring in self.rings) / gets if gets else 0.0,
+            'max_latency': max(ring.latency[LATENCY_MAX] for ring in self.rings),
+        }
+
+    def close(self) -> None:
+        for ring in self.rings:
+            ring.close()
+
+    def unlink(self) -> None:
+        for ring in self.rings:
+            ring.unlink()
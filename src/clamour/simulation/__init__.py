@@ -0,0 +1,8 @@
+from .radioMedium import RadioMedium
+from .simulatedPozyx import SimulatedPozyx
+from .virtualClock import VirtualClock
+from .eventScheduler import EventScheduler, TDMASimulator
+from .timingParameters import apply_timing_parameters
+from .deployment import add_anchors, create_tdma_nodes, slot_conflicts
+from .replayPozyx import ReplayPozyx
+from .serialLinePozyx import SerialLinePozyx
@@ -0,0 +1,49 @@
+import random
+import threading
+from queue import Queue
+
+from pypozyx import Coordinates
+
+from interfaces import Anchors
+from states import State
+from tdmaNode import TDMANode
+
+from .radioMedium import RadioMedium
+from .simulatedPozyx import SimulatedPozyx
+
+TAG_BASE_ID = 0x2000
+TAG_HEIGHT = 1200  # mm
+
+
+def add_anchors(medium: RadioMedium) -> None:
+    """Places the anchors of interfaces/anchors.csv on the medium."""
+
+    for anchor in Anchors().anchors_list:
+        medium.add_anchor(anchor.network_id, anchor.pos)
+
+
+def create_tdma_nodes(medium: RadioMedium, nb_nodes: int, area: int, rng: random.Random = random) -> list:
+    """Creates nb_nodes tags at random positions in a square area (mm).
+    Returns (SimulatedPozyx, TDMANode) pairs; the EKF updates of each node pile up in its own queue."""
+
+    nodes = []
+    for index in range(nb_nodes):
+        position = Coordinates(rng.uniform(0, area), rng.uniform(0, area), TAG_HEIGHT)
+        pozyx = SimulatedPozyx(TAG_BASE_ID + index + 1, medium, position)
+        nodes.append((pozyx, TDMANode(Queue(), pozyx, threading.Lock(), pozyx.network_id)))
+
+    return nodes
+
+
+def slot_conflicts(medium: RadioMedium, nodes: list) -> int:
+    """Counts the task slots claimed at the same time by two nodes within range of each other."""
+
+    owned = [(pozyx.network_id, set(node.states[State.TASK].slot_assignment.pure_send_list) - {-1})
+             for pozyx, node in nodes]
+    conflicts = 0
+    for i, (first_id, first_slots) in enumerate(owned):
+        for second_id, second_slots in owned[i + 1:]:
+            if medium.in_range(first_id, second_id):
+                conflicts += len(first_slots & second_slots)
+
+    return conflicts
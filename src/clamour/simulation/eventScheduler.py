@@ -0,0 +1,50 @@
+import heapq
+from itertools import count
+
+from tdmaNode import TDMANode, TICK_FREQUENCY
+
+from .virtualClock import VirtualClock
+
+
+class EventScheduler:
+    """Discrete-event loop: callbacks are executed in timestamp order, in virtual time."""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.events = []
+        self.sequence = count()  # Breaks ties so that callbacks are never compared
+        self.nb_processed_events = 0
+
+    def schedule(self, timestamp: float, callback) -> None:
+        heapq.heappush(self.events, (timestamp, next(self.sequence), callback))
+
+    def run_until(self, end_time: float) -> None:
+        while self.events and self.events[0][0] <= end_time:
+            timestamp, _, callback = heapq.heappop(self.events)
+            self.clock.advance_to(timestamp)
+            callback()
+            self.nb_processed_events += 1
+
+        self.clock.advance_to(end_time)
+
+
+class TDMASimulator(EventScheduler):
+    """Drives the state machine of many TDMANodes at their normal tick rate, but in virtual time.
+
+    A node that ticks at t is rescheduled at its next wake-up, TDMANode.next_wakeup, or later if its state slept."""
+
+    def __init__(self, clock: VirtualClock, tick_period: float = 1.0 / TICK_FREQUENCY):
+        super(TDMASimulator, self).__init__(clock)
+        self.tick_period = tick_period
+        self.nodes = []
+        self.state_ticks = {}
+
+    def add_node(self, node: TDMANode, start_delay: float = 0.0) -> None:
+        self.nodes.append(node)
+        self.schedule(self.clock.now + start_delay, lambda: self.tick(node))
+
+    def tick(self, node: TDMANode) -> None:
+        start_time = self.clock.now
+        node.step()
+        self.state_ticks[node.current_state_id] = self.state_ticks.get(node.current_state_id, 0) + 1
+        self.schedule(max(self.clock.now, node.next_wakeup(start_time, self.tick_period)), lambda: self.tick(node))
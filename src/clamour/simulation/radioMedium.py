@@ -0,0 +1,168 @@
+"""A shared virtual UWB channel for simulated Pozyx devices.
+
+Every SimulatedPozyx registered on the same RadioMedium can hear the others when they are
+within communication range. Frames take `latency` seconds to arrive and occupy the channel
+for `airtime` seconds; two frames overlapping at the same receiver are both lost (collision)."""
+
+import random
+from collections import deque
+from math import sqrt
+from threading import RLock
+
+from pypozyx import Coordinates
+
+from clockSource import perf_counter
+
+BROADCAST_ID = 0
+
+
+class RadioFrame:
+    def __init__(self, sender_id: int, payload: bytes, start_time: float, arrival_time: float, end_time: float):
+        self.sender_id = sender_id
+        self.payload = payload
+        self.start_time = start_time
+        self.arrival_time = arrival_time
+        self.end_time = end_time
+        self.corrupted = False
+
+
+class RadioStatistics:
+    def __init__(self):
+        self.transmissions = 0
+        self.deliveries = 0
+        self.losses = 0
+        self.collisions = 0
+        self.out_of_range = 0
+        self.rangings = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class RadioMedium:
+    def __init__(self, communication_range: float = 30000, latency: float = 0.0005, airtime: float = 0.00018,
+                 loss_rate: float = 0.0, range_noise: float = 50, clock=perf_counter, seed: int = None):
+        """communication_range and range_noise are in millimeters, latency and airtime in seconds.
+        clock must return seconds, it is called for every transmission and delivery.
+        By default it follows the installed clock source, so the medium also works in virtual time."""
+
+        self.communication_range = communication_range
+        self.latency = latency
+        self.airtime = airtime
+        self.loss_rate = loss_rate
+        self.range_noise = range_noise
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.devices = {}
+        self.anchors = {}
+        self.incoming = {}
+        self.last_reception = {}
+        self.statistics = RadioStatistics()
+        self.lock = RLock()  # Devices may live in different threads of the same process
+
+    def register(self, device) -> None:
+        with self.lock:
+            self.devices[device.network_id] = device
+            self.incoming[device.network_id] = deque()
+            self.last_reception[device.network_id] = None
+
+    def add_anchor(self, network_id: int, position: Coordinates) -> None:
+        """Anchors are static and never transmit data, they only answer to ranging and discovery."""
+
+        with self.lock:
+            self.anchors[network_id] = Coordinates(position.x, position.y, position.z)
+
+    def position_of(self, network_id: int):
+        if network_id in self.anchors:
+            return self.anchors[network_id]
+        if network_id in self.devices:
+            return self.devices[network_id].position
+
+        return None
+
+    def distance(self, first_id: int, second_id: int) -> float:
+        first, second = self.position_of(first_id), self.position_of(second_id)
+        if first is None or second is None:
+            return float('inf')
+
+        return sqrt((first.x - second.x) ** 2 + (first.y - second.y) ** 2 + (first.z - second.z) ** 2)
+
+    def in_range(self, first_id: int, second_id: int) -> bool:
+        return self.distance(first_id, second_id) <= self.communication_range
+
+    def neighbors_of(self, network_id: int) -> list:
+        with self.lock:
+            candidates = list(self.devices.keys()) + list(self.anchors.keys())
+
+        return [candidate for candidate in candidates
+                if candidate != network_id and self.in_range(network_id, candidate)]
+
+    def transmit(self, sender_id: int, destination: int, payload: bytes) -> None:
+        with self.lock:
+            now = self.clock()
+            self.statistics.transmissions += 1
+            receivers = self.devices.keys() if destination == BROADCAST_ID else [destination]
+
+            for receiver_id in receivers:
+                if receiver_id == sender_id or receiver_id not in self.devices:
+                    continue
+                if not self.in_range(sender_id, receiver_id):
+                    self.statistics.out_of_range += 1
+                    continue
+                if self.random.random() < self.loss_rate:
+                    self.statistics.losses += 1
+                    continue
+
+                frame = RadioFrame(sender_id, payload, now, now + self.latency, now + self.latency + self.airtime)
+                self.detect_collision(receiver_id, frame)
+                self.incoming[receiver_id].append(frame)
+
+    def detect_collision(self, receiver_id: int, frame: RadioFrame) -> None:
+        """A frame that overlaps with another one at the receiver corrupts both of them."""
+
+        overlapping = [other for other in self.incoming[receiver_id] if other.end_time > frame.arrival_time]
+        last = self.last_reception[receiver_id]
+        if last is not None and last.end_time > frame.arrival_time:
+            overlapping.append(last)
+
+        if overlapping:
+            self.statistics.collisions += 1
+            frame.corrupted = True
+            for other in overlapping:
+                other.corrupted = True
+
+    def receive(self, receiver_id: int):
+        """Returns the last frame fully received by the device since the previous call, or None."""
+
+        with self.lock:
+            now = self.clock()
+            incoming = self.incoming[receiver_id]
+            received = None
+
+            while incoming and incoming[0].end_time <= now:
+                frame = incoming.popleft()
+                self.last_reception[receiver_id] = frame
+                if frame.corrupted:
+                    self.statistics.losses += 1
+                else:
+                    self.statistics.deliveries += 1
+                    received = frame
+
+            return received
+
+    def measure_range(self, first_id: int, second_id: int):
+        """Returns a noisy distance in millimeters, or None if the ranging failed."""
+
+        with self.lock:
+            self.statistics.rangings += 1
+            distance = self.distance(first_id, second_id)
+
+            if distance > self.communication_range or self.random.random() < self.loss_rate:
+                return None
+
+            return max(0.0, self.random.gauss(distance, self.range_noise))
+
+    def noisy_position(self, network_id: int) -> Coordinates:
+        position = self.position_of(network_id)
+        with self.lock:
+            return Coordinates(*[self.random.gauss(axis, self.range_noise) for axis in (position.x, position.y, position.z)])
@@ -0,0 +1,65 @@
+from collections import deque
+
+from pypozyx.definitions.constants import POZYX_FAILURE
+from pypozyx.structures.byte_structure import ByteStructure
+
+from clockSource import perf_counter, sleep
+from pozyx_utils.pozyxTrace import RecordedStructure, read_trace
+
+
+class ReplayPozyx:
+    """Plays back a trace recorded with pozyx_utils.RecordingPozyx in place of a PozyxSerial.
+
+    Each method consumes the recorded calls of the same name in order, whichever process made them.
+    Once forked, each process holds its own copy and replays every recorded call of the methods it
+    uses: a method called by several processes, such as getEulerAngles_deg by the task and by the
+    pedometer, is replayed in full in each of them instead of being split between them.
+    Buffers passed to a call are filled with the recorded content and the recorded result is returned.
+    With realtime=True, calls are delayed to respect the recorded timing."""
+
+    def __init__(self, trace_path: str, realtime: bool = False):
+        self.realtime = realtime
+        self.calls = {}
+        self.exhausted_calls = 0
+        self.records = read_trace(trace_path)
+        self.first_timestamp = self.records[0].timestamp if self.records else 0.0
+        self.replay_start = None
+
+        for record in self.records:
+            self.calls.setdefault(record.method, deque()).append(record)
+
+    def remaining_calls(self, method: str) -> int:
+        return len(self.calls.get(method, ()))
+
+    def __getattr__(self, name: str):
+        if name in ('calls', 'records'):
+            raise AttributeError(name)
+
+        def replay(*args, **kwargs):
+            return self.replay_call(name, args + tuple(kwargs.values()))
+
+        return replay
+
+    def replay_call(self, method: str, arguments: tuple):
+        recorded_calls = self.calls.get(method)
+        if not recorded_calls:
+            self.exhausted_calls += 1
+            return POZYX_FAILURE
+
+        record = recorded_calls.popleft()
+        if self.realtime:
+            self.wait_for(record.timestamp)
+
+        for argument, recorded in zip(arguments, record.arguments):
+            if isinstance(argument, ByteStructure) and isinstance(recorded, RecordedStructure):
+                argument.load(list(recorded.values))
+
+        return record.result
+
+    def wait_for(self, timestamp: float) -> None:
+        if self.replay_start is None:
+            self.replay_start = perf_counter()
+
+        delay = (timestamp - self.first_timestamp) - (perf_counter() - self.replay_start)
+        if delay > 0:
+            sleep(delay)
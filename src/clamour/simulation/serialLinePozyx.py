@@ -0,0 +1,55 @@
+import random
+from math import ceil
+from multiprocessing import RawValue
+from time import sleep
+
+from pypozyx.definitions.constants import MAX_SERIAL_SIZE, POZYX_SUCCESS
+from pypozyx.lib import PozyxLib
+
+
+class SerialLinePozyx(PozyxLib):
+    """PozyxLib over a register file in memory, to measure the cost of the serial line without a tag.
+
+    Every serial exchange of at most MAX_SERIAL_SIZE bytes takes exchange_time, positioning and discovery
+    take longer. The registers hold random bytes. The count of exchanges is shared with forked processes."""
+
+    def __init__(self, exchange_time: float, positioning_time: float = 0.03, discovery_time: float = 0.2,
+                 seed: int = 0):
+        super().__init__()
+        self.exchange_time = exchange_time
+        self.positioning_time = positioning_time
+        self.discovery_time = discovery_time
+        rng = random.Random(seed)
+        self.registers = bytes(rng.randrange(256) for _ in range(256))
+        self.exchanges = RawValue('I', 0)
+
+    def exchange(self, size: int) -> None:
+        exchanges = max(ceil(size / MAX_SERIAL_SIZE), 1)
+        self.exchanges.value += exchanges
+        sleep(self.exchange_time * exchanges)
+
+    def regRead(self, address, data) -> int:
+        self.exchange(data.byte_size)
+        data.load_packed(self.registers[address:address + data.byte_size])
+        return POZYX_SUCCESS
+
+    def regWrite(self, address, data) -> int:
+        self.exchange(data.byte_size)
+        return POZYX_SUCCESS
+
+    def regFunction(self, address, params, data) -> int:
+        self.exchange(params.byte_size + data.byte_size)
+        return POZYX_SUCCESS
+
+    def waitForFlag(self, interrupt_flag, timeout_s, interrupt=None) -> bool:
+        return True
+
+    def doPositioning(self, position, *args, **kwargs) -> int:
+        self.exchange(position.byte_size)
+        sleep(self.positioning_time)
+        return POZYX_SUCCESS
+
+    def doDiscovery(self, *args, **kwargs) -> int:
+        self.exchange(1)
+        sleep(self.discovery_time)
+        return POZYX_SUCCESS
@@ -0,0 +1,206 @@
+"""Drop-in replacement for PozyxSerial backed by a RadioMedium instead of a USB tag.
+
+Only the calls used by CLAMOUR are implemented. Read calls fill the ByteStructure containers
+exactly like the real library does, so the rest of the code cannot tell the difference."""
+
+from pypozyx import Coordinates, DeviceCoordinates
+from pypozyx.definitions.constants import (POZYX_DISCOVERY_ANCHORS_ONLY, POZYX_DISCOVERY_TAGS_ONLY,
+                                           POZYX_FAILURE, POZYX_SUCCESS)
+from pypozyx.definitions.bitmasks import POZYX_INT_STATUS_RX_DATA
+from pypozyx.definitions.registers import POZYX_NETWORK_ID
+
+from pozyx_utils import PozyxDiscoverer
+
+from .radioMedium import RadioMedium
+
+EULER_ANGLES_SCALING = 16  # The Pozyx reports 1 degree as 16 LSB
+
+
+class SimulatedPozyx:
+    def __init__(self, network_id: int, medium: RadioMedium, position: Coordinates = None, heading: float = 0.0):
+        self.network_id = network_id
+        self.medium = medium
+        self.position = position if position is not None else Coordinates()
+        self.heading = heading
+        self.acceleration = [0, 0, 1000]  # mg
+        self.gravity = [0, 0, 1000]  # mg
+        self.coordinates = Coordinates()
+        self.device_list = {}
+        self.anchor_selection = (0, 0)
+        self.rx_sender_id = 0
+        self.rx_payload = b''
+        self.interrupt_status = 0
+        self.calls = {}
+
+        medium.register(self)
+
+    def count(self, function_name: str) -> None:
+        self.calls[function_name] = self.calls.get(function_name, 0) + 1
+
+    def move_to(self, position: Coordinates, heading: float = None) -> None:
+        self.position = position
+        if heading is not None:
+            self.heading = heading
+
+    # Communication
+
+    def sendData(self, destination, data) -> int:
+        self.count('sendData')
+        self.medium.transmit(self.network_id, destination, bytes(data.transform_to_bytes()))
+        return POZYX_SUCCESS
+
+    def poll_radio(self) -> None:
+        frame = self.medium.receive(self.network_id)
+        if frame is not None:
+            self.rx_sender_id, self.rx_payload = frame.sender_id, frame.payload
+            self.interrupt_status |= POZYX_INT_STATUS_RX_DATA
+
+    def getRxInfo(self, rx_info, remote_id=None) -> int:
+        self.count('getRxInfo')
+        self.poll_radio()
+        rx_info.load([self.rx_sender_id, len(self.rx_payload)])
+        return POZYX_SUCCESS
+
+    def getInterruptStatus(self, interrupts, remote_id=None) -> int:
+        """Like the real register, reading the interrupt status clears it."""
+
+        self.count('getInterruptStatus')
+        self.poll_radio()
+        interrupts.load([self.interrupt_status])
+        self.interrupt_status = 0
+        return POZYX_SUCCESS
+
+    def readRXBufferData(self, data, offset=0) -> int:
+        self.count('readRXBufferData')
+        payload = self.rx_payload[offset:offset + data.byte_size]
+        if len(payload) < data.byte_size:
+            return POZYX_FAILURE
+
+        data.load_packed(payload)
+        return POZYX_SUCCESS
+
+    # Localization
+
+    def doRanging(self, destination_id, device_range, remote_id=None) -> int:
+        self.count('doRanging')
+        distance = self.medium.measure_range(self.network_id, int(destination_id))
+        if distance is None:
+            return POZYX_FAILURE
+
+        device_range.load([int(self.medium.clock() * 1000) & 0xFFFFFFFF, int(distance), -80])
+        return POZYX_SUCCESS
+
+    def doPositioning(self, position, dimension=None, height=None, algorithm=None, remote_id=None, timeout=None) -> int:
+        self.count('doPositioning')
+        reachable_anchors = [device_id for device_id in self.device_list
+                             if PozyxDiscoverer.is_anchor(device_id) and self.medium.in_range(self.network_id, device_id)]
+        if len(reachable_anchors) < 3:
+            return POZYX_FAILURE
+
+        estimate = self.medium.noisy_position(self.network_id)
+        position.load([int(estimate.x), int(estimate.y), int(estimate.z)])
+        self.coordinates = Coordinates(*position.data)
+        return POZYX_SUCCESS
+
+    def getCoordinates(self, coordinates, remote_id=None) -> int:
+        self.count('getCoordinates')
+        coordinates.load(list(self.coordinates.data))
+        return POZYX_SUCCESS
+
+    def setCoordinates(self, coordinates, remote_id=None) -> int:
+        self.count('setCoordinates')
+        self.coordinates = Coordinates(*[int(axis) for axis in coordinates[:3]])
+        return POZYX_SUCCESS
+
+    # Device list
+
+    def doDiscovery(self, discovery_type=POZYX_DISCOVERY_ANCHORS_ONLY, slots=3, slot_duration=0.01, remote_id=None) -> int:
+        self.count('doDiscovery')
+        for device_id in self.medium.neighbors_of(self.network_id):
+            is_anchor = PozyxDiscoverer.is_anchor(device_id)
+            if (discovery_type == POZYX_DISCOVERY_ANCHORS_ONLY and not is_anchor) or \
+                    (discovery_type == POZYX_DISCOVERY_TAGS_ONLY and is_anchor):
+                continue
+            if device_id not in self.device_list:
+                self.device_list[device_id] = DeviceCoordinates(device_id, 1 if is_anchor else 2, Coordinates())
+
+        return POZYX_SUCCESS
+
+    def getDeviceListSize(self, device_list_size, remote_id=None) -> int:
+        self.count('getDeviceListSize')
+        device_list_size.load([len(self.device_list)])
+        return POZYX_SUCCESS
+
+    def getDeviceIds(self, devices, remote_id=None) -> int:
+        self.count('getDeviceIds')
+        devices.load(list(self.device_list.keys())[:len(devices)])
+        return POZYX_SUCCESS
+
+    def clearDevices(self, remote_id=None) -> int:
+        self.count('clearDevices')
+        self.device_list.clear()
+        return POZYX_SUCCESS
+
+    def addDevice(self, device_coordinates, remote_id=None) -> int:
+        self.count('addDevice')
+        self.device_list[device_coordinates[0]] = device_coordinates
+        return POZYX_SUCCESS
+
+    def removeDevice(self, device_id, remote_id=None) -> int:
+        self.count('removeDevice')
+        return POZYX_SUCCESS if self.device_list.pop(int(device_id), None) is not None else POZYX_FAILURE
+
+    def setSelectionOfAnchors(self, mode, number_of_anchors, remote_id=None) -> int:
+        self.count('setSelectionOfAnchors')
+        self.anchor_selection = (mode, number_of_anchors)
+        return POZYX_SUCCESS
+
+    # Sensors
+
+    def getEulerAngles_deg(self, euler_angles, remote_id=None) -> int:
+        self.count('getEulerAngles_deg')
+        euler_angles.load([int(self.heading * EULER_ANGLES_SCALING), 0, 0])
+        return POZYX_SUCCESS
+
+    def getAcceleration_mg(self, acceleration, remote_id=None) -> int:
+        self.count('getAcceleration_mg')
+        acceleration.load(list(self.acceleration))
+        return POZYX_SUCCESS
+
+    def getGravityVector_mg(self, gravity_vector, remote_id=None) -> int:
+        self.count('getGravityVector_mg')
+        gravity_vector.load(list(self.gravity))
+        return POZYX_SUCCESS
+
+    def getAllSensorData(self, sensor_data, remote_id=None) -> int:
+        """Pressure, magnetometer, gyroscope, quaternion and temperature are not simulated and read 0."""
+
+        self.count('getAllSensorData')
+        linear_acceleration = [acceleration - gravity for acceleration, gravity in zip(self.acceleration, self.gravity)]
+        sensor_data.load([0] + list(self.acceleration) + [0] * 6 + [int(self.heading * EULER_ANGLES_SCALING), 0, 0]
+                         + [0] * 4 + linear_acceleration + list(self.gravity) + [0])
+        return POZYX_SUCCESS
+
+    # System
+
+    def getRead(self, address, data, remote_id=None) -> int:
+        self.count('getRead')
+        if address == POZYX_NETWORK_ID:
+            data.load([self.network_id & 0xFF, self.network_id >> 8])
+        else:
+            data.load([0] * len(data))
+        return POZYX_SUCCESS
+
+    def getErrorCode(self, error_code, remote_id=None) -> int:
+        self.count('getErrorCode')
+        error_code.load([0])
+        return POZYX_SUCCESS
+
+    def getErrorMessage(self, error_code) -> str:
+        return ""
+
+    def resetSystem(self, remote_id=None) -> int:
+        self.count('resetSystem')
+        self.device_list.clear()
+        self.rx_sender_id, self.rx_payload = 0, b''
+        return POZYX_SUCCESS
@@ -0,0 +1,41 @@
+"""Overrides the TDMA timing constants of interfaces.timing for parameter sweeps.
+
+The constants are imported by name in several modules, so the new values are also propagated
+to every CLAMOUR module holding a copy. Must be called before the TDMANodes are created."""
+
+import os
+import sys
+
+import interfaces.timing as timing
+
+CLAMOUR_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DERIVED_PARAMETERS = ['TASK_START_TIME', 'FRAME_DURATION', 'FULL_CYCLE_DURATION']
+
+
+def apply_timing_parameters(**parameters) -> dict:
+    """Returns the previous values, so that they can be restored with another call."""
+
+    for name in parameters:
+        if name in DERIVED_PARAMETERS or not hasattr(timing, name):
+            raise ValueError("Unknown or derived timing parameter: " + name)
+
+    updated = dict(parameters)
+    updated['TASK_START_TIME'] = parameters.get('SYNCHRONIZATION_PERIOD', timing.SYNCHRONIZATION_PERIOD) \
+        + parameters.get('SCHEDULING_SLOT_DURATION', timing.SCHEDULING_SLOT_DURATION) \
+        * parameters.get('NB_NODES', timing.NB_NODES) \
+        * parameters.get('NB_SCHEDULING_CYCLES', timing.NB_SCHEDULING_CYCLES)
+    updated['FRAME_DURATION'] = parameters.get('TASK_SLOT_DURATION', timing.TASK_SLOT_DURATION) \
+        * parameters.get('NB_TASK_SLOTS', timing.NB_TASK_SLOTS)
+    updated['FULL_CYCLE_DURATION'] = updated['TASK_START_TIME'] \
+        + updated['FRAME_DURATION'] * parameters.get('NB_FULL_CYCLES', timing.NB_FULL_CYCLES)
+
+    previous = {name: getattr(timing, name) for name in updated}
+
+    for module in list(sys.modules.values()):
+        if not getattr(module, '__file__', None) or not os.path.abspath(module.__file__).startswith(CLAMOUR_ROOT):
+            continue
+        for name, value in updated.items():
+            if module is timing or (hasattr(module, name) and getattr(module, name) == previous[name]):
+                setattr(module, name, value)
+
+    return {name: previous[name] for name in parameters}
@@ -0,0 +1,25 @@
+from clockSource import ClockSource
+
+EPOCH = 1600000000.0  # Arbitrary wall clock origin, so that time() looks like a real timestamp
+
+
+class VirtualClock(ClockSource):
+    """Clock source whose time only moves when the simulation advances it.
+
+    sleep() advances the time immediately: in a discrete-event simulation there is no one
+    else to wait for, the sleeping node simply consumes virtual time."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return EPOCH + self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+    def advance_to(self, timestamp: float) -> None:
+        self.now = max(self.now, timestamp)
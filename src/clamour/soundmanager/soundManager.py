@@ -91,12 +91,11 @@ class SoundManager(object):
 
     def run(self) -> None:
         while True:
-            if not self.sound_queue.empty():
-                message = SoundMessage.load(*self.sound_queue.get_nowait())
-                scaled_position = Coordinates(message.coordinates.x / 10,
-                                              message.coordinates.y / 10,
-                                              min(message.coordinates.z / 10, 2250))
-                self.cyclic_call(scaled_position)
+            message = SoundMessage.load(self.sound_queue.get())
+            scaled_position = Coordinates(message.coordinates.x / 10,
+                                          message.coordinates.y / 10,
+                                          min(message.coordinates.z / 10, 2250))
+            self.cyclic_call(scaled_position)
 
     def main(self):
         for posX in range(-2000, 2000, 40):
@@ -13,7 +13,6 @@ JUMP_THRESHOLD = 3000
 SAFE_THRESHOLD = 13000
 GRAVITATIONAL_ACCELERATION = 9.81
 SECONDS_TO_MILLISECONDS = 1000
-TAG_ID_MASK = 0xFF
 
 NB_SAMPLES_OFFSET = 20
 TRANSMISSION_SCALING = 100
@@ -2,7 +2,7 @@ import random
 from multiprocessing import Lock
 from pypozyx import PozyxSerial, Data
 from pypozyx.definitions.constants import (POZYX_DISCOVERY_TAGS_ONLY)
-from time import sleep
+from clockSource import sleep
 
 from interfaces import Anchors, Neighborhood
 from messenger import Messenger
@@ -27,4 +27,9 @@ class Listen(TDMAState):
             self.messenger.received_messages.clear()
             return State.SYNCHRONIZATION
         else:
-            return State.TASK if self.timing.in_taskslot(self.slot_assignment.pure_send_list) else State.LISTEN
+            return State.TASK if self.timing.in_taskslot(self.slot_assignment) else State.LISTEN
+
+    def next_event(self):
+        """The start of the next own task slot."""
+
+        return self.timing.time_until_slot(self.slot_assignment.own)
@@ -1,9 +1,10 @@
 from interfaces import Neighborhood, SlotAssignment, Timing
-from interfaces.timing import (NB_NODES, SYNCHRONIZATION_PERIOD, SCHEDULING_SLOT_DURATION, NB_TASK_SLOTS)
+from interfaces.timing import (SYNCHRONIZATION_PERIOD, SCHEDULING_SLOT_DURATION, NB_TASK_SLOTS,
+                               SECONDS_TO_MILLISECONDS)
 from messenger import Messenger
 from random import sample, randint
 
-from .constants import State, TAG_ID_MASK
+from .constants import State
 from .tdmaState import TDMAState
 
 
@@ -41,7 +42,7 @@ class Scheduling(TDMAState):
 
             if len(self.slot_assignment.pure_send_list) == 0:
                 print("-------- Artificially adding slots -------")
-                self.slot_assignment.pure_send_list.extend({randint(0, NB_TASK_SLOTS) for _ in range(2)})
+                self.slot_assignment.pure_send_list = list({randint(0, NB_TASK_SLOTS) for _ in range(2)})
 
             self.messenger.message_box.clear()
             self.messenger.received_messages.clear()
@@ -51,6 +52,19 @@ class Scheduling(TDMAState):
         else:
             return State.SCHEDULING
 
+    def next_event(self):
+        """The start of the own broadcast slot, or the end of the scheduling phase."""
+
+        self.timing.logical_clock.update_clock()
+        elapsed = self.timing.logical_clock.clock - self.timing.sync_timestamp
+        event = self.timing.task_start_time
+
+        period = self.broadcast_period()
+        broadcast = elapsed - elapsed % period + self.neighborhood.local_id * SCHEDULING_SLOT_DURATION
+        event = min(event, broadcast if broadcast > elapsed else broadcast + period)
+
+        return (event - elapsed) / SECONDS_TO_MILLISECONDS
+
     def community_slot_assignment(self):
         if self.is_broadcast_slot():
             self.messenger.broadcast_control_message()
@@ -64,13 +78,16 @@ class Scheduling(TDMAState):
         random_slots = sample(range(NB_TASK_SLOTS), int(2 * NB_TASK_SLOTS / 3))  # We must leave some free slots
         self.slot_assignment.pure_send_list = [i if i in random_slots else -1 for i in range(NB_TASK_SLOTS)]
 
+    def broadcast_period(self) -> int:
+        """Each node within two hops broadcasts once per period, in the slot of its local ID (ms)."""
+
+        return self.neighborhood.local_id_period * SCHEDULING_SLOT_DURATION
+
     def is_broadcast_slot(self) -> bool:
-        return int(((self.timing.logical_clock.clock - self.timing.sync_timestamp) % (NB_NODES * SCHEDULING_SLOT_DURATION))
-                / SCHEDULING_SLOT_DURATION) == self.id & TAG_ID_MASK
+        return int(((self.timing.logical_clock.clock - self.timing.sync_timestamp) % self.broadcast_period())
+                / SCHEDULING_SLOT_DURATION) == self.neighborhood.local_id
 
     def update_pure_send_list(self):
-        self.slot_assignment.pure_send_list = [x for x in range(len(self.slot_assignment.send_list))
-                                               if self.slot_assignment.send_list[x] not in [-1, -2]
-                                               and self.slot_assignment.receive_list[x] == -1]
+        self.slot_assignment.update_pure_send_list()
 
 
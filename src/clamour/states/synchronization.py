@@ -1,6 +1,6 @@
 from numpy import mean
 from ctypes import c_int32 as int32
-from time import time, sleep
+from clockSource import time, sleep
 import random
 
 from interfaces import Neighborhood, SlotAssignment, Timing
@@ -26,6 +26,7 @@ class Synchronization(TDMAState):
         self.first_exec_time = None  # Execution time in milliseconds
         self.nb_cycles_neighbors_synced = 0
         self.has_done_first_correction = False
+        self.announce_local_id = False  # The broadcasts alternate between synchronization and local ID messages
 
     def execute(self) -> State:
         if self.first_exec_time is None:
@@ -43,7 +44,11 @@ class Synchronization(TDMAState):
             self.nb_cycles_neighbors_synced = 0
 
         if self.time_to_sleep <= time() - self.start_t:
-            self.broadcast_synchronization_message()
+            if self.announce_local_id:
+                self.broadcast_local_id_message()
+            else:
+                self.broadcast_synchronization_message()
+            self.announce_local_id = not self.announce_local_id
             self.time_to_sleep = abs(random.gauss(RANDOM_DELAY_MEAN, RANDOM_DELAY_VARIANCE))
             self.start_t = time()
 
@@ -78,6 +83,11 @@ class Synchronization(TDMAState):
         else:
             return State.SYNCHRONIZATION
 
+    def next_event(self):
+        """The next broadcast of the synchronization message."""
+
+        return self.start_t + self.time_to_sleep - time()
+
     def is_left_behind(self) -> bool:
         return self.nb_cycles_neighbors_synced > 10
 
@@ -86,6 +96,13 @@ class Synchronization(TDMAState):
         t = int32(round(self.timing.logical_clock.clock * TRANSMISSION_SCALING))
         self.messenger.broadcast_synchronization_message(t, self.timing.synchronized)
 
+    def broadcast_local_id_message(self) -> None:
+        """The local ID is claimed again before each announcement, so that the nodes within two hops settle
+        distinct local IDs one after the other."""
+
+        self.neighborhood.claim_local_id(self.id)
+        self.messenger.broadcast_local_id_message()
+
     def synchronize(self) -> None:
         self.messenger.receive_new_message(State.SYNCHRONIZATION)
         while not self.messenger.message_box.empty():
@@ -108,7 +125,8 @@ class Synchronization(TDMAState):
         self.neighborhood.synchronized_active_neighbor_count = 0
         self.slot_assignment.reset()
         self.timing.clear_synchronization_info()
-        self.timing.update_task_start_time(len(self.neighborhood.current_neighbors))
+        self.neighborhood.assign_local_ids(self.id)
+        self.timing.update_task_start_time(self.neighborhood.nb_local_ids)
         self.messenger.message_box.clear()
         self.messenger.received_messages.clear()
         self.messenger.should_go_back_to_sync = 0
@@ -1,7 +1,7 @@
 import random
 from multiprocessing import Lock
 from struct import error as StructError
-from time import perf_counter
+from clockSource import perf_counter
 
 from numpy import array, atleast_2d
 from pypozyx import (POZYX_3D, POZYX_ANCHOR_SEL_AUTO, POZYX_DISCOVERY_ALL_DEVICES,
@@ -11,11 +11,13 @@ from pypozyx import (POZYX_3D, POZYX_ANCHOR_SEL_AUTO, POZYX_DISCOVERY_ALL_DEVICE
 from interfaces import Anchors, Neighborhood, Timing, SlotAssignment
 from messages import UpdateMessage, UpdateType
 from messenger import Messenger
-from pozyx_utils import PozyxDiscoverer
+from pozyx_utils import DeviceListMirror, PozyxDiscoverer
 
 from .constants import State
 from .tdmaState import TDMAState
 
+MAX_RANGES_PER_SLOT = 4  # Each ranging takes a few milliseconds, the slot check stops earlier if needed
+
 
 class Task(TDMAState):
     def __init__(self, timing: Timing, anchors: Anchors, neighborhood: Neighborhood,
@@ -30,6 +32,7 @@ class Task(TDMAState):
         self.neighborhood = neighborhood
         self.slot_assignment = slot_assignment
         self.messenger = messenger
+        self.device_list = DeviceListMirror(shared_pozyx, shared_pozyx_lock)
         self.set_manually_measured_anchors()
         self.frame_id_done_discover = -1
         self.neighborUpdateFrequency = 5 # every five frames, do discovery and update neighbor information
@@ -46,8 +49,10 @@ class Task(TDMAState):
             self.localize()
             #self.testTDMA()
 
+        if self.neighborhood.changed or self.messenger.topology_pages:
+            self.messenger.broadcast_topology_message()  # Broadcast topology change to other devices, one page per tick
+
         if self.neighborhood.changed:
-            self.messenger.broadcast_topology_message()  # Broadcast topology change to other devices
             self.messenger.send_topology_update(self.timing.logical_clock.clock, self.timing.logical_clock.offset, self.neighborhood.current_neighbors)
             self.neighborhood.changed = False
 
@@ -76,11 +81,16 @@ class Task(TDMAState):
 
     def next(self) -> State:
         if self.timing.in_cycle():
-            return State.TASK if self.timing.in_taskslot(self.slot_assignment.pure_send_list) else State.LISTEN
+            return State.TASK if self.timing.in_taskslot(self.slot_assignment) else State.LISTEN
         else:
             print("Go to sync")
             return State.SYNCHRONIZATION
 
+    def next_event(self):
+        """The end of the slot, where the node goes back to listening."""
+
+        return self.timing.time_until_slot()
+
     def select_localization_method(self) -> None:
         self.localize = self.positioning if len(self.anchors.available_anchors) >= 3 else self.ranging
 
@@ -112,47 +122,69 @@ class Task(TDMAState):
         return not (coordinates.x == coordinates.y == coordinates.z == 0.0)
 
     def ranging(self) -> None:
-        ranging_target_id = self.select_ranging_target()
+        """Ranges to as many targets as the slot allows, and sends all the ranges in a single EKF update."""
 
-        if ranging_target_id is not None:
-            ref_coordinates = Coordinates()
+        slot_id = self.timing.current_slot_id
+        ranges, neighbor_positions = [], []
 
-            if ranging_target_id not in self.anchors.anchors_dict:
-                try:
-                    with self.pozyx_lock:
-                        self.pozyx.getCoordinates(ref_coordinates)
-                except StructError as s:
-                    print(str(s))
-            else:
-                ref_coordinates = self.anchors.anchors_dict[ranging_target_id].pos
+        for ranging_target_id in self.select_ranging_targets():
+            if ranges and not self.time_left_in_slot(slot_id):
+                break
 
+            ref_coordinates = self.get_target_coordinates(ranging_target_id)
             measured_position = DeviceRange()
-            angles = EulerAngles()
 
             try:
                 with self.pozyx_lock:
                     status_pos = self.pozyx.doRanging(ranging_target_id, measured_position)
-                    status_angle = self.pozyx.getEulerAngles_deg(angles)
             except StructError as s:
-                status_angle, status_pos = 0, 0
+                status_pos = 0
                 print(s)
 
             if status_pos == POZYX_SUCCESS:
-                measured_position = Coordinates(measured_position.data[1], 0, 0)
+                ranges.append(measured_position.data[1])
+                neighbor_positions.append([ref_coordinates.x, ref_coordinates.y, ref_coordinates.z])
+
+        if not ranges:
+            return
+
+        angles = EulerAngles()
+        try:
+            with self.pozyx_lock:
+                status_angle = self.pozyx.getEulerAngles_deg(angles)
+        except StructError as s:
+            status_angle = 0
+            print(s)
 
-            neighbor_position = array([ref_coordinates.x, ref_coordinates.y, ref_coordinates.z])
+        if status_angle == POZYX_SUCCESS:
+            # measured_xyz keeps the first three ranges for the logs
+            measured_position = Coordinates(*(ranges + [0, 0])[:3])
+            self.messenger.send_ekf_update(UpdateType.RANGING, self.timing.logical_clock.clock, self.timing.logical_clock.offset,
+                                           measured_position, angles.heading, neighbors=atleast_2d(array(neighbor_positions)),
+                                           topology=self.neighborhood.current_neighbors, ranges=ranges)
 
-            if status_pos == status_angle == POZYX_SUCCESS:
-                self.messenger.send_ekf_update(UpdateType.RANGING, self.timing.logical_clock.clock, self.timing.logical_clock.offset,
-                                               measured_position, angles.heading, neighbors=atleast_2d(neighbor_position),
-                                               topology=self.neighborhood.current_neighbors)
+    def time_left_in_slot(self, slot_id: int) -> bool:
+        self.timing.update_current_time()
+        return self.timing.current_slot_id == slot_id and self.timing.enough_time_left()
 
-    def select_ranging_target(self) -> int:
-        """We select a target for doing a range measurement.
+    def get_target_coordinates(self, ranging_target_id: int) -> Coordinates:
+        if ranging_target_id in self.anchors.anchors_dict:
+            return self.anchors.anchors_dict[ranging_target_id].pos
+
+        ref_coordinates = Coordinates()
+        try:
+            with self.pozyx_lock:
+                self.pozyx.getCoordinates(ref_coordinates)
+        except StructError as s:
+            print(str(s))
+
+        return ref_coordinates
+
+    def select_ranging_targets(self) -> list:
+        """We select the targets for range measurements, in random order.
         Anchors are prioritized because of their lower uncertainty."""
 
-        if len(self.anchors.available_anchors) > 0:
-            return random.choice(self.anchors.available_anchors)
+        return random.sample(self.anchors.available_anchors, min(len(self.anchors.available_anchors), MAX_RANGES_PER_SLOT))
 
     def discover_devices(self):
         """Discovers the devices available for localization/ranging.
@@ -161,10 +193,9 @@ class Task(TDMAState):
 
         self.anchors.available_anchors.clear()
 
-        with self.pozyx_lock:
-            self.pozyx.clearDevices()
-
+        self.device_list.clear()  # Only the devices in range will be listed
         self.discover(POZYX_DISCOVERY_ALL_DEVICES)
+        self.device_list.listed(self.anchors.available_anchors)
 
         new_anchors, new_tags = [], []
         for device in self.anchors.available_anchors:
@@ -194,17 +225,16 @@ class Task(TDMAState):
                 self.anchors.available_anchors.append(device_id)
 
     def set_manually_measured_anchors(self) -> None:
-        with self.pozyx_lock:
-            self.pozyx.clearDevices()
-
-        for anchor in self.anchors.available_anchors:
-            if anchor in self.anchors.anchors_dict:
-                with self.pozyx_lock:
-                    self.pozyx.addDevice(self.anchors.anchors_dict[anchor])
+        """Lists the available anchors whose coordinates were measured, sending only the changes."""
 
+        anchors = [self.anchors.anchors_dict[anchor] for anchor in self.anchors.available_anchors
+                   if anchor in self.anchors.anchors_dict]
+        selection = None
         if len(self.anchors.available_anchors) > 3:
-            with self.pozyx_lock:
-                self.pozyx.setSelectionOfAnchors(POZYX_ANCHOR_SEL_AUTO, len(self.anchors.available_anchors))
+            selection = (POZYX_ANCHOR_SEL_AUTO, len(self.anchors.available_anchors))
+
+        transactions, saved = self.device_list.sync(anchors, selection)
+        print("Anchor list synced:", transactions, "serial transactions,", saved, "saved")
 
     def handle_error(self, function_name: str) -> None:
         error_code = SingleRegister()
@@ -10,6 +10,11 @@ class TDMAState(ABC):
     def next(self) -> State:
         pass
 
+    def next_event(self):
+        """Seconds until the state must act again, None if the regular tick is enough."""
+
+        return None
+
 def print_progress(method):
     def progress(*args, **kwargs):
         full_name = str(method.__qualname__)
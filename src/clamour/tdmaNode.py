@@ -1,11 +1,15 @@
 from multiprocessing import Lock
 from pypozyx import PozyxSerial
-from time import sleep, time
+from clockSource import perf_counter, sleep
 
 from interfaces import Anchors, Neighborhood, SlotAssignment, Timing
+from interfaces.timing import MAX_RANGING_DELAY, NB_TASK_SLOTS, TASK_SLOT_DURATION
 from messenger import Messenger
 from states import (TDMAState, Initialization, Listen, Scheduling, State, Synchronization, Task)
 
+TICK_FREQUENCY = 60.0  # Hz, the states run at least this often, to poll the radio
+WAKE_UP_MARGIN = 0.0002  # s after an event, so that the clock is past the boundary when the state runs
+
 
 class TDMANode:
     def __init__(self, multiprocess_communication_queue, shared_pozyx: PozyxSerial,
@@ -20,7 +24,7 @@ class TDMANode:
                               shared_pozyx_lock, multiprocess_communication_queue)
 
         self.timing = Timing()
-        self.loop_start_time = time()
+        self.loop_start_time = perf_counter()
 
         self.states = self.states = {
             State.INITIALIZATION: Initialization(neighborhood, anchors, pozyx_id, shared_pozyx, messenger,
@@ -36,28 +40,89 @@ class TDMANode:
         self.last_state_id = State.INITIALIZATION
         self.current_state_id = State.INITIALIZATION
 
+        self.executed_state_id = None
+        self.last_task_phase_slot = None  # Slot index in the cycle at the previous tick of the task phase
+        self.slot_entries = 0
+        self.late_entries = 0  # Own slots entered with less than MAX_RANGING_DELAY left to localize
+        self.task_ran_in_slot = False
+        self.missed_slots = 0  # Own slots that went by without the task running
+        self.entry_lateness_sum = 0.0  # ms
+        self.entry_lateness_max = 0.0
 
     def run(self) -> None:
         while True:
-            start_time = time()
-            self.timing.update_current_time()
-            self.current_state_id = self.current_state.execute()
-            self.current_state = self.states[self.current_state_id]
+            start_time = perf_counter()
+            self.step()
+            self.wait(self.next_wakeup(start_time))
+
+    def step(self) -> None:
+        """Executes a single tick of the state machine."""
+
+        self.timing.update_current_time()
+        self.record_slot_entry()
+        self.executed_state_id = self.current_state_id
+        self.current_state_id = self.current_state.execute()
+        self.current_state = self.states[self.current_state_id]
+
+        if(self.last_state_id == State.LISTEN and self.current_state_id == State.SYNCHRONIZATION):
+            self.current_state.first_exec_time = None
+            print("Enter Synchronization, new Full Cycle starts")
+            print("Task slots:", self.slot_statistics())
+        self.last_state_id = self.current_state_id
+
+    def next_wakeup(self, start_time: float, tick_period: float = 1.0 / TICK_FREQUENCY) -> float:
+        """The next tick, or the next event of the current state if it comes sooner.
+        A state entered during the tick runs right away."""
 
-            if(self.last_state_id == State.LISTEN and self.current_state_id == State.SYNCHRONIZATION):
-                self.current_state.first_exec_time = None
-                print("Enter Synchronization, new Full Cycle starts")
-            self.last_state_id = self.current_state_id
+        if self.current_state_id != self.executed_state_id:
+            return perf_counter()
 
-            self.wait(start_time)
+        wakeup = start_time + tick_period
+        delay = self.current_state.next_event()
+        if delay is not None:
+            wakeup = min(wakeup, perf_counter() + max(delay, 0.0) + WAKE_UP_MARGIN)
+
+        return wakeup
 
     @staticmethod
-    def wait(start_time: float):
-        frequency = 60.0  # Hz
-        period = 1.0 / frequency
+    def wait(wakeup: float) -> None:
+        remaining = wakeup - perf_counter()
+        if remaining > 0:
+            sleep(remaining)
+
+    def record_slot_entry(self) -> None:
+        """Counts how late the own task slots are entered, and the ones where the task never ran."""
+
+        if self.current_state_id not in (State.TASK, State.LISTEN):
+            self.last_task_phase_slot = None
+            return
+
+        previous_slot, slot = self.last_task_phase_slot, int(self.timing.current_time_in_cycle // TASK_SLOT_DURATION)
+        slot_assignment = self.states[State.TASK].slot_assignment
+        if previous_slot is None or slot != previous_slot:
+            if previous_slot is not None:
+                first_slot = previous_slot + 1 if self.task_ran_in_slot else previous_slot
+                self.missed_slots += sum(1 for missed in range(first_slot, slot)
+                                         if slot_assignment.is_own_slot(missed % NB_TASK_SLOTS))
+            self.last_task_phase_slot = slot
+            self.task_ran_in_slot = False
+
+        if self.current_state_id == State.TASK and slot_assignment.is_own_slot(slot % NB_TASK_SLOTS) and not self.task_ran_in_slot:
+            lateness = self.timing.time_in_slot()
+            self.slot_entries += 1
+            self.late_entries += lateness >= MAX_RANGING_DELAY
+            self.entry_lateness_sum += lateness
+            self.entry_lateness_max = max(self.entry_lateness_max, lateness)
+        self.task_ran_in_slot = self.task_ran_in_slot or self.current_state_id == State.TASK
 
-        while (time() - start_time) <= period:
-            sleep(0.00000001)
+    def slot_statistics(self) -> dict:
+        return {
+            'entries': self.slot_entries,
+            'late_entries': self.late_entries,
+            'missed': self.missed_slots,
+            'mean_lateness': self.entry_lateness_sum / self.slot_entries if self.slot_entries else 0.0,
+            'max_lateness': self.entry_lateness_max,
+        }
 
     @staticmethod
     def clear_devices(pozyx: PozyxSerial, pozyx_lock: Lock()) -> None: